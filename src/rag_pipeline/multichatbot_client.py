@@ -5,36 +5,65 @@ allowing to evaluate and trace each component separately.
 """
 import os
 import sys
+import logging
 import langchain
 from pathlib import Path
-from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from langchain_core.runnables import RunnableBranch, RunnableLambda, RunnablePassthrough
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.messages import AIMessage
 from langchain.memory import ChatMessageHistory
-from langchain_community.vectorstores import Neo4jVector
-from langchain_community.graphs import Neo4jGraph
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.runnables import ConfigurableFieldSpec
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_openai import ChatOpenAI
-from langchain.embeddings import HuggingFaceEmbeddings
+from neo4j.exceptions import DriverError, Neo4jError
 
 
 # Add the root folder to sys.path
 root_path = Path(__file__).parent.parent  # Adjust according to actual path
 sys.path.append(str(root_path))
+# The repository root too, so the ingest package is imported as `src.utils...`. A bare `utils` is
+# ambiguous, the Streamlit apps import their own `utils` package first
+sys.path.append(str(root_path.parent))
 
 
 ## Import functionalities to setUp RAG pipeline:
 from services.handler_memory import create_session_factory
+from services.rewrite_policy import rewrite_policy
+from services.cypher_planner import cypher_planner
+from services.cypher_guard import UnsafeQueryError, run_read_query
+from services.local_retriever import LocalRetriever
+from services.answer_cache import DEFAULT_SIMILARITY_THRESHOLD
+from services.component_pool import get_answer_cache, get_embeddings, get_entity_linker, get_llm, get_graph, get_local_index, get_schema_cache, get_vector_store, warm_up
+from src.utils.parse_directory_to_KT.source_store import BlobStore, SourceLoader
 ## Import services
 from operator import itemgetter
 from dotenv import load_dotenv
 
 langchain.debug = True
+logger = logging.getLogger(__name__)
 
 _ = load_dotenv()  # take environment variables from .env.
 
+# Approximate tokens of source code added to the context for each node
+MAX_SOURCE_TOKENS = 1024
+# Closest dependencies (DEPENDS_ON) added to each retrieved node, and the tokens of code of each one
+MAX_DEPENDENCIES = 5
+MAX_DEPENDENCY_TOKENS = 256
+# Records of the graph query added to the context, and seconds after which the query is aborted
+MAX_GRAPH_RECORDS = 5
+GRAPH_QUERY_TIMEOUT = 5.0
+
+# Same result as the default query of the hybrid Neo4jVector retriever, adding the closest dependencies of each node.
+# The aggregation loses the order of the hybrid search, so the results are sorted by score again
+RETRIEVAL_QUERY = f"""
+OPTIONAL MATCH (node)-[dependency:DEPENDS_ON]->(target)
+WITH node, score, dependency, target ORDER BY dependency.depth
+WITH node, score, collect(target {{.name, .file_path, .start_byte, .end_byte, .code_hash, .chunk_start_bytes}})[..{MAX_DEPENDENCIES}] AS dependencies
+RETURN node.`text` AS text, score, node {{.*, `text`: Null, `embedding`: Null, id: Null, dependencies: dependencies}} AS metadata
+ORDER BY score DESC
+"""
+
 
 class QA_Rag:
     """
@@ -44,11 +73,24 @@ class QA_Rag:
             self,
             user_id,
             conversation_id,
-            config_path=None
+            config_path=None,
+            rewrite_policy=rewrite_policy,
+            cypher_planner=cypher_planner,
+            link_entities=True
             ):
         """
         Initialize the RAG system with retriever and LLM
+
+        Args:
+            rewrite_policy (RewritePolicy): Decides when the question is rewritten with the history.
+                Defaults to the policy shared by every conversation, which keeps the skip metrics.
+            cypher_planner (CypherPlanner): Plans the Cypher queries from templates and generated queries
+                cached, so the LLM only generates the ones it cannot plan. Shared by default.
+            link_entities (bool): Whether questions naming nodes of the graph are answered with their
+                neighbourhoods instead of a query generated by the LLM.
         """
+        self.rewrite_policy = rewrite_policy
+        self.cypher_planner = cypher_planner
 
         self.cypher_gen_prompt = PromptTemplate.from_template(
             """
@@ -71,6 +113,9 @@ class QA_Rag:
                 - Framework: Nodes labeled as 'Framework' representing frameworks used in data science.
                 - Class: Nodes labeled as 'Class' representing a set of functions defining a Python class within a framework.
                 - Function: Nodes labeled as 'Function' representing custom functions built on top of those frameworks.
+                - Method: Nodes labeled as 'Method' representing a function defined inside a Class, named as '<class>.<method>' and linked from its Class with 'CONTAINS_METHOD'.
+                - Class, Function and Method nodes are linked with 'CALLS' to the ones they call and with 'IMPORTS' to the ones they import. 'DEPENDS_ON' (with a 'depth' property)
+                links each one directly to everything it needs, use it to return a function together with its dependencies.
             Nodes do not neccesarily have parents of each type of label.
 
             Your main focus should be to identify the Framework and the Function that is being asked.
@@ -102,9 +147,26 @@ class QA_Rag:
 
             """)
         # self.db = initializer.get_vector_db()
-        self.llm = ChatOpenAI()
+        # The model, the Neo4j connections and the LLM client are shared by every conversation
+        self.llm = get_llm()
+        # Nodes only store the location of their code, which is loaded when they are used as context
+        blob_store_path = os.environ.get("CODE_BLOB_STORE")
+        self.source_loader = SourceLoader(
+            os.environ.get("CODE_BASE_PATH", str(root_path.parent / "data_science_repo")),
+            blob_store=BlobStore(blob_store_path) if blob_store_path else None
+        )
         self.retriever = self.__set_retriever()
-        self.graph = Neo4jGraph(url="bolt://localhost:7687", username="neo4j", password=os.environ['NEO4J_PASSWORD'],database='graphrag')
+        graph_config = dict(url="bolt://localhost:7687", username="neo4j", password=os.environ['NEO4J_PASSWORD'], database='graphrag')
+        self.graph = get_graph(**graph_config)
+        # Rendered once per graph version, so building the prompt of a question does no database work
+        self.schema_cache = get_schema_cache(**graph_config)
+        self.entity_linker = get_entity_linker(**graph_config) if link_entities else None
+        # Answers of similar questions are reused while the graph does not change
+        self.embeddings = get_embeddings()
+        self.answer_cache = get_answer_cache(
+            os.environ.get("ANSWER_CACHE_PATH"),
+            similarity_threshold=float(os.environ.get("ANSWER_CACHE_THRESHOLD", DEFAULT_SIMILARITY_THRESHOLD))
+        )
         # self.output_parser =  StrOutputParser()
         self.rag_chain = self.set_rag_pipeline()
         self.user_id = user_id
@@ -113,11 +175,12 @@ class QA_Rag:
 
     def context_unifier(self,full_context):
         print("Received Context---->",full_context)
-        unified_context = full_context['graph_context'] + full_context['vector_context'] 
+        # The graph context is None when the Cypher query failed
+        unified_context = (full_context['graph_context'] or []) + full_context['vector_context']
         return unified_context
     
     def get_schema(self,summarisation):
-        return self.graph.get_schema
+        return self.schema_cache.get()
     
     def select_last_n_messages(self,chat_history,n=3):
         print(chat_history)
@@ -130,38 +193,138 @@ class QA_Rag:
             return chat_history[-3:]
 
 
-    def run_cypher_query(self,query):
+    def needs_rewrite(self, inputs):
+        """
+        Whether the question has to be rewritten with the history before retrieval.
+        """
+        return self.rewrite_policy.should_rewrite(inputs['chat_history'], inputs['input_message'])
+
+    def lookup_answer(self, inputs):
+        """
+        Looks up the answer of a similar question in the answer cache, for the current graph version.
+        The embedding and version are kept in the inputs, to store the answer generated on a miss.
+        """
+        embedding = self.embeddings.embed_query(inputs['question'])
+        graph_version = self.schema_cache.get_version()
+        return {**inputs, 'embedding': embedding, 'graph_version': graph_version,
+                'cached_answer': self.answer_cache.lookup(embedding, graph_version)}
+
+    def store_answer(self, run):
+        """
+        Stores the answer generated for a question missing from the answer cache, unless the graph
+        retrieval failed, since the answer would lack its context.
+        """
+        if run.inputs['retrieved']['graph_context'] is None:
+            return
+        self.answer_cache.store(run.inputs['question'], run.inputs['embedding'], run.inputs['graph_version'],
+                                run.outputs['output'].content)
+
+    def plan_cypher_query(self, inputs):
+        """
+        Plans the Cypher query of the question from a template, the cache or the nodes it names, leaving 'plan' to None
+        when it has to be generated by the LLM.
+        """
+        graph_version = self.schema_cache.get_version()
+        return {**inputs, 'graph_version': graph_version,
+                'plan': self.cypher_planner.plan(inputs['question'], graph_version, self.entity_linker)}
+
+    def generated_plan(self, query):
+        return {'query': query.content, 'params': {}, 'source': "llm"}
+
+    def run_cypher_query(self, inputs):
+        plan = inputs['plan']
         try:
-            print("Generated query---->",query.content)
-            node_contents = self.graph.query(query.content)[:5]
-            return node_contents
-        except: 
-            return ""
-        
+            print("Generated query---->", plan['source'], plan['query'])
+            # Generated queries are checked to be read-only, limited and run with a timeout
+            node_contents = run_read_query(self.graph, plan['query'], plan['params'],
+                                           max_rows=MAX_GRAPH_RECORDS, timeout=GRAPH_QUERY_TIMEOUT)
+        except UnsafeQueryError as error:
+            # The answer is still generated from the vector context, but it is not cached
+            logger.warning("Rejected the Cypher query from %s: %s", plan['source'], error)
+            return None
+        except (Neo4jError, DriverError) as error:
+            logger.warning("The Cypher query from %s failed: %s", plan['source'], error)
+            return None
+        if plan['source'] == "llm":
+            # Only queries that run are reused for the same question
+            self.cypher_planner.store(inputs['question'], inputs['graph_version'], plan['query'])
+        return self.load_node_sources(node_contents)
+
+    def load_node_sources(self, node_contents):
+        """
+        Adds the source code of the nodes returned by a Cypher query, loaded from the repository.
+        """
+        for record in node_contents:
+            for value in [record, *record.values()]:
+                if SourceLoader.has_source(value) and 'code' not in value:
+                    value['code'] = self.source_loader.load(value, max_tokens=MAX_SOURCE_TOKENS)
+        return node_contents
+
+    def load_document_sources(self, documents):
+        """
+        Adds the source code of the retrieved nodes to their documents.
+        """
+        for document in documents:
+            if SourceLoader.has_source(document.metadata):
+                code = self.source_loader.load(document.metadata, max_tokens=MAX_SOURCE_TOKENS)
+                document.page_content += f"\ncode: {code}"
+            for dependency in document.metadata.get('dependencies') or []:
+                if SourceLoader.has_source(dependency):
+                    code = self.source_loader.load(dependency, max_tokens=MAX_DEPENDENCY_TOKENS)
+                    document.page_content += f"\ndependency {dependency['name']}: {code}"
+        return documents
+
     def __set_retriever(self):
         database = "graphrag"  # default index name
         model_name = "sentence-transformers/all-MiniLM-L6-v2" # You can specify any sentence-transformer model from the hub
-        embeddings = HuggingFaceEmbeddings(model_name=model_name)
 
+        # The local index built from the graph export searches in process, without a round trip to Neo4j
+        local_index_dir = os.environ.get("LOCAL_VECTOR_INDEX")
+        if local_index_dir:
+            return LocalRetriever(index=get_local_index(local_index_dir), embeddings=get_embeddings(model_name),
+                                  k=2, search_type="hybrid", score_threshold=0.5)
 
         # The vector index name was assigned by default
-        store = Neo4jVector.from_existing_index(
-            embeddings,
-            url=os.environ["NEO4J_URL"],
-            username=os.environ["NEO4J_USERNAME"],
-            password=os.environ["NEO4J_PASSWORD"],
+        store = get_vector_store(
             index_name="vector",
-            search_type="hybrid",
             keyword_index_name="keyword",
+            search_type="hybrid",
+            model_name=model_name,
+            retrieval_query=RETRIEVAL_QUERY,
             database=database
         )
         return store.as_retriever(search_kwargs= {'k':2, 'score_threshold':0.5})
+
+    @staticmethod
+    def warm_up():
+        """
+        Loads the shared components before the first conversation is created.
+        """
+        warm_up(local_index_dir=os.environ.get("LOCAL_VECTOR_INDEX"), retrieval_query=RETRIEVAL_QUERY)
     
     def set_rag_pipeline(self):
-        graph_retriever_chain =  self.cypher_gen_prompt | self.llm | RunnableLambda(self.run_cypher_query)
-        # In this case we also add the rephrasing/summarising from the history:
-        summarisation_chain =  {"chat_history": itemgetter('history') | RunnableLambda(self.select_last_n_messages), "input_message": itemgetter('input')}| self.prompt_summarise_conver | self.llm | StrOutputParser()
-        final_chain =  {'context' :summarisation_chain | {'graph_context': {'question': RunnablePassthrough(), 'schema': RunnableLambda(self.get_schema)} | graph_retriever_chain , 'vector_context':self.retriever} | RunnableLambda(self.context_unifier), 'input': itemgetter("input")} | self.prompt_handle_conver | self.llm
+        # The LLM only generates the Cypher of the questions that no template or cached query can answer
+        generate_cypher = RunnablePassthrough.assign(plan=self.cypher_gen_prompt | self.llm | RunnableLambda(self.generated_plan))
+        graph_retriever_chain =  RunnableLambda(self.plan_cypher_query) | RunnableBranch(
+            (lambda inputs: inputs['plan'] is not None, RunnablePassthrough()),
+            generate_cypher
+        ) | RunnableLambda(self.run_cypher_query)
+        # In this case we also add the rephrasing/summarising from the history, skipped (saving an LLM call)
+        # for first messages and self-contained questions:
+        rewrite_chain = self.prompt_summarise_conver | self.llm | StrOutputParser()
+        summarisation_chain =  {"chat_history": itemgetter('history') | RunnableLambda(self.select_last_n_messages), "input_message": itemgetter('input')} | RunnableBranch(
+            (RunnableLambda(self.needs_rewrite), rewrite_chain),
+            itemgetter('input_message')
+        )
+        retrieval_chain = RunnableLambda(itemgetter('question')) | {'graph_context': {'question': RunnablePassthrough(), 'schema': RunnableLambda(self.get_schema)} | graph_retriever_chain , 'vector_context':self.retriever | RunnableLambda(self.load_document_sources)}
+        # The retrieved context is kept in the inputs of the generation, so the answer is only cached when the retrieval succeeded
+        generation_chain = {'context': itemgetter('retrieved') | RunnableLambda(self.context_unifier), 'input': itemgetter("input")} | self.prompt_handle_conver | self.llm
+        answer_chain = RunnablePassthrough.assign(retrieved=retrieval_chain) | generation_chain.with_listeners(on_end=self.store_answer)
+        # Similar questions already answered on the same graph version skip the retrieval and the answer generation
+        final_chain = RunnablePassthrough.assign(question=summarisation_chain) | RunnableLambda(self.lookup_answer) | RunnableBranch(
+            (lambda inputs: inputs['cached_answer'] is not None, RunnableLambda(lambda inputs: AIMessage(content=inputs['cached_answer']))),
+            answer_chain
+        )
         
         with_message_history = RunnableWithMessageHistory(
             # itemgetter("input") | chain,
@@ -193,9 +356,33 @@ class QA_Rag:
     
         return with_message_history
 
+    def get_run_config(self):
+        return {"configurable": {"user_id": self.user_id, "conversation_id":self.conversation_id}} #,'callbacks': [ConsoleCallbackHandler()]
+
     def invoke_rag(self, user_query):
 
         return self.rag_chain.invoke(
             {"input": user_query},
-            config={"configurable": {"user_id": self.user_id, "conversation_id":self.conversation_id}}, #,'callbacks': [ConsoleCallbackHandler()]
-        )
\ No newline at end of file
+            config=self.get_run_config(),
+        )
+
+    async def ainvoke_rag(self, user_query):
+        """
+        Asynchronous version of `invoke_rag`, returning the full answer message.
+        """
+        return await self.rag_chain.ainvoke({"input": user_query}, config=self.get_run_config())
+
+    async def astream_rag(self, user_query):
+        """
+        Streams the tokens of the answer as the final LLM call generates them. Retrieval and Cypher
+        generation still run before the first token, the answer itself is not awaited in full.
+
+        Args:
+            user_query (str): The question of the user.
+
+        Yields:
+            str: The next piece of the answer.
+        """
+        async for chunk in self.rag_chain.astream({"input": user_query}, config=self.get_run_config()):
+            if chunk.content:
+                yield chunk.content
\ No newline at end of file
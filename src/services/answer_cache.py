@@ -0,0 +1,182 @@
+"""
+Semantic cache of the answers of the RAG pipeline.
+
+Users often ask near-identical questions, and each one runs the Cypher generation, the graph
+and vector searches and the answer generation again. Answers are cached by the embedding of
+the rewritten (standalone) question and reused for any later question whose embedding is
+similar enough, as long as the graph has not changed since (entries are scoped to the graph
+version). Entries expire after a TTL and the least recently used ones are evicted over a
+maximum size. They can be persisted in a local SQLite file, so they survive restarts. Without a
+graph version (no version marker in the graph) nothing is cached, since the graph may change
+at any time.
+"""
+import os
+import time
+import logging
+import sqlite3
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by question embedding and graph version, looked up by cosine similarity.
+    """
+    def __init__(self, path=None, similarity_threshold=DEFAULT_SIMILARITY_THRESHOLD,
+                 max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        """
+        Args:
+            path (str, optional): SQLite file where the entries are persisted. If not provided,
+                they are only kept in memory.
+            similarity_threshold (float): Minimum cosine similarity between two questions to reuse an answer.
+            max_entries (int): Maximum number of answers kept, the least recently used are evicted.
+            ttl_seconds (float): Lifetime of an answer.
+        """
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # entry id -> {'question', 'graph_version', 'answer', 'created_at', 'last_used'}
+        self._entries = {}
+        self._vectors = {}  # entry id -> normalized float32 vector
+        self._index = None  # (ids, matrix) of the current entries, rebuilt after changes
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = None
+        if path:
+            folder = os.path.dirname(path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS answers (id INTEGER PRIMARY KEY, question TEXT, graph_version TEXT, "
+                "vector BLOB, answer TEXT, created_at REAL, last_used REAL)"
+            )
+            self._load()
+
+    def _load(self):
+        rows = self.connection.execute(
+            "SELECT id, question, graph_version, vector, answer, created_at, last_used FROM answers")
+        for entry_id, question, graph_version, vector, answer, created_at, last_used in rows:
+            self._entries[entry_id] = {'question': question, 'graph_version': graph_version, 'answer': answer,
+                                       'created_at': created_at, 'last_used': last_used}
+            self._vectors[entry_id] = np.frombuffer(vector, dtype=np.float32)
+            self._next_id = max(self._next_id, entry_id + 1)
+        self._evict(time.time())
+
+    def _remove(self, entry_ids):
+        for entry_id in entry_ids:
+            del self._entries[entry_id]
+            del self._vectors[entry_id]
+        if entry_ids:
+            self._index = None
+            if self.connection is not None:
+                self.connection.executemany("DELETE FROM answers WHERE id = ?", [(entry_id,) for entry_id in entry_ids])
+                self.connection.commit()
+
+    def _evict(self, now):
+        expired = {entry_id for entry_id, entry in self._entries.items()
+                   if now - entry['created_at'] >= self.ttl_seconds}
+        by_use = sorted((entry['last_used'], entry_id) for entry_id, entry in self._entries.items()
+                        if entry_id not in expired)
+        overflow = len(by_use) - self.max_entries
+        self._remove(list(expired) + [entry_id for _, entry_id in by_use[:max(overflow, 0)]])
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding, graph_version):
+        """
+        Returns the answer of the most similar cached question, if it is similar enough.
+
+        Args:
+            embedding (list): Embedding of the rewritten question.
+            graph_version: Version of the graph the answer has to come from.
+
+        Returns:
+            str: The cached answer, or None.
+        """
+        if graph_version is None:
+            return None
+        graph_version = str(graph_version)
+        now = time.time()
+        with self._lock:
+            if self._index is None:
+                ids = list(self._vectors)
+                self._index = (ids, np.stack([self._vectors[i] for i in ids]) if ids else None)
+            ids, matrix = self._index
+            best = None
+            if matrix is not None:
+                similarities = matrix @ self._normalize(embedding)
+                for position in np.argsort(-similarities):
+                    if similarities[position] < self.similarity_threshold:
+                        break
+                    entry = self._entries[ids[position]]
+                    if entry['graph_version'] == graph_version and now - entry['created_at'] < self.ttl_seconds:
+                        best, similarity = ids[position], similarities[position]
+                        break
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry = self._entries[best]
+            entry['last_used'] = now
+            if self.connection is not None:
+                self.connection.execute("UPDATE answers SET last_used = ? WHERE id = ?", (now, best))
+                self.connection.commit()
+            logger.info("Answer cache hit for the cached question %r (similarity %.3f)", entry['question'], similarity)
+            return entry['answer']
+
+    def store(self, question, embedding, graph_version, answer):
+        """
+        Caches the answer of a question.
+
+        Args:
+            question (str): The rewritten question.
+            embedding (list): Embedding of the question.
+            graph_version: Version of the graph the answer comes from.
+            answer (str): The answer generated.
+        """
+        if graph_version is None:
+            logger.debug("The graph has no version marker, the answer is not cached")
+            return
+        graph_version = str(graph_version)
+        vector = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {'question': question, 'graph_version': graph_version, 'answer': answer,
+                                       'created_at': now, 'last_used': now}
+            self._vectors[entry_id] = vector
+            self._index = None
+            if self.connection is not None:
+                self.connection.execute(
+                    "INSERT INTO answers (id, question, graph_version, vector, answer, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (entry_id, question, graph_version, vector.tobytes(), answer, now, now)
+                )
+                self.connection.commit()
+            self._evict(now)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Number of entries, hits and misses, and the hit rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,168 @@
+"""
+Process-wide pool of the components shared by the QA_Rag instances.
+
+Loading the embedding model, connecting to Neo4j, fetching the graph schema and
+creating the LLM clients are the slow parts of building a RAG pipeline. They do not depend on
+the user or the conversation, so they are created once per process, keyed by their
+configuration, and every QA_Rag reuses them. Creating the pipeline of a new conversation is
+then a cheap object creation.
+"""
+import os
+import threading
+
+from langchain_community.vectorstores import Neo4jVector
+from langchain_community.graphs import Neo4jGraph
+from langchain_openai import ChatOpenAI
+from langchain.embeddings import HuggingFaceEmbeddings
+
+from services.schema_cache import SchemaCache
+from services.answer_cache import SemanticAnswerCache
+from services.entity_linker import EntityLinker
+from services.embedding_cache import CachedEmbeddings
+from src.utils.parse_directory_to_KT.local_index import LocalVectorIndex
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_DATABASE = "graphrag"
+
+
+class ComponentPool:
+    """
+    Thread-safe registry creating each component once and sharing it afterwards.
+    """
+    def __init__(self):
+        self._components = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, factory):
+        """
+        Returns the component registered under a key, creating it with `factory` the first time.
+        Concurrent requests for the same key wait for a single creation.
+
+        Args:
+            key (tuple): Hashable identifier of the component and its configuration.
+            factory (callable): Creates the component, without arguments.
+        """
+        component = self._components.get(key)
+        if component is not None:
+            return component
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._components:
+                self._components[key] = factory()
+            return self._components[key]
+
+    def clear(self):
+        """Forgets every component, so they are created again on the next request."""
+        with self._lock:
+            self._components.clear()
+            self._locks.clear()
+
+
+# Shared by every QA_Rag of the process
+component_pool = ComponentPool()
+
+
+def get_embeddings(model_name=DEFAULT_EMBEDDING_MODEL):
+    """
+    Returns the shared embedding model, caching the embeddings of the questions in memory and,
+    if `QUERY_EMBEDDING_CACHE` is set, in that SQLite file.
+    """
+    return component_pool.get(
+        ("embeddings", model_name),
+        lambda: CachedEmbeddings(HuggingFaceEmbeddings(model_name=model_name), model_name,
+                                 cache_path=os.environ.get("QUERY_EMBEDDING_CACHE"))
+    )
+
+
+def get_llm(**kwargs):
+    """
+    Returns a shared chat model client, one per configuration (model, temperature...).
+    """
+    return component_pool.get(("llm", tuple(sorted(kwargs.items()))), lambda: ChatOpenAI(**kwargs))
+
+
+def get_graph(url="bolt://localhost:7687", username="neo4j", password=None, database=DEFAULT_DATABASE):
+    """
+    Returns the shared Neo4jGraph (its driver). The schema is fetched by its SchemaCache.
+    """
+    password = password or os.environ['NEO4J_PASSWORD']
+    return component_pool.get(
+        ("graph", url, username, database),
+        lambda: Neo4jGraph(url=url, username=username, password=password, database=database, refresh_schema=False)
+    )
+
+
+def get_schema_cache(**graph_kwargs):
+    """
+    Returns the shared schema cache of a graph, configured as in `get_graph`.
+    """
+    graph = get_graph(**graph_kwargs)
+    return component_pool.get(("schema_cache", id(graph)), lambda: SchemaCache(graph))
+
+
+def get_vector_store(index_name="vector", keyword_index_name="keyword", search_type="hybrid",
+                     model_name=DEFAULT_EMBEDDING_MODEL, database=DEFAULT_DATABASE, retrieval_query=""):
+    """
+    Returns the shared Neo4jVector store over an existing index, built with the shared embeddings.
+    """
+    def create_store():
+        return Neo4jVector.from_existing_index(
+            get_embeddings(model_name),
+            url=os.environ["NEO4J_URL"],
+            username=os.environ["NEO4J_USERNAME"],
+            password=os.environ["NEO4J_PASSWORD"],
+            index_name=index_name,
+            search_type=search_type,
+            keyword_index_name=keyword_index_name,
+            retrieval_query=retrieval_query,
+            database=database
+        )
+    return component_pool.get(
+        ("vector_store", index_name, keyword_index_name, search_type, model_name, database, retrieval_query),
+        create_store
+    )
+
+
+def get_entity_linker(**graph_kwargs):
+    """
+    Returns the shared entity linker of a graph, configured as in `get_graph`.
+    """
+    graph = get_graph(**graph_kwargs)
+    return component_pool.get(("entity_linker", id(graph)), lambda: EntityLinker(graph, get_schema_cache(**graph_kwargs)))
+
+
+def get_answer_cache(path=None, **kwargs):
+    """
+    Returns the shared semantic answer cache, persisted in `path` if provided.
+    """
+    return component_pool.get(
+        ("answer_cache", path, tuple(sorted(kwargs.items()))),
+        lambda: SemanticAnswerCache(path, **kwargs)
+    )
+
+
+def get_local_index(index_dir, use_hnsw=True):
+    """
+    Returns the shared local vector index loaded from `index_dir`.
+    """
+    return component_pool.get(("local_index", index_dir, use_hnsw), lambda: LocalVectorIndex(index_dir, use_hnsw=use_hnsw))
+
+
+def warm_up(local_index_dir=None, **vector_store_kwargs):
+    """
+    Creates the default components ahead of the first conversation (e.g. when the app starts).
+
+    Args:
+        local_index_dir (str, optional): Local vector index used by the retriever instead of Neo4jVector.
+    """
+    get_llm()
+    get_schema_cache().get()
+    # Loads the names of the graph into the linker
+    get_entity_linker().link("")
+    if local_index_dir:
+        get_embeddings()
+        get_local_index(local_index_dir).bm25
+    else:
+        get_vector_store(**vector_store_kwargs)
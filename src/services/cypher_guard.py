@@ -0,0 +1,115 @@
+"""
+Bounded, read-only execution of the Cypher queries generated for a question.
+
+The queries come from the LLM, so they are checked before running: anything writing to the
+graph or calling procedures outside a small allow-list is rejected, a LIMIT is pushed into the
+query, and it runs in a read transaction with a server-side timeout, fetching at most a fixed
+number of records. A bad query then fails fast instead of scanning and returning the whole graph.
+"""
+import re
+import logging
+from itertools import islice
+
+from neo4j import unit_of_work
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ROWS = 25
+DEFAULT_TIMEOUT_SECONDS = 5.0
+
+# String literals, escaped identifiers and comments, removed before looking for keywords
+LITERALS_PATTERN = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|//[^\n]*|/\*.*?\*/", re.DOTALL)
+WRITE_CLAUSES_PATTERN = re.compile(
+    r"\b(?:CREATE|MERGE|DELETE|DETACH|SET|REMOVE|DROP|FOREACH|LOAD\s+CSV|IN\s+TRANSACTIONS|USE|GRANT|DENY|REVOKE)\b",
+    re.IGNORECASE
+)
+CALL_PATTERN = re.compile(r"\bCALL\s+([\w.]+)", re.IGNORECASE)
+# Read-only procedures the generated queries may use
+ALLOWED_PROCEDURES = ("db.index.fulltext.querynodes", "db.index.vector.querynodes", "db.labels",
+                      "db.relationshiptypes", "db.propertykeys", "db.schema.")
+FINAL_LIMIT_PATTERN = re.compile(r"\bLIMIT\s+(\d+)\s*$", re.IGNORECASE)
+
+
+class UnsafeQueryError(ValueError):
+    """Raised when a generated query could modify the graph."""
+
+
+def _strip_literals(query):
+    return LITERALS_PATTERN.sub(" ", query)
+
+
+def check_read_only(query):
+    """
+    Checks that a query only reads the graph.
+
+    Args:
+        query (str): The Cypher query.
+
+    Raises:
+        UnsafeQueryError: If the query has a write clause or calls a procedure not allowed.
+    """
+    code = _strip_literals(query)
+    clause = WRITE_CLAUSES_PATTERN.search(code)
+    if clause:
+        raise UnsafeQueryError(f"Query is not read-only ({clause.group(0)}): {query}")
+    for procedure in CALL_PATTERN.findall(code):
+        if not procedure.lower().startswith(ALLOWED_PROCEDURES):
+            raise UnsafeQueryError(f"Procedure {procedure} is not allowed: {query}")
+
+
+def limit_query(query, max_rows=DEFAULT_MAX_ROWS):
+    """
+    Rewrites a query so it returns at most `max_rows` records, lowering its final LIMIT or adding one.
+
+    Args:
+        query (str): The Cypher query.
+        max_rows (int): Maximum number of records.
+
+    Returns:
+        str: The bounded query.
+    """
+    query = query.strip().rstrip(";").strip()
+    code = _strip_literals(query)
+    if re.search(r"\bUNION\b", code, re.IGNORECASE):
+        # The LIMIT of the last part would only bound that part
+        return f"CALL {{\n{query}\n}}\nRETURN * LIMIT {max_rows}"
+    limit = FINAL_LIMIT_PATTERN.search(query)
+    if limit:
+        if int(limit.group(1)) <= max_rows:
+            return query
+        return f"{query[:limit.start()]}LIMIT {max_rows}"
+    # A LIMIT with an expression (e.g. a parameter) after the last RETURN is kept, the fetch is capped anyway
+    last_return = code.upper().rfind("RETURN")
+    if last_return != -1 and re.search(r"\bLIMIT\b", code[last_return:], re.IGNORECASE):
+        return query
+    return f"{query}\nLIMIT {max_rows}"
+
+
+def run_read_query(graph, query, params=None, max_rows=DEFAULT_MAX_ROWS, timeout=DEFAULT_TIMEOUT_SECONDS):
+    """
+    Runs a generated query in a read transaction, with a timeout and a cap on the records fetched.
+
+    Args:
+        graph (Neo4jGraph): Graph whose driver and database are used.
+        query (str): The Cypher query.
+        params (dict, optional): Parameters of the query.
+        max_rows (int): Maximum number of records returned.
+        timeout (float): Seconds after which the server aborts the transaction.
+
+    Returns:
+        list: The records, as dictionaries.
+
+    Raises:
+        UnsafeQueryError: If the query could modify the graph.
+    """
+    check_read_only(query)
+    query = limit_query(query, max_rows)
+
+    @unit_of_work(timeout=timeout)
+    def read(tx):
+        # Only the records needed are pulled from the server
+        return [record.data() for record in islice(tx.run(query, params or {}), max_rows)]
+
+    # Neo4jGraph does not expose the transaction functions, its driver is used directly
+    with graph._driver.session(database=graph._database) as session:
+        return session.execute_read(read)
@@ -0,0 +1,168 @@
+"""
+Cypher generation layer of the RAG pipeline, calling the LLM only when it is needed.
+
+Questions are first matched against a small library of parameterized query templates for the
+recurring intents ("function X in framework Y", "what is in the pandas framework"...), using
+cheap local regular expressions. Queries generated by the LLM are cached once they run without
+errors, keyed by the normalized question and the graph (schema) version, so the same question
+does not reach the LLM twice while the graph does not change. Other questions naming nodes of
+the graph can be answered with their neighbourhoods, found by the entity linker.
+"""
+import re
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PLANS = 1000
+# Nodes are returned with their properties, except the vectors which are never useful as context
+NODE_PROJECTION = "n {.*, embedding: Null, text: Null, label: labels(n)[0]}"
+
+# Names can be quoted or written as identifiers (e.g. 'StandardScaler.fit', 'data-viz', 'my_func')
+NAME = r"[`'\"]?(?P<{}>[\w.\-]+)[`'\"]?"
+
+# Words captured as names by the patterns that do not name anything in the graph
+NON_NAMES = {"it", "this", "that", "these", "those", "them", "one", "a", "an", "the"}
+ENTITY_KIND = r"(?:the\s+)?(?:function\s+|class\s+|method\s+)?"
+DEPENDENCIES_QUERY = (
+    "MATCH (e)-[r:DEPENDS_ON]->(n) WHERE (e:Function OR e:Class OR e:Method) AND toLower(e.name) = $entity "
+    f"RETURN e.name AS entity, r.depth AS depth, {NODE_PROJECTION} AS node ORDER BY r.depth LIMIT 10"
+)
+
+# (intent, pattern of the normalized question, Cypher, whose parameters are the groups matched)
+QUERY_TEMPLATES = [
+    (
+        "entity_in_framework",
+        re.compile(r"\b(?:function|class|method)\s+" + NAME.format("entity") + r"\s+(?:in|of|from)\s+(?:the\s+)?"
+                   r"(?:framework\s+)?" + NAME.format("framework") + r"(?:\s+framework)?\b"),
+        "MATCH (f:Framework)-[:CONTAINS_FUNCTION|CONTAINS_CLASS|CONTAINS_METHOD*1..2]->(n) "
+        "WHERE toLower(f.name) = $framework AND (toLower(n.name) = $entity OR toLower(n.name) ENDS WITH '.' + $entity) "
+        f"RETURN {NODE_PROJECTION} AS node LIMIT 5",
+    ),
+    (
+        "framework_contents",
+        re.compile(r"\b(?:what(?:'s| is| does)?|list|show)\b.*?\b(?:in|inside|of|contain(?:s|ed)?)\s+(?:the\s+)?"
+                   + NAME.format("framework") + r"\s+framework\b"),
+        "MATCH (f:Framework)-[:CONTAINS_FUNCTION|CONTAINS_CLASS]->(n) WHERE toLower(f.name) = $framework "
+        "RETURN n.name AS name, labels(n)[0] AS label, n.description AS description LIMIT 50",
+    ),
+    (
+        "entity_dependencies",
+        re.compile(r"\bdependencies of\s+" + ENTITY_KIND + NAME.format("entity") + r"(?=\s|$)"),
+        DEPENDENCIES_QUERY,
+    ),
+    (
+        "entity_dependencies",
+        re.compile(r"\bwhat does\s+" + ENTITY_KIND + NAME.format("entity") + r"\s+(?:depend on|need|call)\b"),
+        DEPENDENCIES_QUERY,
+    ),
+    (
+        "entity_callers",
+        re.compile(r"\b(?:what|who|which functions?)\s+(?:calls?|uses?)\s+" + ENTITY_KIND + NAME.format("entity") + r"(?=\s|$)"),
+        "MATCH (n)-[:CALLS]->(e) WHERE (e:Function OR e:Class OR e:Method) AND toLower(e.name) = $entity "
+        f"RETURN e.name AS entity, {NODE_PROJECTION} AS node LIMIT 10",
+    ),
+]
+
+
+def normalize_question(question):
+    """
+    Normalizes a question so trivially different phrasings share a cache entry: lower case,
+    single spaces and no trailing punctuation.
+    """
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip("?!. ")
+
+
+def match_template(question, frameworks=None):
+    """
+    Matches a question against the query templates.
+
+    Args:
+        question (str): The question, as sent to the Cypher generation.
+        frameworks (set, optional): Lower-cased names of the Framework nodes. If provided, templates
+            capturing any other word as the framework (e.g. 'function x in production') do not match.
+
+    Returns:
+        dict: Plan with the keys 'query', 'params' and 'source' ('template:<intent>'), or None.
+    """
+    normalized = normalize_question(question)
+    for intent, pattern, query in QUERY_TEMPLATES:
+        match = pattern.search(normalized)
+        if not match or NON_NAMES.intersection(match.groupdict().values()):
+            continue
+        framework = match.groupdict().get('framework')
+        if frameworks is not None and framework is not None and framework not in frameworks:
+            continue
+        return {'query': query, 'params': match.groupdict(), 'source': f"template:{intent}"}
+    return None
+
+
+class CypherPlanner:
+    """
+    Plans the Cypher query of a question from the templates or the cache of generated queries.
+    """
+    def __init__(self, max_plans=DEFAULT_MAX_PLANS):
+        """
+        Args:
+            max_plans (int): Maximum number of generated queries cached, the least recently used are evicted.
+        """
+        self.max_plans = max_plans
+        self._plans = OrderedDict()  # (normalized question, graph version) -> query
+        self._lock = threading.Lock()
+        self.counts = {'template': 0, 'cache': 0, 'linker': 0, 'llm': 0}
+
+    def plan(self, question, graph_version, entity_linker=None):
+        """
+        Returns the plan of a question, or None if the query has to be generated by the LLM.
+
+        Args:
+            question (str): The question, as sent to the Cypher generation.
+            graph_version: Version of the graph (and its schema) the query runs on.
+            entity_linker (EntityLinker, optional): Plans the questions naming nodes of the graph
+                that neither the templates nor the cache can plan. Its Framework names are used to
+                check the frameworks captured by the templates.
+
+        Returns:
+            dict: Plan with the keys 'query', 'params' and 'source', or None.
+        """
+        frameworks = entity_linker.names("Framework") if entity_linker is not None else None
+        plan = match_template(question, frameworks)
+        key = (normalize_question(question), graph_version)
+        with self._lock:
+            if plan is None and key in self._plans:
+                self._plans.move_to_end(key)
+                plan = {'query': self._plans[key], 'params': {}, 'source': "cache"}
+        if plan is None and entity_linker is not None:
+            plan = entity_linker.plan(question)
+        with self._lock:
+            self.counts[plan['source'].split(":")[0] if plan else 'llm'] += 1
+        if plan is not None:
+            logger.debug("Cypher plan from %s for %r", plan['source'], question)
+        return plan
+
+    def store(self, question, graph_version, query):
+        """
+        Caches a query generated by the LLM, once it ran without errors.
+        """
+        key = (normalize_question(question), graph_version)
+        with self._lock:
+            self._plans[key] = query
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Number of queries planned from each source and the share not sent to the LLM.
+        """
+        with self._lock:
+            total = sum(self.counts.values())
+            return {**self.counts, 'cached_plans': len(self._plans),
+                    'llm_bypass_rate': (total - self.counts['llm']) / total if total else 0.0}
+
+
+# Shared by every QA_Rag of the process
+cypher_planner = CypherPlanner()
@@ -0,0 +1,93 @@
+"""
+Cache of the query embeddings computed by the RAG pipeline.
+
+Every question is embedded on CPU by the retriever (and by the answer cache), and the same
+questions come back often. The wrapper keeps the vectors in an in-memory LRU keyed by the
+normalized text and, optionally, in the SQLite store used by the ingest for the node embeddings
+(keyed by model name and text hash), so frequent questions skip the model entirely.
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from src.utils.parse_directory_to_KT.embeddings import EmbeddingStore, hash_text
+
+DEFAULT_MAX_ENTRIES = 10000
+
+
+def normalize_text(text):
+    """Collapses the whitespace of a text, which does not change its meaning for the model."""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper reusing the vectors of the questions already embedded.
+    """
+    def __init__(self, embeddings, model_name, cache_path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            embeddings (Embeddings): The embedding model wrapped.
+            model_name (str): Name of the model, part of the key of the vectors persisted.
+            cache_path (str, optional): SQLite file where the vectors are persisted between runs.
+            max_entries (int): Maximum number of vectors kept in memory, the least recently used are evicted.
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.store = EmbeddingStore(cache_path) if cache_path else None
+        self._vectors = OrderedDict()  # normalized text -> vector
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _remember(self, text, vector):
+        self._vectors[text] = vector
+        self._vectors.move_to_end(text)
+        while len(self._vectors) > self.max_entries:
+            self._vectors.popitem(last=False)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Documents are embedded once, by the ingest, so they are not cached."""
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embeds a question, reusing the vector of the same normalized text if it was already embedded.
+        """
+        key = normalize_text(text)
+        with self._lock:
+            if key in self._vectors:
+                self._vectors.move_to_end(key)
+                self.hits += 1
+                return self._vectors[key]
+            if self.store is not None:
+                stored = self.store.get_many(self.model_name, [hash_text(key)])
+                if stored:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._remember(key, stored[hash_text(key)].tolist())
+                    return self._vectors[key]
+
+        # The model runs outside the lock, so other questions are served from the cache meanwhile
+        vector = self.embeddings.embed_query(key)
+        with self._lock:
+            self.misses += 1
+            self._remember(key, vector)
+            if self.store is not None:
+                self.store.put_many(self.model_name, {hash_text(key): vector})
+        return vector
+
+    def stats(self):
+        """
+        Returns:
+            dict: Number of vectors in memory, hits (from memory or disk), misses and the hit rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._vectors), 'hits': self.hits, 'disk_hits': self.disk_hits,
+                    'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,228 @@
+"""
+Entity linking of questions to the nodes of the graph, without the LLM.
+
+Most questions name a function, class or framework of the graph (`scale_features`,
+`SimpleDataset`, `pytorch`). The names of every node are loaded into an Aho-Corasick automaton,
+which finds all the names mentioned in a question in a single pass over it, with a fuzzy
+fallback for misspelled identifiers. The nodes found and their neighbourhoods are then fetched
+with a single query by element id. The names are loaded again when the graph version changes.
+"""
+import re
+import difflib
+import logging
+import threading
+from collections import deque
+
+from src.utils.parse_directory_to_KT.schema import GRAPH_VERSION_LABEL
+
+logger = logging.getLogger(__name__)
+
+# Names shorter than this are too ambiguous to link (e.g. 'fit', 'run')
+DEFAULT_MIN_NAME_LENGTH = 4
+DEFAULT_MAX_ENTITIES = 5
+DEFAULT_MAX_NEIGHBOURS = 10
+DEFAULT_FUZZY_CUTOFF = 0.85
+# Words of a question that are never looked up with the fuzzy fallback
+FUZZY_STOPWORDS = {
+    "function", "functions", "class", "classes", "method", "methods", "framework", "frameworks", "example",
+    "using", "which", "where", "there", "about", "would", "could", "should", "please", "implement",
+    "implementation", "return", "returns", "create", "explain", "python", "library",
+}
+
+ENTITY_NAMES_QUERY = (
+    f"MATCH (n) WHERE n.name IS NOT NULL AND NOT n:{GRAPH_VERSION_LABEL} "
+    "RETURN elementId(n) AS id, labels(n)[0] AS label, n.name AS name"
+)
+# The nodes found, with the nodes around them, fetched by element id
+NEIGHBOURHOOD_QUERY = (
+    "MATCH (n) WHERE elementId(n) IN $ids "
+    "OPTIONAL MATCH (n)-[r]-(m) WHERE type(r) <> 'DEPENDS_ON' "
+    "WITH n, collect(DISTINCT {relationship: type(r), outgoing: startNode(r) = n, label: labels(m)[0], name: m.name}) AS neighbours "
+    "RETURN n {.*, embedding: Null, text: Null, label: labels(n)[0]} AS node, "
+    "[neighbour IN neighbours WHERE neighbour.name IS NOT NULL][..$max_neighbours] AS neighbours"
+)
+
+
+def _is_identifier_char(char):
+    return char.isalnum() or char == "_"
+
+
+class NameMatcher:
+    """
+    Aho-Corasick automaton finding every occurrence of a set of names in a text.
+    """
+    def __init__(self, names):
+        """
+        Args:
+            names (iterable): Names to find, already lower-cased.
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for name in names:
+            state = 0
+            for char in name:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].append(name)
+
+        # Failure links, in breadth-first order so the ones of shorter prefixes are set first
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find(self, text):
+        """
+        Returns the names found in a text as whole words, longest first where they overlap.
+
+        Args:
+            text (str): Lower-cased text.
+
+        Returns:
+            list: Tuples (start, end, name).
+        """
+        matches = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for name in self._output[state]:
+                start, end = position - len(name) + 1, position + 1
+                if (start == 0 or not _is_identifier_char(text[start - 1])) and \
+                        (end == len(text) or not _is_identifier_char(text[end])):
+                    matches.append((start, end, name))
+
+        selected = []
+        for start, end, name in sorted(matches, key=lambda match: (match[0] - match[1], match[0])):
+            if all(end <= other_start or start >= other_end for other_start, other_end, _ in selected):
+                selected.append((start, end, name))
+        return sorted(selected)
+
+
+class EntityLinker:
+    """
+    Links the names mentioned in a question to the nodes of a graph.
+    """
+    def __init__(self, graph, schema_cache, min_name_length=DEFAULT_MIN_NAME_LENGTH,
+                 max_entities=DEFAULT_MAX_ENTITIES, fuzzy_cutoff=DEFAULT_FUZZY_CUTOFF):
+        """
+        Args:
+            graph (Neo4jGraph): Graph whose node names are linked.
+            schema_cache (SchemaCache): Cache of the graph schema, used to know the graph version.
+            min_name_length (int): Minimum length of the names linked.
+            max_entities (int): Maximum number of nodes linked for a question.
+            fuzzy_cutoff (float): Minimum similarity of a misspelled identifier to a name. 1 disables it.
+        """
+        self.graph = graph
+        self.schema_cache = schema_cache
+        self.min_name_length = min_name_length
+        self.max_entities = max_entities
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._version = None
+        self._schema_refreshes = None
+        self._nodes = {}  # lower-cased name or alias -> [element id]
+        self._names = []
+        self._label_names = {}  # label -> lower-cased names, of any length
+        self._matcher = None
+        self.counts = {'exact': 0, 'fuzzy': 0, 'unlinked': 0}
+
+    def _load(self):
+        nodes = {}
+        label_names = {}
+        for record in self.graph.query(ENTITY_NAMES_QUERY):
+            name = record['name'].lower()
+            label_names.setdefault(record['label'], set()).add(name)
+            if len(name) < self.min_name_length or name.startswith("__"):
+                continue
+            # Names written with spaces in questions ('scale features' for 'scale_features')
+            for key in {name, name.replace("_", " ")}:
+                nodes.setdefault(key, []).append(record['id'])
+        self._nodes = nodes
+        self._names = sorted(nodes)
+        self._label_names = label_names
+        self._matcher = NameMatcher(self._names)
+        logger.info("Entity linker loaded %d names", len(self._names))
+
+    def _refresh(self):
+        version = self.schema_cache.get_version()
+        with self._lock:
+            # Without a version marker, names are loaded again whenever the schema expires
+            stale = version != self._version or (version is None and self.schema_cache.refreshes != self._schema_refreshes)
+            if not self._loaded or stale:
+                self._load()
+                self._loaded = True
+                self._version = version
+                self._schema_refreshes = self.schema_cache.refreshes
+            return self._matcher, self._nodes, self._names
+
+    def link(self, question):
+        """
+        Finds the nodes named in a question.
+
+        Args:
+            question (str): The question.
+
+        Returns:
+            list: Element ids of the nodes found, in order of appearance.
+        """
+        matcher, nodes, names = self._refresh()
+        text = question.lower()
+        found = [name for _, _, name in matcher.find(text)]
+        kind = 'exact'
+        if not found and self.fuzzy_cutoff < 1:
+            # Misspelled identifiers ('SimpleDatset'), looked up one word at a time
+            for word in re.findall(r"[\w.]+", text):
+                if len(word) >= max(self.min_name_length, 5) and word not in FUZZY_STOPWORDS:
+                    found += difflib.get_close_matches(word, names, n=1, cutoff=self.fuzzy_cutoff)
+            kind = 'fuzzy'
+
+        ids = []
+        for name in found:
+            ids += [node_id for node_id in nodes[name] if node_id not in ids]
+        ids = ids[:self.max_entities]
+        with self._lock:
+            self.counts[kind if ids else 'unlinked'] += 1
+        if ids:
+            logger.debug("Linked %s to %d nodes (%s)", found, len(ids), kind)
+        return ids
+
+    def names(self, label):
+        """
+        Returns the lower-cased names of the nodes with a label (e.g. every 'Framework'), to check the
+        names captured from a question before they are used in a query.
+        """
+        self._refresh()
+        return self._label_names.get(label, set())
+
+    def plan(self, question, max_neighbours=DEFAULT_MAX_NEIGHBOURS):
+        """
+        Returns the plan of the query fetching the nodes named in a question and their neighbourhoods,
+        or None if no node is named.
+        """
+        ids = self.link(question)
+        if not ids:
+            return None
+        return {'query': NEIGHBOURHOOD_QUERY, 'params': {'ids': ids, 'max_neighbours': max_neighbours},
+                'source': "linker"}
+
+    def stats(self):
+        """
+        Returns:
+            dict: Number of names loaded and of questions linked exactly, fuzzily or not at all.
+        """
+        with self._lock:
+            return {**self.counts, 'names': len(self._names)}
@@ -0,0 +1,33 @@
+"""
+Retriever of the RAG pipeline backed by the local vector index, instead of Neo4jVector.
+
+It returns the same documents as the hybrid Neo4jVector retriever with the retrieval query of
+QA_Rag (node text as content, node properties and closest dependencies as metadata), searching
+the index built from the graph export in the current process, without a Neo4j server.
+"""
+from typing import Any, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+
+class LocalRetriever(BaseRetriever):
+    """
+    Retrieves the nodes closest to a question from a LocalVectorIndex.
+    """
+    index: Any
+    """The LocalVectorIndex searched."""
+    embeddings: Any
+    """Embedding model of the questions, the one used to embed the nodes."""
+    k: int = 4
+    search_type: str = "hybrid"
+    score_threshold: Optional[float] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        results = self.index.search(self.embeddings.embed_query(query), query, k=self.k, search_type=self.search_type)
+        return [
+            Document(page_content=document["text"], metadata={**document["metadata"], "score": score})
+            for document, score in results
+            if self.score_threshold is None or score >= self.score_threshold
+        ]
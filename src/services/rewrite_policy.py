@@ -0,0 +1,88 @@
+"""
+Policy deciding when a question is rewritten with the history of the conversation.
+
+Rewriting a follow-up question into a standalone one costs a full LLM round trip before
+retrieval can start. It is only needed when the question depends on earlier messages, so the
+rewrite is skipped when there is no history, or when a cheap local heuristic finds the question
+self-contained (long enough and without references to earlier messages).
+"""
+import re
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Questions shorter than this are usually follow-ups ("and in pandas?")
+DEFAULT_MIN_WORDS = 5
+# Words and phrases pointing to something said earlier in the conversation ('that' is left out,
+# as it is mostly used as a relative pronoun: "a function that scales features")
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(it|its|this|these|those|they|them|their|former|latter|above|previous|previously|earlier|"
+    r"same|also|again|instead|another|what about|how about|and if|you said|you mentioned)\b",
+    re.IGNORECASE
+)
+# Follow-ups usually start with a conjunction ("and for arrays?", "but faster")
+FOLLOW_UP_START_PATTERN = re.compile(r"^\s*(and|but|or|so|then|also|what about|how about)\b", re.IGNORECASE)
+
+
+class RewritePolicy:
+    """
+    Decides whether a question needs the history rewrite, counting the rewrites skipped.
+    """
+    def __init__(self, min_words=DEFAULT_MIN_WORDS):
+        """
+        Args:
+            min_words (int): Minimum number of words of a question to be considered self-contained.
+        """
+        self.min_words = min_words
+        self._lock = threading.Lock()
+        self.rewritten = 0
+        self.skipped_no_history = 0
+        self.skipped_self_contained = 0
+
+    def is_self_contained(self, question):
+        """
+        Returns whether a question can be understood without the history of the conversation.
+        """
+        if len(question.split()) < self.min_words:
+            return False
+        return not (FOLLOW_UP_START_PATTERN.search(question) or FOLLOW_UP_PATTERN.search(question))
+
+    def should_rewrite(self, history, question):
+        """
+        Args:
+            history (list): Messages of the conversation used for the rewrite.
+            question (str): The current question.
+
+        Returns:
+            bool: Whether the question has to be rewritten with the history.
+        """
+        if not history:
+            reason = "skipped_no_history"
+        elif self.is_self_contained(question):
+            reason = "skipped_self_contained"
+        else:
+            reason = "rewritten"
+        with self._lock:
+            setattr(self, reason, getattr(self, reason) + 1)
+        logger.debug("History rewrite: %s", reason)
+        return reason == "rewritten"
+
+    def stats(self):
+        """
+        Returns:
+            dict: Number of questions rewritten and skipped, and the share of rewrites skipped.
+        """
+        with self._lock:
+            skipped = self.skipped_no_history + self.skipped_self_contained
+            total = skipped + self.rewritten
+            return {
+                'rewritten': self.rewritten,
+                'skipped_no_history': self.skipped_no_history,
+                'skipped_self_contained': self.skipped_self_contained,
+                'skip_rate': skipped / total if total else 0.0
+            }
+
+
+# Shared by every QA_Rag of the process, so the metrics cover all the conversations
+rewrite_policy = RewritePolicy()
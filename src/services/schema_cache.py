@@ -0,0 +1,129 @@
+"""
+Cache of the graph schema used to generate Cypher, shared by every QA_Rag of the process.
+
+Fetching the schema runs several procedures on Neo4j, and the schema only changes when the
+graph is ingested again. The cache renders a compact schema string once and reuses it until
+the graph version marker bumped by the ingest changes. Graphs without the marker (e.g. loaded
+by other tools) are refreshed after a TTL instead. The marker itself is read at most once per
+check interval, so building the prompt of a question does no database work.
+"""
+import time
+import logging
+import threading
+
+from src.utils.parse_directory_to_KT.schema import GRAPH_VERSION_LABEL, GRAPH_VERSION_QUERY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 600
+DEFAULT_CHECK_INTERVAL_SECONDS = 30
+# Properties that are never useful to write a query (vectors, code offsets and hashes)
+HIDDEN_PROPERTIES = frozenset({
+    "embedding", "text", "start_byte", "end_byte", "chunk_start_lines", "chunk_start_bytes", "code_hash"
+})
+
+
+def render_schema(structured_schema, hidden_properties=HIDDEN_PROPERTIES):
+    """
+    Renders the structured schema of a Neo4jGraph as a compact string for the Cypher prompt.
+
+    Args:
+        structured_schema (dict): Schema with the keys 'node_props', 'rel_props' and 'relationships'.
+        hidden_properties (frozenset): Names of the properties left out.
+
+    Returns:
+        str: One line per label and per relationship pattern.
+    """
+    def properties(props):
+        kept = [f"{prop['property']}: {prop['type']}" for prop in props if prop['property'] not in hidden_properties]
+        return f" {{{', '.join(kept)}}}" if kept else ""
+
+    lines = ["Node labels and properties:"]
+    for label, props in sorted(structured_schema.get("node_props", {}).items()):
+        if label != GRAPH_VERSION_LABEL:
+            lines.append(f"{label}{properties(props)}")
+    rel_props = structured_schema.get("rel_props", {})
+    if rel_props:
+        lines.append("Relationship properties:")
+        for rel_type, props in sorted(rel_props.items()):
+            lines.append(f"{rel_type}{properties(props)}")
+    lines.append("Relationships:")
+    patterns = sorted({(rel['start'], rel['type'], rel['end']) for rel in structured_schema.get("relationships", [])})
+    for start, rel_type, end in patterns:
+        lines.append(f"(:{start})-[:{rel_type}]->(:{end})")
+    return "\n".join(lines)
+
+
+class SchemaCache:
+    """
+    Compact schema of a graph, refreshed when the graph version changes or, without a
+    version marker, when the TTL expires.
+    """
+    def __init__(self, graph, ttl_seconds=DEFAULT_TTL_SECONDS, check_interval_seconds=DEFAULT_CHECK_INTERVAL_SECONDS):
+        """
+        Args:
+            graph (Neo4jGraph): Graph whose schema is cached.
+            ttl_seconds (float): Lifetime of the schema when the graph has no version marker.
+            check_interval_seconds (float): Minimum time between two reads of the version marker.
+        """
+        self.graph = graph
+        self.ttl_seconds = ttl_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self._lock = threading.Lock()
+        self._schema = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self.refreshes = 0
+
+    def _read_version(self):
+        try:
+            result = self.graph.query(GRAPH_VERSION_QUERY)
+        except Exception:
+            logger.exception("Could not read the graph version, keeping the cached schema")
+            return self._version
+        return result[0]["version"] if result else None
+
+    def _is_stale(self, now):
+        if self._schema is None:
+            return True
+        if now - self._checked_at < self.check_interval_seconds:
+            return False
+        self._checked_at = now
+        version = self._read_version()
+        if version is None:
+            return now - self._loaded_at >= self.ttl_seconds
+        return version != self._version
+
+    def _refresh(self, now):
+        # The marker is read before the schema, so an ingest finishing in between triggers another refresh
+        version = self._read_version()
+        self.graph.refresh_schema()
+        self._schema = render_schema(self.graph.structured_schema)
+        self._version = version
+        self._loaded_at = self._checked_at = now
+        self.refreshes += 1
+        logger.info("Graph schema refreshed (version %s)", version)
+
+    def get(self):
+        """
+        Returns the compact schema string, refreshing it first if the graph changed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._is_stale(now):
+                self._refresh(now)
+            return self._schema
+
+    def get_version(self):
+        """
+        Returns the version of the graph the cached schema comes from (None without a version
+        marker), with the same refresh checks as `get`.
+        """
+        self.get()
+        return self._version
+
+    def invalidate(self):
+        """Forces a refresh on the next request."""
+        with self._lock:
+            self._schema = None
@@ -0,0 +1,110 @@
+"""
+Batched writer for the Neo4j graph.
+
+Instead of sending one Cypher statement per node or relationship, the rows are grouped by
+statement and written with `UNWIND $rows AS row ...`, so the number of round trips depends
+on the batch size and not on the number of entities.
+"""
+import time
+
+
+class BatchWriter:
+    """
+    Collects rows for parameterised Cypher statements and writes them in batches.
+    """
+    def __init__(self, db, batch_size=1000, batches_per_transaction=10, on_batch=None):
+        """
+        Args:
+            db: The neomodel database connection.
+            batch_size (int): Maximum number of rows sent in a single statement.
+            batches_per_transaction (int): Number of batches committed together in a transaction.
+            on_batch (callable, optional): Called as `on_batch(statement, rows, seconds)` after each
+                batch is written.
+        """
+        self.db = db
+        self.on_batch = on_batch
+        self.batch_size = batch_size
+        self.batches_per_transaction = batches_per_transaction
+        # Statements are flushed in the order they were first added
+        self._pending = {}
+        self._batches_in_transaction = 0
+        self.rows_written = 0
+        self.batches_written = 0
+        self.write_time = 0.0
+
+    def add(self, statement, row):
+        """
+        Queues a row for a statement, writing the batch once it is full.
+
+        Args:
+            statement (str): Cypher executed for each row, referring to it as `row`
+                (e.g. "MERGE (n:Framework {name: row.name})").
+            row (dict): Parameters of the row.
+        """
+        rows = self._pending.setdefault(statement, [])
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self._write_batch(statement, rows)
+            self._pending[statement] = []
+
+    def _write_batch(self, statement, rows):
+        if not rows:
+            return
+        start = time.perf_counter()
+        if self._batches_in_transaction == 0:
+            self.db.begin()
+        try:
+            self.db.cypher_query(f"UNWIND $rows AS row {statement}", {'rows': rows})
+        except Exception:
+            self.db.rollback()
+            self._batches_in_transaction = 0
+            raise
+        self._batches_in_transaction += 1
+        if self._batches_in_transaction >= self.batches_per_transaction:
+            self._commit()
+        seconds = time.perf_counter() - start
+        self.write_time += seconds
+        self.rows_written += len(rows)
+        self.batches_written += 1
+        if self.on_batch is not None:
+            self.on_batch(statement, len(rows), seconds)
+
+    def _commit(self):
+        if self._batches_in_transaction:
+            self.db.commit()
+            self._batches_in_transaction = 0
+
+    def flush(self):
+        """
+        Writes every pending row and commits the open transaction.
+        Call it between steps that depend on each other, like creating nodes and then
+        the relationships that match them.
+        """
+        for statement, rows in self._pending.items():
+            self._write_batch(statement, rows)
+        self._pending = {}
+        start = time.perf_counter()
+        self._commit()
+        self.write_time += time.perf_counter() - start
+
+    def abort(self):
+        """
+        Drops the pending rows and rolls back the open transaction, when the caller fails before
+        flushing. The batches already committed are kept.
+        """
+        self._pending = {}
+        if self._batches_in_transaction:
+            self.db.rollback()
+            self._batches_in_transaction = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: Rows and batches written, time spent writing and rows written per second.
+        """
+        return {
+            'rows': self.rows_written,
+            'batches': self.batches_written,
+            'seconds': self.write_time,
+            'rows_per_second': self.rows_written / self.write_time if self.write_time else 0.0
+        }
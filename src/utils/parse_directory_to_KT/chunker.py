@@ -0,0 +1,74 @@
+"""
+AST-aware chunking of the source code of classes and functions.
+
+Large entities are split into chunks that fit a token budget, cutting only between
+statements (methods of a class, statements of a function), so each chunk is valid, readable
+code. Chunks are contiguous: joining them gives back the source of the entity, so they are
+stored as the byte/line offsets where each one starts.
+"""
+from bisect import bisect_right
+
+# Rough size of a token in source code, used to estimate the tokens of a span of bytes
+BYTES_PER_TOKEN = 4
+DEFAULT_MAX_TOKENS = 512
+
+
+def _statement_start(statement, line_offsets):
+    # Cut at the beginning of the line, including the decorators of classes and functions
+    first_line = min([statement.lineno] + [decorator.lineno for decorator in getattr(statement, 'decorator_list', [])])
+    return line_offsets[first_line - 1]
+
+
+def _cut_points(node, start, end, line_offsets, max_bytes):
+    """
+    Returns the byte offsets (between `start` and `end`) where the source of a node is cut.
+    """
+    body = getattr(node, 'body', None)
+    if end - start <= max_bytes or not isinstance(body, list):
+        return []
+
+    cuts = []
+    chunk_start = start
+    for statement in body:
+        statement_start = _statement_start(statement, line_offsets)
+        statement_end = line_offsets[statement.end_lineno - 1] + statement.end_col_offset
+        if statement_end - chunk_start > max_bytes and statement_start > chunk_start:
+            cuts.append(statement_start)
+            chunk_start = statement_start
+        if statement_end - statement_start > max_bytes:
+            # A single statement over the budget is split by its own body, if it has one
+            inner_cuts = _cut_points(statement, statement_start, statement_end, line_offsets, max_bytes)
+            inner_cuts = [cut for cut in inner_cuts if cut > chunk_start]
+            if inner_cuts:
+                cuts.extend(inner_cuts)
+                chunk_start = inner_cuts[-1]
+    return cuts
+
+
+def chunk_node(node, start_byte, end_byte, line_offsets, max_tokens=DEFAULT_MAX_TOKENS):
+    """
+    Splits the source of a class or function into token-budgeted chunks.
+
+    Args:
+        node (ast.AST): The class or function definition.
+        start_byte (int): Byte offset where the source of the node starts.
+        end_byte (int): Byte offset where the source of the node ends.
+        line_offsets (list): Byte offset where each line of the file starts.
+        max_tokens (int): Approximate maximum number of tokens per chunk. A single statement
+            without a body can still exceed it.
+
+    Returns:
+        tuple: Lists with the start line and the start byte of each chunk. Each chunk ends
+            where the next one starts, and the last one at the end of the node.
+    """
+    cuts = _cut_points(node, start_byte, end_byte, line_offsets, max_tokens * BYTES_PER_TOKEN)
+    start_bytes = [start_byte] + cuts
+    start_lines = [bisect_right(line_offsets, offset) for offset in start_bytes]
+    return start_lines, start_bytes
+
+
+def estimate_tokens(text):
+    """
+    Returns the approximate number of tokens of a text.
+    """
+    return len(text.encode("utf-8")) // BYTES_PER_TOKEN + 1
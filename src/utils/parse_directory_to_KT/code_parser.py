@@ -0,0 +1,178 @@
+"""
+Parsing of Python files into the entities (classes, functions and methods) of the knowledge graph.
+"""
+import ast
+import hashlib
+import builtins
+
+from .chunker import chunk_node, DEFAULT_MAX_TOKENS
+
+# Calls to builtins never resolve to entities of the repository, so they are not kept
+BUILTIN_NAMES = set(dir(builtins))
+
+
+def get_dotted_name(node):
+    """
+    Returns the dotted name of a Name or Attribute chain (e.g. 'np.linalg.norm'), or None
+    if the chain does not start with a name.
+    """
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+class CodeEntityVisitor(ast.NodeVisitor):
+    """
+    Collects the classes, standalone functions and methods of a module in a single pass,
+    keeping track of the class enclosing each function, the imports of the module and the
+    names called and used by each entity.
+    """
+    def __init__(self, file_bytes, max_chunk_tokens=DEFAULT_MAX_TOKENS):
+        """
+        Args:
+            file_bytes (bytes): Source code of the module, as stored on disk.
+            max_chunk_tokens (int): Approximate maximum number of tokens of each code chunk.
+        """
+        self.file_bytes = file_bytes
+        self.max_chunk_tokens = max_chunk_tokens
+        # Byte offset where each line starts, so source segments are sliced in constant time
+        self.line_offsets = [0]
+        for line in self.file_bytes.splitlines(keepends=True):
+            self.line_offsets.append(self.line_offsets[-1] + len(line))
+        self.scope = []  # Enclosing classes and functions, as ('class'|'function', name)
+        self.entity_stack = []  # Entities receiving the names used, nested functions add to their parent
+        self.imports = {}  # Bound name -> imported dotted name, relative ones starting with dots
+        self.classes = []
+        self.functions = []
+        self.methods = []
+
+    def get_byte_span(self, node):
+        start = self.line_offsets[node.lineno - 1] + node.col_offset
+        end = self.line_offsets[node.end_lineno - 1] + node.end_col_offset
+        return start, end
+
+    def build_entity(self, node):
+        # Only the location of the code is kept, the source is loaded from disk when needed
+        start_byte, end_byte = self.get_byte_span(node)
+        chunk_start_lines, chunk_start_bytes = chunk_node(
+            node, start_byte, end_byte, self.line_offsets, self.max_chunk_tokens)
+        return {
+            'name': node.name,
+            'description': ast.get_docstring(node) or "",
+            'start_line': node.lineno,
+            'end_line': node.end_lineno,
+            'start_byte': start_byte,
+            'end_byte': end_byte,
+            'chunk_start_lines': chunk_start_lines,
+            'chunk_start_bytes': chunk_start_bytes,
+            'code_hash': hashlib.sha256(self.file_bytes[start_byte:end_byte]).hexdigest(),
+            'calls': set(),
+            'references': set()
+        }
+
+    def visit_entity(self, node, entity):
+        self.entity_stack.append(entity)
+        self.generic_visit(node)
+        self.entity_stack.pop()
+
+    def visit_ClassDef(self, node):
+        entity = self.build_entity(node)
+        self.classes.append(entity)
+        self.scope.append(('class', node.name))
+        self.visit_entity(node, entity)
+        self.scope.pop()
+
+    def visit_FunctionDef(self, node):
+        entity = None
+        if not self.scope:
+            entity = self.build_entity(node)
+            self.functions.append(entity)
+        elif self.scope[-1][0] == 'class':
+            class_name = self.scope[-1][1]
+            entity = self.build_entity(node)
+            entity.update({
+                'name': f"{class_name}.{node.name}",
+                'method_name': node.name,
+                'class_name': class_name
+            })
+            self.methods.append(entity)
+        self.scope.append(('function', node.name))
+        if entity is None:
+            # Functions nested in other functions are part of their code, not entities on their own
+            self.generic_visit(node)
+        else:
+            self.visit_entity(node, entity)
+        self.scope.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            # `import a.b` binds `a`, `import a.b as c` binds `c` to `a.b`
+            if alias.asname:
+                self.imports[alias.asname] = alias.name
+            else:
+                self.imports[alias.name.split('.')[0]] = alias.name.split('.')[0]
+
+    def visit_ImportFrom(self, node):
+        module = "." * node.level + (node.module or "")
+        for alias in node.names:
+            if alias.name != '*':
+                separator = "" if module.endswith(".") else "."
+                self.imports[alias.asname or alias.name] = f"{module}{separator}{alias.name}"
+
+    def visit_Call(self, node):
+        name = get_dotted_name(node.func)
+        if self.entity_stack and name and name not in BUILTIN_NAMES:
+            self.entity_stack[-1]['calls'].add(name)
+        self.generic_visit(node)
+
+    def visit_Name(self, node):
+        if self.entity_stack and isinstance(node.ctx, ast.Load):
+            self.entity_stack[-1]['references'].add(node.id)
+
+    def visit_Attribute(self, node):
+        name = get_dotted_name(node)
+        if name is None:
+            self.generic_visit(node)
+        elif self.entity_stack and isinstance(node.ctx, ast.Load):
+            self.entity_stack[-1]['references'].add(name)
+
+    def finalize(self):
+        """
+        Converts the names used by each entity to sorted lists, keeping as references only
+        the names bound by an import, which may point to entities of other modules.
+        """
+        for entity in self.classes + self.functions + self.methods:
+            entity['calls'] = sorted(entity['calls'])
+            entity['references'] = sorted(
+                name for name in entity['references'] if name.split('.')[0] in self.imports)
+
+
+def parse_python_file(file_path):
+    """
+    Parses a Python file to extract class names, their docstrings, and functions with their details.
+    
+    Args:
+        file_path (str): The path of the Python file to parse.
+
+    Returns:
+        dict: A dictionary containing lists of classes, standalone functions and methods with their
+            details, source span, code chunks, code hash and the names they call and import.
+            Methods are named '<class>.<method>' and keep the name of their class. The imports
+            of the module are returned under 'imports'.
+    """
+    with open(file_path, "rb") as file:
+        file_bytes = file.read()
+
+    visitor = CodeEntityVisitor(file_bytes)
+    visitor.visit(ast.parse(file_bytes))
+    visitor.finalize()
+
+    return {"functions": visitor.functions, "classes": visitor.classes, "methods": visitor.methods,
+            "imports": visitor.imports}
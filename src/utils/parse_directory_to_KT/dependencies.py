@@ -0,0 +1,215 @@
+"""
+Dependencies between the code entities of the repository.
+
+The parser records the imports of each module and the names called (CALLS) and imported
+names used (IMPORTS) by each class, function and method. Those names are resolved here to
+the entities of the repository they point to, and the dependency closure of each entity (every
+entity reachable through CALLS and IMPORTS up to a given depth) is precomputed as DEPENDS_ON
+relationships, so an entity is retrieved together with everything it needs in a single lookup.
+"""
+import os
+from collections import deque
+
+from .manifest import ENTITY_LABELS
+
+DEFAULT_DEPENDENCY_DEPTH = 3
+
+# Deletes the CALLS and IMPORTS relationships from the entities of a file, before writing it again
+DELETE_DEPENDENCIES_STATEMENT = "MATCH (n:{label} {{file_path: row.file_path}})-[r:CALLS|IMPORTS]->() DELETE r"
+
+# Links two entities, both merged before by their key
+DEPENDENCY_STATEMENT = (
+    "MATCH (a:{label} {{name: row.name, file_path: row.file_path}}) "
+    "MATCH (b:{target_label} {{name: row.target_name, file_path: row.target_file_path}}) "
+    "MERGE (a)-[:{rel_type}]->(b)"
+)
+
+# Replaces the DEPENDS_ON relationships of an entity with its current closure, keeping the
+# distance to each dependency
+CLOSURE_STATEMENT = (
+    "MATCH (n:{label} {{name: row.name, file_path: row.file_path}}) "
+    "OPTIONAL MATCH (n)-[old:DEPENDS_ON]->() "
+    "DELETE old "
+    "WITH DISTINCT n "
+    "MATCH p = (n)-[:CALLS|IMPORTS*1..{depth}]->(d) "
+    "WHERE d <> n "
+    "WITH n, d, min(length(p)) AS distance "
+    "MERGE (n)-[r:DEPENDS_ON]->(d) "
+    "SET r.depth = distance"
+)
+
+# Entities whose closure includes some entity of the given files
+UPSTREAM_QUERY = (
+    "UNWIND $file_paths AS file_path "
+    "MATCH (u)-[:DEPENDS_ON]->(:{label} {{file_path: file_path}}) "
+    "RETURN DISTINCT labels(u)[0], u.name, u.file_path"
+)
+
+
+def _module_parts(relative_file_path):
+    parts = os.path.splitext(relative_file_path)[0].split(os.sep)
+    return parts[:-1] if parts[-1] == '__init__' else parts
+
+
+class SymbolIndex:
+    """
+    Index of the entities defined in each file of the repository, used to resolve names.
+    """
+    def __init__(self):
+        self.files = {}  # relative_file_path -> {entity name: label}
+        self._by_name = {}  # entity name -> [relative_file_path]
+        self._modules = {}  # dotted module path, as a tuple -> relative_file_path
+
+    def add_file(self, relative_file_path, entities):
+        """
+        Args:
+            relative_file_path (str): Path of the file relative to the ingested directory.
+            entities (dict): Names of the entities of the file, by parsed key ('classes', 'functions', 'methods').
+        """
+        symbols = {}
+        for key, label in ENTITY_LABELS.items():
+            for name in entities.get(key, []):
+                symbols[name] = label
+                self._by_name.setdefault(name, []).append(relative_file_path)
+        self.files[relative_file_path] = symbols
+        self._modules[tuple(_module_parts(relative_file_path))] = relative_file_path
+
+    def add_parsed_file(self, relative_file_path, parsed_data):
+        self.add_file(relative_file_path, {
+            key: [item['name'] for item in parsed_data.get(key, [])] for key in ENTITY_LABELS
+        })
+
+    def _lookup(self, relative_file_path, name):
+        label = self.files.get(relative_file_path, {}).get(name)
+        return (label, name, relative_file_path) if label else None
+
+    def _resolve_in_module(self, parts):
+        # The longest prefix that is a module of the repository is the module imported, the rest
+        # is the name inside it
+        for split in range(len(parts) - 1, 0, -1):
+            module, name = tuple(parts[:split]), ".".join(parts[split:])
+            file_path = self._modules.get(module)
+            if file_path is None:
+                continue
+            found = self._lookup(file_path, name)
+            if found is None and os.path.basename(file_path) == '__init__.py':
+                # Names re-exported by a package, resolved when a single entity of the package has that name
+                candidates = [path for path in self._by_name.get(name, [])
+                              if tuple(_module_parts(path)[:len(module)]) == module]
+                found = self._lookup(candidates[0], name) if len(candidates) == 1 else None
+            return found
+        return None
+
+    def resolve_qualified(self, qualified_name, caller_file_path):
+        """
+        Resolves an imported dotted name (e.g. 'package.module.Class.method' or '.module.function')
+        to an entity of the repository. Names are only resolved when their module is a file of the
+        repository, so the imports of installed libraries (even one named as a folder of the
+        repository, e.g. 'transformers') are never linked to it.
+
+        Returns:
+            tuple: (label, name, relative_file_path) of the entity, or None if it is not in the repository.
+        """
+        level = len(qualified_name) - len(qualified_name.lstrip('.'))
+        parts = qualified_name.lstrip('.').split('.')
+        # The package of the caller is the folder of the file (the package itself for an `__init__.py`)
+        package = [part for part in os.path.dirname(caller_file_path).split(os.sep) if part]
+        if level:
+            # Relative imports are resolved from the package of the caller
+            package = package[:len(package) - (level - 1)] if level > 1 else package
+            return self._resolve_in_module(package + parts)
+        # Absolute imports are resolved from the folder of the caller, first in `sys.path` when it
+        # runs as a script, and from the root of the repository
+        for root in ([package, []] if package else [[]]):
+            found = self._resolve_in_module(root + parts)
+            if found:
+                return found
+        return None
+
+    def resolve(self, name, caller_file_path, class_name, imports):
+        """
+        Resolves a name used inside an entity.
+
+        Args:
+            name (str): Dotted name, as recorded by the parser.
+            caller_file_path (str): File of the entity using the name.
+            class_name (str): Class of the entity, for methods.
+            imports (dict): Imports of the file, as recorded by the parser.
+
+        Returns:
+            tuple: (label, name, relative_file_path) of the entity, or None if it is not in the repository.
+        """
+        parts = name.split('.')
+        if parts[0] in ('self', 'cls'):
+            if class_name and len(parts) == 2:
+                return self._lookup(caller_file_path, f"{class_name}.{parts[1]}")
+            return None
+        # Entities of the same module, including 'Class.method'
+        local = self._lookup(caller_file_path, name)
+        if local:
+            return local
+        if parts[0] in imports:
+            return self.resolve_qualified(".".join([imports[parts[0]], *parts[1:]]), caller_file_path)
+        return None
+
+
+def collect_references(relative_file_path, parsed_data):
+    """
+    Returns the names used by the entities of a parsed file, in a compact form kept until
+    every file has been indexed.
+
+    Returns:
+        tuple: Imports of the file and a list of (label, name, class_name, calls, references).
+    """
+    references = []
+    for key, label in ENTITY_LABELS.items():
+        for item in parsed_data.get(key, []):
+            if item.get('calls') or item.get('references'):
+                references.append((label, item['name'], item.get('class_name'),
+                                   item.get('calls', []), item.get('references', [])))
+    return parsed_data.get('imports', {}), references
+
+
+def resolve_dependencies(symbol_index, relative_file_path, imports, references):
+    """
+    Resolves the names used by the entities of a file.
+
+    Yields:
+        tuple: (label, name, rel_type, target) with rel_type 'CALLS' or 'IMPORTS' and the target
+            as (label, name, relative_file_path).
+    """
+    for label, name, class_name, calls, imported_names in references:
+        for rel_type, used_names in (('CALLS', calls), ('IMPORTS', imported_names)):
+            targets = set()
+            for used_name in used_names:
+                target = symbol_index.resolve(used_name, relative_file_path, class_name, imports)
+                if target and target != (label, name, relative_file_path) and target not in targets:
+                    targets.add(target)
+                    yield label, name, rel_type, target
+
+
+def dependency_closure(edges, depth=DEFAULT_DEPENDENCY_DEPTH):
+    """
+    Computes the dependency closure of each entity from its CALLS and IMPORTS relationships.
+
+    Args:
+        edges (dict): Targets of each entity, keyed by any hashable identifier.
+        depth (int): Maximum number of hops followed.
+
+    Returns:
+        dict: For each entity, the distance to every entity it depends on.
+    """
+    closure = {}
+    for source in edges:
+        distances = {}
+        queue = deque([(source, 0)])
+        while queue:
+            node, distance = queue.popleft()
+            if distance == depth:
+                continue
+            for target in edges.get(node, ()):
+                if target != source and target not in distances:
+                    distances[target] = distance + 1
+                    queue.append((target, distance + 1))
+        closure[source] = distances
+    return closure
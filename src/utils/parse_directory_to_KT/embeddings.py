@@ -0,0 +1,155 @@
+"""
+Precomputation of the node embeddings during the ingest.
+
+The vector index used by the RAG pipeline needs an embedding of each node text. Instead of
+encoding nodes one at a time after the graph is built, entities are encoded in large batches
+while they are written, and the vectors are cached on disk keyed by model name and text hash,
+so re-ingesting unchanged code does not run the model again.
+"""
+import os
+import hashlib
+import sqlite3
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from .entities import node_text
+
+# Same model used by the retriever in QA_Rag
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def hash_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    On-disk cache of embeddings keyed by model name and text hash, stored in SQLite.
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path (str): SQLite file where the vectors are stored.
+        """
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(model TEXT, text_hash TEXT, vector BLOB, PRIMARY KEY (model, text_hash))"
+        )
+
+    def get_many(self, model_name, text_hashes):
+        """
+        Returns:
+            dict: Cached vectors (float32 arrays) for the hashes found.
+        """
+        vectors = {}
+        text_hashes = list(text_hashes)
+        # Keep the number of parameters under the SQLite limit
+        for start in range(0, len(text_hashes), 500):
+            chunk = text_hashes[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(chunk))})",
+                [model_name, *chunk]
+            )
+            for text_hash, vector in rows:
+                vectors[text_hash] = np.frombuffer(vector, dtype=np.float32)
+        return vectors
+
+    def put_many(self, model_name, vectors):
+        """
+        Args:
+            model_name (str): Name of the model that computed the vectors.
+            vectors (dict): Vectors keyed by text hash.
+        """
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+            [(model_name, text_hash, np.asarray(vector, dtype=np.float32).tobytes())
+             for text_hash, vector in vectors.items()]
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+class EntityEmbedder:
+    """
+    Buffers entities and encodes them in batches, reusing the vectors cached on disk.
+    """
+    def __init__(self, model_name=DEFAULT_MODEL_NAME, cache_path=None, batch_size=256,
+                 text_properties=("description",), model=None):
+        """
+        Args:
+            model_name (str): Sentence-transformers model used to encode the texts.
+            cache_path (str, optional): SQLite file used to cache the vectors between runs.
+            batch_size (int): Number of entities encoded together.
+            text_properties (tuple): Node properties included in the embedded text. They have to
+                match the `text_node_properties` of the vector index.
+            model (SentenceTransformer, optional): Already loaded model, to avoid loading it again.
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.text_properties = text_properties
+        self.store = EmbeddingStore(cache_path) if cache_path else None
+        self._model = model
+        self._buffer = []
+        self.encoded = 0
+        self.cached = 0
+
+    @property
+    def model(self):
+        # The model is only loaded if some text is not cached
+        if self._model is None:
+            self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model
+
+    def node_text(self, entity):
+        """
+        Returns the text embedded for an entity.
+        """
+        return node_text(entity, self.text_properties)
+
+    def add(self, entity, item):
+        """
+        Queues an entity, returning the ones encoded once the batch is full.
+
+        Args:
+            entity (CodeEntity): The entity to embed.
+            item: Value returned together with the embedding of the entity (e.g. the row to write).
+
+        Returns:
+            list: Tuples (item, embedding), empty while the batch is not full.
+        """
+        self._buffer.append((self.node_text(entity), item))
+        if len(self._buffer) >= self.batch_size:
+            return self.flush()
+        return []
+
+    def flush(self):
+        """
+        Encodes the queued entities.
+
+        Returns:
+            list: Tuples (item, embedding) of the queued entities, with the embedding as a list of floats.
+        """
+        buffer, self._buffer = self._buffer, []
+        if not buffer:
+            return []
+
+        hashes = [hash_text(text) for text, _ in buffer]
+        vectors = self.store.get_many(self.model_name, set(hashes)) if self.store else {}
+        missing = {text_hash: text for text_hash, (text, _) in zip(hashes, buffer) if text_hash not in vectors}
+        if missing:
+            encoded = self.model.encode(list(missing.values()), batch_size=self.batch_size, convert_to_numpy=True)
+            new_vectors = dict(zip(missing.keys(), encoded.astype(np.float32)))
+            if self.store:
+                self.store.put_many(self.model_name, new_vectors)
+            vectors.update(new_vectors)
+        self.encoded += len(missing)
+        self.cached += len(buffer) - len(missing)
+
+        return [(item, vectors[text_hash].tolist()) for text_hash, (_, item) in zip(hashes, buffer)]
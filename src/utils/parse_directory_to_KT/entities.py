@@ -0,0 +1,222 @@
+"""
+Streaming access to the code entities of a repository.
+
+Instead of building the parsed data of the whole repository at once, the functions in this
+module walk the directory and yield one compact record per class, function or method.
+`iter_code_entities` streams the entities of a whole directory with flat memory, for consumers
+that only need the entities. The graph ingest and the export also write the folder nodes and
+resolve the dependencies from the parsed files, so they use the folder and file level functions.
+"""
+import os
+from typing import NamedTuple
+
+from .code_parser import parse_python_file
+from .parse_cache import ParseCache
+from .node_registry import as_registry
+from .manifest import ENTITY_LABELS
+
+# Parsed keys and the kind of entity they contain
+ENTITY_KINDS = {
+    "classes": "class",
+    "functions": "function",
+    "methods": "method",
+}
+# Label of the nodes of each kind of entity
+ENTITY_KIND_LABELS = {kind: ENTITY_LABELS[key] for key, kind in ENTITY_KINDS.items()}
+
+
+class CodeEntity(NamedTuple):
+    """
+    Class, function or method found in a file of the repository.
+    """
+    file_path: str  # Relative to the ingested directory
+    kind: str  # 'class', 'function' or 'method'
+    name: str  # Methods are named '<class>.<method>'
+    parent_label: str  # Label of the node (Area, SubArea, Framework...) containing the file
+    parent_name: str
+    class_name: str  # Only for methods
+    start_line: int
+    end_line: int
+    start_byte: int
+    end_byte: int
+    chunk_start_lines: list  # Line and byte where each code chunk starts
+    chunk_start_bytes: list
+    docstring: str
+    code_hash: str  # Hash of the source, also its key in the blob store
+
+
+def node_properties(entity):
+    """
+    Returns the properties stored on the node of an entity. The source code is not stored,
+    only its location, so it can be loaded lazily when the node is used.
+
+    Args:
+        entity (CodeEntity): The entity.
+
+    Returns:
+        dict: Properties of the node, besides its name.
+    """
+    properties = {
+        'description': entity.docstring,
+        'file_path': entity.file_path,
+        'start_line': entity.start_line,
+        'end_line': entity.end_line,
+        'start_byte': entity.start_byte,
+        'end_byte': entity.end_byte,
+        'chunk_start_lines': entity.chunk_start_lines,
+        'chunk_start_bytes': entity.chunk_start_bytes,
+        'code_hash': entity.code_hash,
+    }
+    if entity.kind == 'method':
+        properties['method_name'] = entity.name.split('.')[-1]
+        properties['class_name'] = entity.class_name
+    return properties
+
+
+# Node properties available for each entity record
+ENTITY_PROPERTIES = {
+    "name": lambda entity: entity.name,
+    "description": lambda entity: entity.docstring,
+}
+
+
+def node_text(entity, text_properties=("description",)):
+    """
+    Builds the text embedded for an entity, with the same format `Neo4jVector.from_existing_graph`
+    uses for the `text_node_properties` of a node. It is stored as the `text` property of the
+    node, which the keyword index of the retriever is built on.
+
+    Args:
+        entity (CodeEntity): The entity to embed.
+        text_properties (tuple): Node properties included in the text.
+
+    Returns:
+        str: The text to embed.
+    """
+    return "".join(f"\n{prop}: {ENTITY_PROPERTIES[prop](entity) or ''}" for prop in text_properties)
+
+
+def get_node_info(folder_name, nodes_relationships):
+    """
+    Retrieves the node information (label and name) for a given folder based on predefined relationships.
+
+    Args:
+        folder_name (str): The name of the folder to be mapped to a node type.
+        nodes_relationships (list or NodeRegistry): The list containing node types and their relationships.
+            Pass a NodeRegistry when resolving many folders, so the mapping is only indexed once.
+
+    Returns:
+        dict: A dictionary containing the label and name of the node if found, otherwise None.
+    """
+    return as_registry(nodes_relationships).get_node_info(folder_name)
+
+
+def iter_mapped_folders(base_path, nodes_relationships):
+    """
+    Walks a directory yielding the folders that are mapped to a node.
+
+    Args:
+        base_path (str): The base path of the directory.
+        nodes_relationships (list or NodeRegistry): The list containing node types and their relationships.
+
+    Yields:
+        tuple: Node information of the folder and the (file_path, relative_file_path) of its Python files.
+    """
+    registry = as_registry(nodes_relationships)
+    for root, dirs, files in os.walk(base_path):
+        node_info = registry.get_node_info(os.path.basename(root))
+        if node_info:
+            python_files = []
+            for file_name in files:
+                if file_name.endswith('.py'):
+                    file_path = os.path.join(root, file_name)
+                    python_files.append((file_path, os.path.relpath(file_path, base_path)))
+            yield node_info, python_files
+
+
+def iter_mapped_files(base_path, nodes_relationships, file_paths):
+    """
+    Like `iter_mapped_folders`, but only looks at some files of the directory (e.g. the ones that
+    changed) instead of walking it. Files that no longer exist, are not Python files, are outside
+    the directory or whose folder is not mapped are left out.
+
+    Args:
+        base_path (str): The base path of the directory.
+        nodes_relationships (list or NodeRegistry): The list containing node types and their relationships.
+        file_paths (iterable): Paths of the files.
+
+    Yields:
+        tuple: Node information of each folder and the (file_path, relative_file_path) of its Python files.
+    """
+    registry = as_registry(nodes_relationships)
+    folders = {}
+    for file_path in sorted(file_paths):
+        relative_file_path = os.path.relpath(file_path, base_path)
+        if (not file_path.endswith('.py') or relative_file_path.startswith(os.pardir)
+                or not os.path.isfile(file_path)):
+            continue
+        folders.setdefault(os.path.dirname(file_path), []).append((file_path, relative_file_path))
+    for root, python_files in folders.items():
+        node_info = registry.get_node_info(os.path.basename(root))
+        if node_info:
+            yield node_info, python_files
+
+
+def iter_file_entities(relative_file_path, parsed_data, parent_label, parent_name):
+    """
+    Converts the parsed data of a file into entity records.
+
+    Args:
+        relative_file_path (str): Path of the file relative to the ingested directory.
+        parsed_data (dict): Output of `parse_python_file` for the file.
+        parent_label (str): Label of the node containing the file.
+        parent_name (str): Name of the node containing the file.
+
+    Yields:
+        CodeEntity: One record per class, function and method of the file.
+    """
+    for key, kind in ENTITY_KINDS.items():
+        for item in parsed_data.get(key, []):
+            yield CodeEntity(
+                file_path=relative_file_path,
+                kind=kind,
+                name=item['name'],
+                parent_label=parent_label,
+                parent_name=parent_name,
+                class_name=item.get('class_name'),
+                start_line=item['start_line'],
+                end_line=item['end_line'],
+                start_byte=item['start_byte'],
+                end_byte=item['end_byte'],
+                chunk_start_lines=item['chunk_start_lines'],
+                chunk_start_bytes=item['chunk_start_bytes'],
+                docstring=item['description'],
+                code_hash=item['code_hash']
+            )
+
+
+def iter_code_entities(base_path, nodes_relationships, parse_cache=None, workers=None, chunksize=16):
+    """
+    Yields the entities of every Python file inside the mapped folders of a directory, one at a time.
+
+    Args:
+        base_path (str): The base path of the directory.
+        nodes_relationships (list or NodeRegistry): The list containing node types and their relationships.
+        parse_cache (ParseCache, optional): Cache of parsed files. By default results are not kept in memory.
+        workers (int, optional): Number of processes parsing files. Defaults to the number of CPUs.
+        chunksize (int): Number of files sent to each parsing process at once.
+
+    Yields:
+        CodeEntity: The classes, functions and methods found, in file order.
+    """
+    if parse_cache is None:
+        parse_cache = ParseCache(parse_python_file, keep_in_memory=False)
+
+    files = [
+        (node_info, file_path, relative_file_path)
+        for node_info, python_files in iter_mapped_folders(base_path, nodes_relationships)
+        for file_path, relative_file_path in python_files
+    ]
+    entries = parse_cache.iter_entries([file_path for _, file_path, _ in files], workers=workers, chunksize=chunksize)
+    for (node_info, _, relative_file_path), entry in zip(files, entries):
+        yield from iter_file_entities(relative_file_path, entry['result'], node_info['label'], node_info['name'])
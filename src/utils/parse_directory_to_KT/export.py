@@ -0,0 +1,259 @@
+"""
+Export of the parsed repository as files for the Neo4j offline bulk importer.
+
+For a first load of a large codebase, `neo4j-admin database import` is much faster than
+merging each entity with Cypher. Nodes and relationships are written as header-annotated CSV
+files in the layout the importer expects, and optionally as JSONL, so the exported files
+also serve as a reproducible snapshot of the parsed repository.
+"""
+import os
+import csv
+import json
+
+from .code_parser import parse_python_file
+from .parse_cache import ParseCache
+from .node_registry import as_registry
+from .entities import iter_mapped_folders, iter_file_entities, node_properties, node_text
+from .schema import schema_statements, BUMP_GRAPH_VERSION_STATEMENT
+from .local_index import build_local_index
+from .dependencies import DEFAULT_DEPENDENCY_DEPTH, SymbolIndex, collect_references, resolve_dependencies, dependency_closure
+
+# Label of the node and relationship from its container for each kind of entity
+ENTITY_EXPORT = {
+    'class': ('Class', 'CONTAINS_CLASS'),
+    'function': ('Function', 'CONTAINS_FUNCTION'),
+    'method': ('Method', 'CONTAINS_METHOD'),
+}
+
+# Node properties exported for each label, after the id, with their neo4j-admin type
+TAXONOMY_PROPERTIES = ['name']
+ENTITY_PROPERTIES = [
+    'name', 'description', 'file_path', 'start_line:int', 'end_line:int', 'start_byte:int', 'end_byte:int',
+    'chunk_start_lines:int[]', 'chunk_start_bytes:int[]', 'code_hash', 'text'
+]
+METHOD_PROPERTIES = ENTITY_PROPERTIES + ['method_name', 'class_name']
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return ";".join(str(item) for item in value)
+    return value
+
+
+def node_id(label, name, file_path=None):
+    """
+    Identifier of a node in the exported files. Nodes are identified by their key, as they are
+    merged by `create_graph_for_directory`: label and name, plus the file path for code entities.
+    """
+    if file_path is None:
+        return f"{label}:{name}"
+    return f"{label}:{file_path}:{name}"
+
+
+class GraphFileWriter:
+    """
+    Writes nodes and relationships to CSV and/or JSONL files, skipping duplicated nodes.
+    """
+    def __init__(self, output_dir, formats=("csv", "jsonl"), with_embeddings=False):
+        self.output_dir = output_dir
+        self.formats = formats
+        self.with_embeddings = with_embeddings
+        self.node_files = {}
+        self.seen_nodes = set()
+        self.seen_relationships = set()
+        self.node_count = 0
+        self.relationship_count = 0
+        os.makedirs(output_dir, exist_ok=True)
+
+        self._files = []
+        self._relationship_csv = None
+        self._jsonl = None
+        if "csv" in formats:
+            self.relationships_path = os.path.join(output_dir, "relationships.csv")
+            self._relationship_csv = self._open_csv(self.relationships_path, [":START_ID", ":END_ID", ":TYPE", "depth:int"])
+        if "jsonl" in formats:
+            self.jsonl_path = os.path.join(output_dir, "graph.jsonl")
+            self._jsonl = open(self.jsonl_path, "w", encoding="utf-8")
+            self._files.append(self._jsonl)
+
+    def _open_csv(self, path, header):
+        file = open(path, "w", newline="", encoding="utf-8")
+        self._files.append(file)
+        writer = csv.writer(file)
+        writer.writerow(header)
+        return writer
+
+    def _node_csv(self, label, properties, with_embedding):
+        if label not in self.node_files:
+            header = [":ID", *properties, ":LABEL"]
+            if with_embedding:
+                header.insert(-1, "embedding:float[]")
+            path = os.path.join(self.output_dir, f"{label}_nodes.csv")
+            self.node_files[label] = (path, self._open_csv(path, header))
+        return self.node_files[label][1]
+
+    def write_node(self, label, properties, values, embedding=None):
+        """
+        Writes a node unless a node with the same id was already written.
+
+        Args:
+            label (str): Label of the node.
+            properties (list): Names of the exported properties, with their type when it is not a string.
+            values (dict): Values of the properties.
+            embedding (list, optional): Embedding of the node.
+        """
+        identifier = node_id(label, values['name'], values.get('file_path'))
+        if identifier in self.seen_nodes:
+            return
+        self.seen_nodes.add(identifier)
+        self.node_count += 1
+
+        if "csv" in self.formats:
+            row = [identifier, *[_csv_value(values.get(prop.split(':')[0])) for prop in properties], label]
+            # Only the entities (not the Area/SubArea/Framework nodes) have embeddings
+            with_embedding = self.with_embeddings and embedding is not None
+            if with_embedding:
+                row.insert(-1, _csv_value(embedding))
+            self._node_csv(label, properties, with_embedding).writerow(row)
+        if self._jsonl is not None:
+            node = {"type": "node", "id": identifier, "labels": [label],
+                    "properties": {prop.split(':')[0]: values.get(prop.split(':')[0]) for prop in properties}}
+            if embedding is not None:
+                node["properties"]["embedding"] = embedding
+            self._jsonl.write(json.dumps(node) + "\n")
+
+    def write_relationship(self, start_id, end_id, rel_type, depth=None):
+        """
+        Writes a relationship unless it was already written, as MERGE would do.
+        The depth is only set on DEPENDS_ON relationships.
+        """
+        if (start_id, end_id, rel_type) in self.seen_relationships:
+            return
+        self.seen_relationships.add((start_id, end_id, rel_type))
+        self.relationship_count += 1
+        if self._relationship_csv is not None:
+            self._relationship_csv.writerow([start_id, end_id, rel_type, _csv_value(depth)])
+        if self._jsonl is not None:
+            relationship = {"type": "relationship", "start": start_id, "end": end_id, "label": rel_type}
+            if depth is not None:
+                relationship["properties"] = {"depth": depth}
+            self._jsonl.write(json.dumps(relationship) + "\n")
+
+    def import_command(self, database="graphrag"):
+        """
+        Returns:
+            str: The `neo4j-admin` command loading the exported CSV files into an empty database.
+        """
+        nodes = " ".join(f"--nodes={label}={path}" for label, (path, _) in self.node_files.items())
+        return (f"neo4j-admin database import full {nodes} --relationships={self.relationships_path} "
+                f"--multiline-fields=true --array-delimiter=';' {database}")
+
+    def close(self):
+        for file in self._files:
+            file.close()
+
+
+def export_graph_files(base_path, nodes_relationships, output_dir, formats=("csv", "jsonl"),
+                       parse_cache=None, workers=None, chunksize=16, embedder=None, database="graphrag",
+                       dependency_depth=DEFAULT_DEPENDENCY_DEPTH, local_index_dir=None):
+    """
+    Exports the graph that `create_graph_for_directory` would create as files for the offline importer.
+
+    Args:
+        base_path (str): The base path of the directory to export.
+        nodes_relationships (list or NodeRegistry): The list containing node types and their relationships.
+        output_dir (str): Folder where the files are written.
+        formats (tuple): 'csv' (neo4j-admin import layout) and/or 'jsonl'.
+        parse_cache (ParseCache, optional): Cache of parsed files.
+        workers (int, optional): Number of processes parsing files. Defaults to the number of CPUs.
+        chunksize (int): Number of files sent to each parsing process at once.
+        embedder (EntityEmbedder, optional): If provided, the embeddings of the entities are exported too.
+        database (str): Name of the database used in the import command.
+        dependency_depth (int): Depth of the dependency closure exported as DEPENDS_ON relationships.
+        local_index_dir (str, optional): If provided, the local vector index of the retriever is built
+            there from the JSONL export. Requires the 'jsonl' format and an embedder.
+
+    Returns:
+        dict: Number of nodes and relationships exported, the statements creating the constraints
+            and indexes (to run once the files are imported), for CSV, the import command and, with
+            `local_index_dir`, the description of the local index.
+    """
+    if local_index_dir and ("jsonl" not in formats or embedder is None):
+        raise ValueError("The local index is built from the JSONL export with embeddings")
+    registry = as_registry(nodes_relationships)
+    if parse_cache is None:
+        parse_cache = ParseCache(parse_python_file, keep_in_memory=False)
+    writer = GraphFileWriter(output_dir, formats=formats, with_embeddings=embedder is not None)
+
+    def write_entity(entity, embedding=None):
+        label, rel_type = ENTITY_EXPORT[entity.kind]
+        # The keyword index of the retriever is built on the text, with or without the embeddings
+        text = node_text(entity) if embedder is None else embedder.node_text(entity)
+        values = {'name': entity.name, **node_properties(entity), 'text': text}
+        properties = METHOD_PROPERTIES if entity.kind == 'method' else ENTITY_PROPERTIES
+        writer.write_node(label, properties, values, embedding)
+        entity_id = node_id(label, entity.name, entity.file_path)
+        if entity.kind == 'method':
+            writer.write_relationship(node_id('Class', entity.class_name, entity.file_path), entity_id, rel_type)
+        else:
+            writer.write_relationship(node_id(entity.parent_label, entity.parent_name), entity_id, rel_type)
+
+    try:
+        files_to_parse = []
+        for node_info, python_files in iter_mapped_folders(base_path, registry):
+            writer.write_node(node_info['label'], TAXONOMY_PROPERTIES, node_info)
+            files_to_parse.extend((node_info, file_path, relative_file_path)
+                                  for file_path, relative_file_path in python_files)
+
+        for item in registry:
+            for rel_type, targets in item.get('relationships', {}).items():
+                for target_name in targets:
+                    target_label = registry.get_label(target_name)
+                    target_id = node_id(target_label, target_name)
+                    # Only relationships between folders present in the directory are created
+                    if target_label and target_id in writer.seen_nodes and node_id(item['label'], item['name']) in writer.seen_nodes:
+                        writer.write_relationship(node_id(item['label'], item['name']), target_id, rel_type.upper())
+
+        entries = parse_cache.iter_entries([file_path for _, file_path, _ in files_to_parse],
+                                           workers=workers, chunksize=chunksize)
+        symbol_index = SymbolIndex()
+        file_references = []
+        for (node_info, _, relative_file_path), entry in zip(files_to_parse, entries):
+            symbol_index.add_parsed_file(relative_file_path, entry['result'])
+            file_references.append((relative_file_path, *collect_references(relative_file_path, entry['result'])))
+            for entity in iter_file_entities(relative_file_path, entry['result'], node_info['label'], node_info['name']):
+                if embedder is None:
+                    write_entity(entity)
+                else:
+                    for queued_entity, embedding in embedder.add(entity, entity):
+                        write_entity(queued_entity, embedding)
+        if embedder is not None:
+            for queued_entity, embedding in embedder.flush():
+                write_entity(queued_entity, embedding)
+
+        # Dependencies between entities, resolved once every file is indexed
+        dependencies = {}
+        for relative_file_path, imports, references in file_references:
+            for label, name, rel_type, target in resolve_dependencies(symbol_index, relative_file_path, imports, references):
+                source_id, target_id = node_id(label, name, relative_file_path), node_id(*target)
+                writer.write_relationship(source_id, target_id, rel_type)
+                dependencies.setdefault(source_id, set()).add(target_id)
+        if dependency_depth:
+            for source_id, distances in dependency_closure(dependencies, dependency_depth).items():
+                for target_id, distance in distances.items():
+                    writer.write_relationship(source_id, target_id, 'DEPENDS_ON', distance)
+    finally:
+        writer.close()
+
+    result = {
+        'nodes': writer.node_count,
+        'relationships': writer.relationship_count,
+        'schema': schema_statements({item['label'] for item in registry}) + [BUMP_GRAPH_VERSION_STATEMENT]
+    }
+    if "csv" in formats:
+        result['import_command'] = writer.import_command(database)
+    if local_index_dir:
+        result['local_index'] = build_local_index(writer.jsonl_path, local_index_dir)
+    return result
@@ -1,212 +1,308 @@
 
 import os
-import ast
-import inspect
+import logging
 from neomodel import db
+from .code_parser import parse_python_file
+from .parse_cache import ParseCache, hash_file_content
+from .manifest import IngestManifest, hash_taxonomy, ENTITY_LABELS
+from .batch_writer import BatchWriter
+from .entities import iter_mapped_folders, iter_mapped_files, iter_file_entities, node_properties, node_text, ENTITY_KIND_LABELS
+from .node_registry import as_registry
+# Defined in this module before the entities module existed, still importable from here
+from .entities import get_node_info
+from .schema import bootstrap_schema, bump_graph_version
+from .instrumentation import IngestMetrics
+from .dependencies import (DEFAULT_DEPENDENCY_DEPTH, DELETE_DEPENDENCIES_STATEMENT, DEPENDENCY_STATEMENT,
+                           CLOSURE_STATEMENT, UPSTREAM_QUERY, SymbolIndex, collect_references,
+                           resolve_dependencies)
 
-def parse_python_file(file_path):
-    """
-    Parses a Python file to extract class names, their docstrings, and functions with their details.
-    
-    Args:
-        file_path (str): The path of the Python file to parse.
+logger = logging.getLogger(__name__)
 
-    Returns:
-        dict: A dictionary containing lists of class names and functions with their details.
+# Removes a Class, Function or Method node, with its relationships, defined in a given file
+DELETE_ENTITY_STATEMENT = "MATCH (n:{label} {{name: row.name, file_path: row.file_path}}) DETACH DELETE n"
+
+# Creates the node `n` of each kind of entity together with the relationship to its container.
+# Entities are merged by name and file path, the key of their uniqueness constraints
+ENTITY_STATEMENTS = {
+    'class': (
+        "MATCH (p:{parent_label} {{name: row.parent_name}}) "
+        "MERGE (n:Class {{name: row.name, file_path: row.file_path}}) "
+        "SET n += row.properties "
+        "MERGE (p)-[:CONTAINS_CLASS]->(n)"
+    ),
+    'function': (
+        "MATCH (p:{parent_label} {{name: row.parent_name}}) "
+        "MERGE (n:Function {{name: row.name, file_path: row.file_path}}) "
+        "SET n += row.properties "
+        "MERGE (p)-[:CONTAINS_FUNCTION]->(n)"
+    ),
+    # The class (defined in the same file) is merged as well, since its row may still be waiting in another batch
+    'method': (
+        "MERGE (c:Class {{name: row.class_name, file_path: row.file_path}}) "
+        "MERGE (n:Method {{name: row.name, file_path: row.file_path}}) "
+        "SET n += row.properties "
+        "MERGE (c)-[:CONTAINS_METHOD]->(n)"
+    ),
+}
+
+# Appended to the entity statements when the embeddings are computed during the ingest
+SET_EMBEDDING_STATEMENT = " SET n.embedding = row.embedding"
+
+def _abort_on_error(writer, entries):
+    """
+    Yields the parsed entries, rolling back the open transaction of the writer if parsing fails
+    (e.g. a file with a syntax error), so the connection can be used by the next run.
     """
-    functions = []
-    classes = []
-
-    with open(file_path, "r") as file:
-        file_content = file.read()
-        tree = ast.parse(file_content)
-
-        class_blocks = []  # To store class code blocks
-
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                class_name = node.name
-                class_docstring = ast.get_docstring(node) or ""
-                class_code = ast.get_source_segment(file_content, node)
-                sanitized_code = " ".join(class_code.splitlines())[:1000]  # Truncate to 1000 chars
-                classes.append({
-                    'name': class_name,
-                    'description': class_docstring[:1000],  # Truncate to 1000 chars
-                    'code': sanitized_code
-                })
-                # Store class blocks to help determine if a function is inside a class
-                class_blocks.append(class_code)
-
-            elif isinstance(node, ast.FunctionDef):
-                func_name = node.name
-                func_docstring = ast.get_docstring(node) or ""
-                func_code = ast.get_source_segment(file_content, node)
-                # Check if the function is inside any class block
-                inside_class = any(func_code in class_code for class_code in class_blocks)
-
-                # If not inside any class block, treat it as a standalone function
-                if not inside_class:
-                    sanitized_code = " ".join(func_code.splitlines())[:1000]  # Truncate to 1000 chars
-                    functions.append({
-                        'name': func_name,
-                        'description': func_docstring[:1000],  # Truncate to 1000 chars
-                        'code': sanitized_code
-                    })
-
-    return {"functions": functions, "classes": classes}
-
-def create_graph_for_directory(db,base_path, nodes_relationships):
+    try:
+        yield from entries
+    except Exception:
+        writer.abort()
+        raise
+
+
+def _log_parse_error(file_path, error):
+    logger.warning("Skipping %s, it could not be parsed: %s", file_path, error)
+
+
+def create_graph_for_directory(db,base_path, nodes_relationships, parse_cache=None, manifest_path=None,
+                               batch_size=1000, batches_per_transaction=10, workers=None, chunksize=16,
+                               embedder=None, blob_store=None, create_schema=True, on_metrics=None,
+                               verbosity="summary", summary_path=None, dependency_depth=DEFAULT_DEPENDENCY_DEPTH,
+                               changed_paths=None, skip_parse_errors=False):
     """
     Iterates over a directory structure and creates nodes and relationships in the Neo4j graph using neomodel.
     
     Args:
         base_path (str): The base path of the directory to start creating nodes and relationships.
-        nodes_relationships (list): The list containing node types and their relationships.
+        nodes_relationships (list or NodeRegistry): The list containing node types and their relationships.
+        parse_cache (ParseCache, optional): Cache of parsed files. Each file is parsed at most once
+            per run; pass a cache with a `cache_dir` to also skip unchanged files across runs.
+        manifest_path (str, optional): Path of the manifest enabling the incremental mode. Only the
+            files added, changed or deleted since the previous run are written, and the nodes of
+            removed classes, functions and methods are deleted from the graph.
+        batch_size (int): Number of rows written by each UNWIND statement.
+        batches_per_transaction (int): Number of batches committed in each transaction.
+        workers (int, optional): Number of processes parsing files. Defaults to the number of CPUs.
+        chunksize (int): Number of files sent to each parsing process at once.
+        embedder (EntityEmbedder, optional): If provided, the written classes, functions and methods are
+            encoded in batches and stored with their `embedding` property.
+        blob_store (BlobStore, optional): If provided, the source of each written entity is stored in it,
+            so `SourceLoader` can still serve it after the file changes.
+        create_schema (bool): Create the constraints and indexes of the graph before writing, so
+            each MERGE uses an index lookup instead of scanning the label.
+        on_metrics (callable, optional): Called as `on_metrics(event, data)` for every parsed 'file',
+            every written 'batch' and with the final 'summary'.
+        verbosity (str): What is logged: 'quiet', 'summary', 'batch' or 'file'.
+        summary_path (str, optional): JSON file where the summary of the run is written.
+        dependency_depth (int): Depth of the dependency closure stored as DEPENDS_ON relationships,
+            following the CALLS and IMPORTS relationships between entities. 0 disables it.
+        changed_paths (iterable, optional): Paths of the only files that may have changed since the
+            previous run (e.g. reported by a file watcher). Only those files are looked at, instead of
+            walking the whole directory; it requires a manifest and is ignored when the mapping changed.
+        skip_parse_errors (bool): Log and skip the files that can not be parsed (e.g. saved halfway)
+            instead of failing the run. They are not recorded in the manifest, so they are parsed
+            again by the next run.
+
+    Returns:
+        dict: Summary of the run, with the statistics of the writes (rows, batches, seconds and rows
+            per second), parse times, entities written per second and batch latencies.
     """
     created_nodes = {}
+    metrics = IngestMetrics(callback=on_metrics, verbosity=verbosity, summary_path=summary_path)
+    # Index the mapping once, for both the folders and the relationship targets
+    registry = as_registry(nodes_relationships)
+    if parse_cache is None:
+        parse_cache = ParseCache(parse_python_file, keep_in_memory=False)
+    if create_schema:
+        bootstrap_schema(db, registry)
+    writer = BatchWriter(db, batch_size=batch_size, batches_per_transaction=batches_per_transaction,
+                         on_batch=metrics.record_batch)
+
+    manifest = IngestManifest(manifest_path) if manifest_path else None
+    taxonomy_hash = hash_taxonomy(registry.nodes_relationships)
+    # The Area/SubArea/Framework nodes only need to be written when the mapping changes
+    write_taxonomy = manifest is None or manifest.taxonomy_hash != taxonomy_hash
+    # Folders with files in the graph, whose nodes were written by a previous run
+    known_parents = {tuple(entry['parent']) for entry in manifest.files.values()} if manifest is not None else set()
+    # The relationships between folders are written again when a folder first appears
+    write_relationships = write_taxonomy
+    seen_files = set()
+    # Files that have to be parsed, in the order they are found
+    files_to_parse = []
+
+    if changed_paths is not None and manifest is not None and not write_taxonomy:
+        # The files that did not change keep their entries, the changed ones are only kept if they still exist
+        changed_paths = set(changed_paths)
+        seen_files.update(set(manifest.files) - {os.path.relpath(path, base_path) for path in changed_paths})
+        mapped_folders = iter_mapped_files(base_path, registry, changed_paths)
+    else:
+        mapped_folders = iter_mapped_folders(base_path, registry)
 
-    # First, create all nodes
-    for root, dirs, files in os.walk(base_path):
-        folder_name = os.path.basename(root)
-        node_info = get_node_info(folder_name, nodes_relationships)
-
-        if node_info:
-            label = node_info['label']
-            node_name = node_info['name']
-
-            # Create parent nodes like Area, SubArea, or Framework
-            if label not in created_nodes:
-                created_nodes[label] = {}
-            if node_name not in created_nodes[label]:
-                query = f"MERGE (n:{label} {{name: $name}}) RETURN n"
-                print("Executing query for node creation:", query)
-                db.cypher_query(query, {'name': node_name})
-                created_nodes[label][node_name] = True
-                print(f"Created node: {label} - {node_name}")
-                print("Runned query--->", f"MERGE (n:{label} name: {node_name}) RETURN n")
-
-            # Process files within the folder to create class and function nodes
-            for file_name in files:
-                if file_name.endswith('.py'):
-                    file_path = os.path.join(root, file_name)
-                    relative_file_path = os.path.relpath(file_path, base_path)
-                    parsed_data = parse_python_file(file_path)
-
-                    # Create nodes for classes
-                    for class_data in parsed_data["classes"]:
-                        query = """
-                        MERGE (c:Class {name: $name})
-                        ON CREATE SET c.description = $description, c.code = $code, c.file_path = $file_path
-                        RETURN c
-                        """
-                        print("Executing query for class node creation:", query)
-                        db.cypher_query(query, {
-                            'name': class_data['name'],
-                            'description': class_data['description'],
-                            'code': class_data['code'],
-                            'file_path': relative_file_path
-                        })
-                        print(f"Created Class node: {class_data['name']} with file path {relative_file_path}")
-                        print("Runned query--->", f"""
-                                        MERGE (c:Class name:{class_data['name']})
-                                        ON CREATE SET c.description = $description, c.code = $code, c.file_path = $file_path
-                                        RETURN c
-                                        """)
-
-                    # Create nodes for standalone functions
-                    for function in parsed_data["functions"]:
-                        query = """
-                        MERGE (f:Function {name: $name})
-                        ON CREATE SET f.description = $description, f.code = $code, f.file_path = $file_path
-                        RETURN f
-                        """
-                        print("Executing query for function node creation:", query)
-                        db.cypher_query(query, {
-                            'name': function['name'],
-                            'description': function['description'],
-                            'code': function['code'],
-                            'file_path': relative_file_path
-                        })
-                        print(f"Created Function node: {function['name']} with file path {relative_file_path}")
-                        print("Query--->", f"""
-                        MERGE (f:Function name:{function['name']})
-                        ON CREATE SET f.description = $description, f.code = $code, f.file_path = $file_path
-                        RETURN f
-                        """)
+    # First, create the nodes of the mapped folders
+    for node_info, python_files in mapped_folders:
+        label = node_info['label']
+        node_name = node_info['name']
+
+        # Select the files within the folder whose classes and functions have to be written
+        files_before = len(files_to_parse)
+        for file_path, relative_file_path in python_files:
+            seen_files.add(relative_file_path)
+
+            if manifest is not None:
+                parent = [label, node_name]
+                mtime = os.stat(file_path).st_mtime_ns
+                if manifest.is_unchanged(relative_file_path, parent, mtime):
+                    continue
+                with open(file_path, "rb") as file:
+                    content_hash = hash_file_content(file.read())
+                if manifest.is_unchanged(relative_file_path, parent, mtime, content_hash):
+                    continue
+            files_to_parse.append((label, node_name, file_path, relative_file_path))
+
+        # Create parent nodes like Area, SubArea, or Framework. When the mapping did not change, only
+        # the ones of the folders with files to write are merged, since the folder may be new
+        has_files = len(files_to_parse) > files_before
+        if label not in created_nodes:
+            created_nodes[label] = {}
+        if (write_taxonomy or has_files) and node_name not in created_nodes[label]:
+            writer.add(f"MERGE (n:{label} {{name: row.name}})", {'name': node_name})
+            created_nodes[label][node_name] = True
+            if has_files and (label, node_name) not in known_parents:
+                write_relationships = True
+
+    # Entities whose dependency closure has to be computed again, as (label, name, file_path)
+    closure_entities = set()
+    # Remove the classes and functions of the files that no longer exist
+    if manifest is not None:
+        removed_files = set()
+        for stale_label, stale_name, stale_path in manifest.remove_missing(seen_files):
+            writer.add(DELETE_ENTITY_STATEMENT.format(label=stale_label),
+                       {'name': stale_name, 'file_path': stale_path})
+            removed_files.add(stale_path)
+        # The closures including entities of the changed files are computed again too
+        changed_files = removed_files | {relative_file_path for *_, relative_file_path in files_to_parse}
+        if dependency_depth and changed_files:
+            for entity_label in ENTITY_LABELS.values():
+                results, _ = db.cypher_query(UPSTREAM_QUERY.format(label=entity_label),
+                                             {'file_paths': sorted(changed_files)})
+                closure_entities.update(tuple(result) for result in results)
+    # The entities of the files moved to another node are merged again under it, so the old nodes
+    # have to be gone before any entity is written
+    if manifest is not None:
+        for label, node_name, _, relative_file_path in files_to_parse:
+            for stale_label, stale_name in manifest.moved_entities(relative_file_path, [label, node_name]):
+                writer.add(DELETE_ENTITY_STATEMENT.format(label=stale_label),
+                           {'name': stale_name, 'file_path': relative_file_path})
+    # Parent nodes have to exist before the entities are linked to them
+    writer.flush()
+
+    # Parse the files in parallel and stream their entities to the writer in file order
+    symbol_index = SymbolIndex()
+    # Names used by the entities, resolved once every file is indexed
+    file_references = []
+    parsed_entries = _abort_on_error(writer, parse_cache.iter_entries(
+        [file_path for _, _, file_path, _ in files_to_parse], workers=workers, chunksize=chunksize,
+        on_parse=metrics.record_file, on_error=_log_parse_error if skip_parse_errors else None))
+    for (label, node_name, file_path, relative_file_path), entry in zip(files_to_parse, parsed_entries):
+        if entry is None:
+            # The entities of the file stay as they were written by the last run that could parse it
+            continue
+        parsed_data = entry['result']
+        # The dependencies of the files written again are replaced by the ones linked below
+        for entity_label in ENTITY_LABELS.values():
+            writer.add(DELETE_DEPENDENCIES_STATEMENT.format(label=entity_label), {'file_path': relative_file_path})
+        if manifest is not None:
+            # Only names no longer defined in the file, which are not merged again below
+            stale_entities = manifest.update(
+                relative_file_path, [label, node_name], entry['mtime'], entry['hash'], parsed_data)
+            for stale_label, stale_name in stale_entities:
+                writer.add(DELETE_ENTITY_STATEMENT.format(label=stale_label),
+                           {'name': stale_name, 'file_path': relative_file_path})
+
+        symbol_index.add_parsed_file(relative_file_path, parsed_data)
+        file_references.append((relative_file_path, *collect_references(relative_file_path, parsed_data)))
+
+        file_content = None
+        if blob_store is not None:
+            with open(file_path, "rb") as file:
+                file_content = file.read()
+
+        for entity in iter_file_entities(relative_file_path, parsed_data, label, node_name):
+            if file_content is not None:
+                blob_store.put(entity.code_hash, file_content[entity.start_byte:entity.end_byte])
+            metrics.count_entity(entity.kind)
+            closure_entities.add((ENTITY_KIND_LABELS[entity.kind], entity.name, entity.file_path))
+            statement = ENTITY_STATEMENTS[entity.kind].format(parent_label=entity.parent_label)
+            # The text is stored, as `Neo4jVector` does, even without an embedder, since the keyword
+            # index is built on it and the vectors may be computed later by `from_existing_graph`
+            text = node_text(entity) if embedder is None else embedder.node_text(entity)
+            row = {
+                'name': entity.name,
+                'file_path': entity.file_path,
+                'parent_name': entity.parent_name,
+                'class_name': entity.class_name,
+                'properties': {**node_properties(entity), 'text': text}
+            }
+            if embedder is None:
+                writer.add(statement, row)
+            else:
+                # The row is written once its batch of entities is encoded
+                for (statement, row), embedding in embedder.add(entity, (statement, row)):
+                    writer.add(statement + SET_EMBEDDING_STATEMENT, {**row, 'embedding': embedding})
+    if embedder is not None:
+        for (statement, row), embedding in embedder.flush():
+            writer.add(statement + SET_EMBEDDING_STATEMENT, {**row, 'embedding': embedding})
+    writer.flush()
+
+    # Link the entities with the ones they call and import, resolved with every file indexed
+    if manifest is not None:
+        for relative_file_path, entry in manifest.files.items():
+            if relative_file_path not in symbol_index.files:
+                symbol_index.add_file(relative_file_path, entry['entities'])
+    for relative_file_path, imports, references in file_references:
+        for entity_label, entity_name, rel_type, target in resolve_dependencies(
+                symbol_index, relative_file_path, imports, references):
+            target_label, target_name, target_file_path = target
+            writer.add(DEPENDENCY_STATEMENT.format(label=entity_label, target_label=target_label, rel_type=rel_type),
+                       {'name': entity_name, 'file_path': relative_file_path,
+                        'target_name': target_name, 'target_file_path': target_file_path})
+    writer.flush()
+
+    # Precompute the dependency closure of the entities
+    if dependency_depth:
+        for entity_label, entity_name, entity_file_path in sorted(closure_entities):
+            writer.add(CLOSURE_STATEMENT.format(label=entity_label, depth=dependency_depth),
+                       {'name': entity_name, 'file_path': entity_file_path})
+        writer.flush()
 
     # Now, establish the relationships after all nodes are created
-    for item in nodes_relationships:
+    for item in (registry if write_relationships else []):
         node_name = item['name']
         label = item['label']
         relationships = item.get('relationships', {})
         
         for rel_type, targets in relationships.items():
             for target_name in targets:
-                target_label = None
                 # Determine the label of the target node
-                for target_item in nodes_relationships:
-                    if target_item['name'] == target_name:
-                        target_label = target_item['label']
-                        break
+                target_label = registry.get_label(target_name)
                 
                 if target_label:
                     # Create relationship based on the target's label
-                    relationship_query = (
-                        f"MATCH (p:{label} {{name: $parent_name}}), (t:{target_label} {{name: $target_name}}) "
-                        f"MERGE (p)-[:{rel_type.upper()}]->(t)"
-                    )
-                    print("Executing relationship query:", relationship_query)
-                    db.cypher_query(relationship_query, {'parent_name': node_name, 'target_name': target_name})
-                    print(f"Created relationship: {label} - {node_name} -> {rel_type.upper()} -> {target_label} - {target_name}")
-                    print("With query--->", f"MATCH (p:{label} name: {node_name}), (t:{target_label} name:{target_name}) ")
-
-    # Establish relationships between Frameworks and their classes/functions
-    for root, dirs, files in os.walk(base_path):
-        folder_name = os.path.basename(root)
-        node_info = get_node_info(folder_name, nodes_relationships)
-
-        if node_info:
-            label = node_info['label']
-            node_name = node_info['name']
-
-            # Process files within the folder to create relationships between frameworks and their classes/functions
-            for file_name in files:
-                if file_name.endswith('.py'):
-                    parsed_data = parse_python_file(os.path.join(root, file_name))
-
-                    # Create relationship between parent node (Framework) and Class
-                    for class_data in parsed_data["classes"]:
-                        relationship_query = (
-                            f"MATCH (p:{label} {{name: $parent_name}}), (c:Class {{name: $class_name}}) "
-                            "MERGE (p)-[:CONTAINS_CLASS]->(c)"
-                        )
-                        print("Executing class relationship query:", relationship_query)
-                        db.cypher_query(relationship_query, {'parent_name': node_name, 'class_name': class_data['name']})
-                        print(f"Created relationship: {label} - {node_name} -> Class {class_data['name']}")
-
-                    # Create relationship between parent node (Framework) and Function
-                    for function in parsed_data["functions"]:
-                        relationship_query = (
-                            f"MATCH (p:{label} {{name: $parent_name}}), (f:Function {{name: $func_name}}) "
-                            "MERGE (p)-[:CONTAINS_FUNCTION]->(f)"
-                        )
-                        print("Executing function relationship query:", relationship_query)
-                        db.cypher_query(relationship_query, {'parent_name': node_name, 'func_name': function['name']})
-                        print(f"Created relationship: {label} - {node_name} -> Function {function['name']}")
-
-def get_node_info(folder_name, nodes_relationships):
-    """
-    Retrieves the node information (label and name) for a given folder based on predefined relationships.
-    
-    Args:
-        folder_name (str): The name of the folder to be mapped to a node type.
-        nodes_relationships (list): The list containing node types and their relationships.
+                    writer.add(
+                        f"MATCH (p:{label} {{name: row.parent_name}}), (t:{target_label} {{name: row.target_name}}) "
+                        f"MERGE (p)-[:{rel_type.upper()}]->(t)",
+                        {'parent_name': node_name, 'target_name': target_name})
 
-    Returns:
-        dict: A dictionary containing the label and name of the node if found, otherwise None.
-    """
-    for item in nodes_relationships:
-        if item['name'].lower() == folder_name.lower():
-            return {'label': item['label'], 'name': item['name']}
-    return None
+    writer.flush()
+
+    if manifest is not None:
+        manifest.taxonomy_hash = taxonomy_hash
+        manifest.save()
+    # Readers caching the schema or results of the graph refresh them
+    if writer.rows_written:
+        bump_graph_version(db)
 
+    extra = {'files_unchanged': len(seen_files) - len(files_to_parse)} if manifest is not None else {}
+    if embedder is not None:
+        extra['embeddings'] = {'encoded': embedder.encoded, 'cached': embedder.cached}
+    return metrics.summary(writer.stats(), **extra)
@@ -0,0 +1,143 @@
+"""
+Instrumentation of the graph ingest.
+
+Timings and counters (parse time of each file, latency of each written batch, entities
+written...) are collected without formatting any message in the hot loop. They are reported
+through an optional callback, through logging at a configurable verbosity, and as a final
+summary that can be saved as JSON.
+"""
+import json
+import time
+import heapq
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Events logged at each verbosity level, each one includes the previous ones
+VERBOSITY_LEVELS = {
+    "quiet": 0,  # Nothing is logged
+    "summary": 1,  # The final summary
+    "batch": 2,  # Every written batch
+    "file": 3,  # Every parsed file
+}
+
+# Number of slowest files to parse kept in the summary
+SLOWEST_FILES = 10
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+class IngestMetrics:
+    """
+    Collects the metrics of an ingest run.
+    """
+    def __init__(self, callback=None, verbosity="summary", summary_path=None):
+        """
+        Args:
+            callback (callable, optional): Called as `callback(event, data)` for every 'file' parsed,
+                every 'batch' written and with the final 'summary'. Event data is only built when a
+                callback is given.
+            verbosity (str): One of 'quiet', 'summary', 'batch' or 'file' (see `VERBOSITY_LEVELS`).
+            summary_path (str, optional): JSON file where the final summary is written.
+        """
+        self.callback = callback
+        self.verbosity = VERBOSITY_LEVELS[verbosity]
+        self.summary_path = summary_path
+        self.start_time = time.perf_counter()
+        self.files_parsed = 0
+        self.files_cached = 0
+        self.parse_seconds = 0.0
+        self.entities = {}
+        self.batch_seconds = []
+        self._slowest_files = []
+
+    def record_file(self, file_path, seconds, cached):
+        """
+        Records a file returned by the parse cache.
+
+        Args:
+            file_path (str): Path of the file.
+            seconds (float): Time spent parsing it, 0 when it was cached.
+            cached (bool): Whether the result came from the cache.
+        """
+        if cached:
+            self.files_cached += 1
+        else:
+            self.files_parsed += 1
+            self.parse_seconds += seconds
+            heapq.heappush(self._slowest_files, (seconds, file_path))
+            if len(self._slowest_files) > SLOWEST_FILES:
+                heapq.heappop(self._slowest_files)
+        if self.callback is not None:
+            self.callback("file", {'file_path': file_path, 'seconds': seconds, 'cached': cached})
+        if self.verbosity >= VERBOSITY_LEVELS["file"]:
+            logger.info("Parsed %s in %.4fs (cached: %s)", file_path, seconds, cached)
+
+    def record_batch(self, statement, rows, seconds):
+        """
+        Records a batch written by the BatchWriter.
+
+        Args:
+            statement (str): Cypher statement of the batch.
+            rows (int): Number of rows of the batch.
+            seconds (float): Time spent writing it, including the commit if it closed a transaction.
+        """
+        self.batch_seconds.append(seconds)
+        if self.callback is not None:
+            self.callback("batch", {'statement': statement, 'rows': rows, 'seconds': seconds})
+        if self.verbosity >= VERBOSITY_LEVELS["batch"]:
+            logger.info("Written %d rows in %.4fs: %s", rows, seconds, statement)
+
+    def count_entity(self, kind):
+        """Counts an entity of the given kind queued for writing."""
+        self.entities[kind] = self.entities.get(kind, 0) + 1
+
+    def summary(self, write_stats, **extra):
+        """
+        Builds the final summary of the run and reports it.
+
+        Args:
+            write_stats (dict): Statistics returned by `BatchWriter.stats`.
+            **extra: Additional values included in the summary.
+
+        Returns:
+            dict: The summary, including the keys of `write_stats`.
+        """
+        elapsed = time.perf_counter() - self.start_time
+        entities = sum(self.entities.values())
+        latencies = sorted(self.batch_seconds)
+        summary = {
+            **write_stats,
+            'elapsed_seconds': elapsed,
+            'files_parsed': self.files_parsed,
+            'files_cached': self.files_cached,
+            'parse_seconds': self.parse_seconds,
+            'slowest_files': [
+                {'file_path': file_path, 'seconds': seconds}
+                for seconds, file_path in sorted(self._slowest_files, reverse=True)
+            ],
+            'entities': entities,
+            'entities_by_kind': dict(self.entities),
+            'entities_per_second': entities / elapsed if elapsed else 0.0,
+            'batch_latency': {
+                'mean': sum(latencies) / len(latencies) if latencies else 0.0,
+                'p50': _percentile(latencies, 0.5),
+                'p95': _percentile(latencies, 0.95),
+                'max': latencies[-1] if latencies else 0.0,
+            },
+            **extra
+        }
+        if self.callback is not None:
+            self.callback("summary", summary)
+        if self.summary_path:
+            with open(self.summary_path, "w") as file:
+                json.dump(summary, file, indent=2)
+        if self.verbosity >= VERBOSITY_LEVELS["summary"]:
+            logger.info("Ingested %d entities from %d files (%d cached) in %.2fs: %d rows in %d batches (%.0f rows/sec)",
+                        entities, self.files_parsed + self.files_cached, self.files_cached, elapsed,
+                        summary['rows'], summary['batches'], summary['rows_per_second'])
+        return summary
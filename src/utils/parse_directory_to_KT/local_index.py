@@ -0,0 +1,239 @@
+"""
+Embedded vector index built from the graph export, an in-process alternative to the Neo4j indexes.
+
+The retriever of the RAG pipeline runs a hybrid (vector and keyword) search on the Neo4j indexes,
+which costs a network round trip per question and needs a running server. The nodes exported
+to JSONL by `export_graph_files`, with their embeddings, are enough to build an equivalent index
+on disk: a normalized float32 or float16 embedding matrix loaded memory-mapped, searched with a
+vectorized top-k (or an HNSW graph when `hnswlib` is installed), and a BM25 index of the node
+texts for the keyword side. Scores are computed as the Neo4j hybrid search does.
+"""
+import os
+import re
+import json
+import math
+import logging
+from collections import Counter
+
+import numpy as np
+
+from .schema import INDEXED_LABEL, EMBEDDING_DIMENSION
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+LOCAL_INDEX_VERSION = 1
+DEFAULT_MAX_DEPENDENCIES = 5
+# Properties of the dependencies kept in the metadata, as the retrieval query of QA_Rag returns them
+DEPENDENCY_PROPERTIES = ('name', 'file_path', 'start_byte', 'end_byte', 'code_hash', 'chunk_start_bytes')
+# Rows of a float16 matrix converted to float32 at once when scoring. float16 halves the size of
+# the matrix but the conversion makes the exhaustive search several times slower, large float16
+# indexes should be searched with HNSW
+SCORE_BLOCK_ROWS = 4096
+
+
+def tokenize(text):
+    """
+    Splits a text into lower-cased words, breaking identifiers (snake_case and CamelCase) into their parts.
+    """
+    words = re.findall(r"[A-Z]+(?![a-z])|[A-Z]?[a-z0-9]+", text or "")
+    return [word.lower() for word in words]
+
+
+def build_local_index(jsonl_path, output_dir, labels=(INDEXED_LABEL,), dtype="float32", hnsw=False,
+                      max_dependencies=DEFAULT_MAX_DEPENDENCIES):
+    """
+    Builds the local index of the nodes exported with their embeddings.
+
+    Args:
+        jsonl_path (str): The `graph.jsonl` file written by `export_graph_files` with an embedder.
+        output_dir (str): Folder where the index is written.
+        labels (tuple): Labels of the nodes indexed, the label of the Neo4j vector index by default.
+        dtype (str): 'float32', or 'float16' to halve the size of the matrix.
+        hnsw (bool): Whether to build an HNSW graph too (requires `hnswlib`).
+        max_dependencies (int): Closest dependencies (DEPENDS_ON) kept in the metadata of each node.
+
+    Returns:
+        dict: Number of nodes indexed, dimension of the embeddings and whether the HNSW graph was built.
+    """
+    nodes = {}
+    dependencies = {}
+    with open(jsonl_path, "r", encoding="utf-8") as file:
+        for line in file:
+            item = json.loads(line)
+            if item["type"] == "node":
+                nodes[item["id"]] = item
+            elif item["label"] == "DEPENDS_ON":
+                dependencies.setdefault(item["start"], []).append((item["properties"]["depth"], item["end"]))
+
+    os.makedirs(output_dir, exist_ok=True)
+    vectors = []
+    with open(os.path.join(output_dir, "documents.jsonl"), "w", encoding="utf-8") as documents:
+        for identifier, node in nodes.items():
+            properties = node["properties"]
+            if not set(node["labels"]) & set(labels) or properties.get("embedding") is None:
+                continue
+            metadata = {key: value for key, value in properties.items() if key not in ("text", "embedding")}
+            metadata["dependencies"] = [
+                {key: nodes[target]["properties"].get(key) for key in DEPENDENCY_PROPERTIES}
+                for _, target in sorted(dependencies.get(identifier, []))[:max_dependencies] if target in nodes
+            ]
+            documents.write(json.dumps({"id": identifier, "text": properties.get("text") or "", "metadata": metadata}) + "\n")
+            vectors.append(properties["embedding"])
+
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1 if vectors else EMBEDDING_DIMENSION)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1, norms)
+    np.save(os.path.join(output_dir, "embeddings.npy"), matrix.astype(dtype))
+
+    built_hnsw = False
+    if hnsw and len(vectors):
+        if hnswlib is None:
+            logger.warning("hnswlib is not installed, the local index is searched exhaustively")
+        else:
+            graph = hnswlib.Index(space="ip", dim=matrix.shape[1])
+            graph.init_index(max_elements=len(vectors), ef_construction=200, M=16)
+            graph.add_items(matrix, np.arange(len(vectors)))
+            graph.save_index(os.path.join(output_dir, "hnsw.bin"))
+            built_hnsw = True
+
+    manifest = {"version": LOCAL_INDEX_VERSION, "count": len(vectors), "dimension": int(matrix.shape[1]),
+                "dtype": dtype, "hnsw": built_hnsw}
+    with open(os.path.join(output_dir, "index.json"), "w") as file:
+        json.dump(manifest, file)
+    return manifest
+
+
+class BM25Index:
+    """
+    Okapi BM25 keyword index over the texts of the documents.
+    """
+    def __init__(self, texts, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> [(document position, term frequency)]
+        lengths = []
+        for position, text in enumerate(texts):
+            terms = tokenize(text)
+            lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                self.postings.setdefault(term, []).append((position, frequency))
+        self.lengths = np.asarray(lengths, dtype=np.float32)
+        self.average_length = float(self.lengths.mean()) if len(lengths) else 0.0
+
+    def scores(self, query):
+        """
+        Returns:
+            dict: BM25 score of each document containing a term of the query, by position.
+        """
+        scores = {}
+        count = len(self.lengths)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term, [])
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, frequency in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[position] / (self.average_length or 1))
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return scores
+
+
+class LocalVectorIndex:
+    """
+    Searches an index built by `build_local_index`, in the current process.
+    """
+    def __init__(self, index_dir, use_hnsw=True, ef=64):
+        """
+        Args:
+            index_dir (str): Folder of the index.
+            use_hnsw (bool): Whether to search the HNSW graph, when it was built and `hnswlib` is installed.
+            ef (int): Size of the candidate list of the HNSW search.
+        """
+        with open(os.path.join(index_dir, "index.json"), "r") as file:
+            self.manifest = json.load(file)
+        # The matrix is paged in by the operating system as it is used
+        self.matrix = np.load(os.path.join(index_dir, "embeddings.npy"), mmap_mode="r")
+        with open(os.path.join(index_dir, "documents.jsonl"), "r", encoding="utf-8") as file:
+            self.documents = [json.loads(line) for line in file]
+        self.hnsw = None
+        hnsw_path = os.path.join(index_dir, "hnsw.bin")
+        if use_hnsw and hnswlib is not None and os.path.exists(hnsw_path):
+            self.hnsw = hnswlib.Index(space="ip", dim=self.manifest["dimension"])
+            self.hnsw.load_index(hnsw_path, max_elements=self.manifest["count"])
+            self.hnsw.set_ef(ef)
+        self._bm25 = None
+
+    @property
+    def bm25(self):
+        if self._bm25 is None:
+            self._bm25 = BM25Index([document["text"] for document in self.documents])
+        return self._bm25
+
+    def _similarities(self, query_vector):
+        if self.matrix.dtype == np.float32:
+            return self.matrix @ query_vector
+        return np.concatenate([
+            self.matrix[start:start + SCORE_BLOCK_ROWS].astype(np.float32) @ query_vector
+            for start in range(0, len(self.matrix), SCORE_BLOCK_ROWS)
+        ])
+
+    def vector_search(self, query_embedding, k):
+        """
+        Returns:
+            list: (position, score) of the k closest documents, with the score of the Neo4j cosine
+                similarity, (1 + cosine) / 2.
+        """
+        if not len(self.documents):
+            return []
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        query_vector = query_vector / (np.linalg.norm(query_vector) or 1)
+        k = min(k, len(self.documents))
+        if self.hnsw is not None:
+            positions, distances = self.hnsw.knn_query(query_vector, k=k)
+            # The inner product distance is 1 - cosine
+            return [(int(position), float((2 - distance) / 2)) for position, distance in zip(positions[0], distances[0])]
+        similarities = self._similarities(query_vector)
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        return [(int(position), float((1 + similarities[position]) / 2)) for position in top]
+
+    def keyword_search(self, query, k):
+        """
+        Returns:
+            list: (position, score) of the k best BM25 matches, with the score divided by the best one,
+                as the Neo4j hybrid search normalizes the fulltext scores.
+        """
+        scores = self.bm25.scores(query)
+        if not scores:
+            return []
+        best = sorted(scores.items(), key=lambda item: -item[1])[:k]
+        top_score = best[0][1]
+        return [(position, float(score / top_score)) for position, score in best]
+
+    def search(self, query_embedding, query, k=4, search_type="hybrid"):
+        """
+        Searches the documents closest to a query.
+
+        Args:
+            query_embedding (list): Embedding of the query.
+            query (str): Text of the query, for the keyword side.
+            k (int): Number of documents returned.
+            search_type (str): 'vector' or 'hybrid'. As in the Neo4j hybrid search, the hybrid scores
+                are the best of the vector and keyword scores, each divided by the best score of its side.
+
+        Returns:
+            list: (document, score) pairs, best first. Documents are dicts with 'id', 'text' and 'metadata'.
+        """
+        results = dict(self.vector_search(query_embedding, k))
+        if search_type == "hybrid":
+            top_score = max(results.values(), default=0.0) or 1.0
+            results = {position: score / top_score for position, score in results.items()}
+            for position, score in self.keyword_search(query, k):
+                results[position] = max(score, results.get(position, 0.0))
+        best = sorted(results.items(), key=lambda item: -item[1])[:k]
+        return [(self.documents[position], score) for position, score in best]
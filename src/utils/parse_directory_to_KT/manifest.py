@@ -0,0 +1,162 @@
+"""
+Manifest used to re-index the knowledge graph incrementally.
+
+For every file that was ingested it keeps the content hash, the node that contains it
+and the entities that were created from it. Comparing the manifest with the current state
+of the directory tells which files have to be written again and which nodes are stale.
+"""
+import os
+import json
+import hashlib
+
+from .parse_cache import PARSE_FORMAT_VERSION
+
+# Parsed keys written to the graph and the label of the nodes created from them
+ENTITY_LABELS = {
+    "classes": "Class",
+    "functions": "Function",
+    "methods": "Method",
+}
+
+
+def hash_taxonomy(nodes_relationships):
+    """
+    Computes a hash of the node types and relationships mapping, to detect changes on it.
+
+    Args:
+        nodes_relationships (list): The list containing node types and their relationships.
+
+    Returns:
+        str: Hexadecimal sha256 digest of the mapping.
+    """
+    return hashlib.sha256(json.dumps(nodes_relationships, sort_keys=True).encode()).hexdigest()
+
+
+class IngestManifest:
+    """
+    Keeps track of the files and entities ingested in the graph on the previous run.
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path (str): JSON file where the manifest is stored. It is created if it does not exist.
+        """
+        self.path = path
+        self.files = {}
+        self.taxonomy_hash = None
+        self.load()
+
+    def load(self):
+        """Loads the manifest from disk, starting from an empty one if it is missing or outdated."""
+        try:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        # Entities from another parser version can not be compared with the current ones
+        if data.get("version") != PARSE_FORMAT_VERSION:
+            return
+        self.files = data.get("files", {})
+        self.taxonomy_hash = data.get("taxonomy_hash")
+
+    def save(self):
+        """Writes the manifest to disk."""
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.path, "w") as file:
+            json.dump({
+                "version": PARSE_FORMAT_VERSION,
+                "taxonomy_hash": self.taxonomy_hash,
+                "files": self.files
+            }, file)
+
+    def is_unchanged(self, relative_file_path, parent, mtime, content_hash=None):
+        """
+        Checks if a file is already in the graph as it is now.
+
+        Args:
+            relative_file_path (str): Path of the file relative to the ingested directory.
+            parent (list): Label and name of the node containing the file.
+            mtime (int): Modification time of the file in nanoseconds.
+            content_hash (str, optional): Content hash of the file, used when the modification time differs.
+
+        Returns:
+            bool: True if the file does not need to be written again.
+        """
+        entry = self.files.get(relative_file_path)
+        if entry is None or entry["parent"] != list(parent):
+            return False
+        if entry["mtime"] == mtime:
+            return True
+        if content_hash is not None and entry["hash"] == content_hash:
+            # Only touched, keep the new modification time so next runs skip the hash
+            entry["mtime"] = mtime
+            return True
+        return False
+
+    def update(self, relative_file_path, parent, mtime, content_hash, parsed_data):
+        """
+        Registers the current state of a file and returns the entities that are no longer in it.
+
+        Args:
+            relative_file_path (str): Path of the file relative to the ingested directory.
+            parent (list): Label and name of the node containing the file.
+            mtime (int): Modification time of the file in nanoseconds.
+            content_hash (str): Content hash of the file.
+            parsed_data (dict): Parsed data of the file.
+
+        Returns:
+            list: Tuples (label, name) of the stale entities that have to be removed from the graph.
+                The entities of a file moved to another node are returned by `moved_entities` instead.
+        """
+        previous = self.files.get(relative_file_path)
+        entities = {key: sorted({item["name"] for item in parsed_data.get(key, [])}) for key in ENTITY_LABELS}
+        self.files[relative_file_path] = {
+            "parent": list(parent),
+            "mtime": mtime,
+            "hash": content_hash,
+            "entities": entities
+        }
+        if previous is None or previous["parent"] != list(parent):
+            return []
+
+        stale = []
+        for key, label in ENTITY_LABELS.items():
+            current = set(entities[key])
+            stale.extend((label, name) for name in previous["entities"].get(key, []) if name not in current)
+        return stale
+
+    def moved_entities(self, relative_file_path, parent):
+        """
+        Returns the entities of a file registered under another node. They have to be removed
+        before the file is written again, since the same entities are merged under the new node.
+
+        Args:
+            relative_file_path (str): Path of the file relative to the ingested directory.
+            parent (list): Label and name of the node containing the file now.
+
+        Returns:
+            list: Tuples (label, name) of the entities of the file on the previous run.
+        """
+        previous = self.files.get(relative_file_path)
+        if previous is None or previous["parent"] == list(parent):
+            return []
+        return [(label, name) for key, label in ENTITY_LABELS.items() for name in previous["entities"].get(key, [])]
+
+    def remove_missing(self, seen_files):
+        """
+        Forgets the files that are no longer present and returns their entities.
+
+        Args:
+            seen_files (set): Relative paths of the files found in the current run.
+
+        Returns:
+            list: Tuples (label, name, relative_file_path) of the entities of the removed files.
+        """
+        stale = []
+        for relative_file_path in [path for path in self.files if path not in seen_files]:
+            entry = self.files.pop(relative_file_path)
+            for key, label in ENTITY_LABELS.items():
+                stale.extend((label, name, relative_file_path) for name in entry["entities"].get(key, []))
+        return stale
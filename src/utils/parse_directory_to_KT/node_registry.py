@@ -0,0 +1,59 @@
+"""
+Indexed access to the node types and relationships mapping used to generate the graph.
+"""
+
+
+class NodeRegistry:
+    """
+    Dictionary indexes over the `nodes_relationships` mapping, built once so that folder
+    names and relationship targets are resolved in constant time.
+    """
+    def __init__(self, nodes_relationships):
+        """
+        Args:
+            nodes_relationships (list): The list containing node types and their relationships.
+        """
+        self.nodes_relationships = nodes_relationships
+        self._by_name = {}
+        self._by_lower_name = {}
+        for item in nodes_relationships:
+            # As in a linear scan, the first item with a given name wins
+            self._by_name.setdefault(item['name'], item)
+            self._by_lower_name.setdefault(item['name'].lower(), item)
+
+    def __iter__(self):
+        return iter(self.nodes_relationships)
+
+    def __len__(self):
+        return len(self.nodes_relationships)
+
+    def get_node_info(self, folder_name):
+        """
+        Retrieves the node information (label and name) for a given folder, ignoring case.
+
+        Args:
+            folder_name (str): The name of the folder to be mapped to a node type.
+
+        Returns:
+            dict: A dictionary containing the label and name of the node if found, otherwise None.
+        """
+        item = self._by_lower_name.get(folder_name.lower())
+        if item is None:
+            return None
+        return {'label': item['label'], 'name': item['name']}
+
+    def get_label(self, name):
+        """
+        Returns the label of the node with the given name, or None if it is not mapped.
+        """
+        item = self._by_name.get(name)
+        return item['label'] if item else None
+
+
+def as_registry(nodes_relationships):
+    """
+    Returns the mapping as a NodeRegistry, building it only if it is not one already.
+    """
+    if isinstance(nodes_relationships, NodeRegistry):
+        return nodes_relationships
+    return NodeRegistry(nodes_relationships)
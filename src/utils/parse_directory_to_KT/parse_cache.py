@@ -0,0 +1,244 @@
+"""
+Cache for the results of parsing Python files during the graph generation.
+
+Parsing is the most expensive step of the ingest. The cache keeps each result in memory
+for the current run and, optionally, on disk so later runs do not parse files that have
+not changed. Files that do need parsing can be dispatched to a pool of processes.
+"""
+import os
+import json
+import time
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Bump this whenever the structure returned by the parser changes, so old entries
+# stored on disk are not reused.
+PARSE_FORMAT_VERSION = 5
+
+
+def hash_file_content(content):
+    """
+    Computes the content hash used to detect changes in a file.
+
+    Args:
+        content (bytes): Raw content of the file.
+
+    Returns:
+        str: Hexadecimal sha256 digest of the content.
+    """
+    return hashlib.sha256(content).hexdigest()
+
+
+def _timed_parse(parser, file_path):
+    start = time.perf_counter()
+    result = parser(file_path)
+    return result, time.perf_counter() - start
+
+
+def _parse_files(parser, file_paths):
+    """
+    Parses a chunk of files inside a worker process, returning each result with its parse time and
+    the error raised by the parser (None if it succeeded), so one file does not fail the whole chunk.
+    """
+    outcomes = []
+    for file_path in file_paths:
+        try:
+            outcomes.append((*_timed_parse(parser, file_path), None))
+        except Exception as error:
+            outcomes.append((None, 0.0, error))
+    return outcomes
+
+
+class ParseCache:
+    """
+    Stores parsed results keyed by file path, modification time and content hash.
+    """
+    def __init__(self, parser, cache_dir=None, keep_in_memory=True):
+        """
+        Args:
+            parser (callable): Function receiving a file path and returning the parsed data.
+            cache_dir (str, optional): Folder where the results are persisted between runs.
+                If not provided, results are only kept in memory.
+            keep_in_memory (bool): Whether to keep the results in memory. Disable it when each file
+                is only read once, so memory does not grow with the size of the repository.
+        """
+        self.parser = parser
+        self.cache_dir = cache_dir
+        self.keep_in_memory = keep_in_memory
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _disk_path(self, file_path):
+        key = hashlib.sha1(file_path.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_from_disk(self, file_path):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(file_path), "r") as file:
+                entry = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if entry.get("version") != PARSE_FORMAT_VERSION or entry.get("path") != file_path:
+            return None
+        return entry
+
+    def _save_to_disk(self, file_path, entry):
+        if not self.cache_dir:
+            return
+        with open(self._disk_path(file_path), "w") as file:
+            json.dump({**entry, "path": file_path, "version": PARSE_FORMAT_VERSION}, file)
+
+    def _lookup(self, file_path):
+        """
+        Returns the cached entry of a file if it is still valid, otherwise None, together with
+        the current modification time and content hash (only computed if needed) of the file.
+        """
+        mtime = os.stat(file_path).st_mtime_ns
+
+        entry = self._entries.get(file_path)
+        if entry is None:
+            entry = self._load_from_disk(file_path)
+        if entry is not None and entry["mtime"] == mtime:
+            if self.keep_in_memory:
+                self._entries[file_path] = entry
+            self.hits += 1
+            return entry, mtime, entry["hash"]
+
+        # The modification time changed (or the file is new), check the content itself
+        with open(file_path, "rb") as file:
+            content_hash = hash_file_content(file.read())
+        if entry is not None and entry["hash"] == content_hash:
+            self.hits += 1
+            return self._store(file_path, entry["result"], mtime, content_hash), mtime, content_hash
+        self.misses += 1
+        return None, mtime, content_hash
+
+    def _store(self, file_path, result, mtime, content_hash):
+        entry = {"hash": content_hash, "mtime": mtime, "result": result}
+        if self.keep_in_memory:
+            self._entries[file_path] = entry
+        self._save_to_disk(file_path, entry)
+        return entry
+
+    def get_entry(self, file_path, on_parse=None, on_error=None):
+        """
+        Returns the cached entry of a file, parsing it only if it changed since it was cached.
+
+        Args:
+            file_path (str): The path of the Python file.
+            on_parse (callable, optional): Called as `on_parse(file_path, seconds, cached)` with the
+                time spent parsing the file (0 if it was cached).
+            on_error (callable, optional): Called as `on_error(file_path, error)` when the parser fails.
+                If provided, None is returned for that file instead of raising the error.
+
+        Returns:
+            dict: Entry with the keys 'mtime', 'hash' and 'result'.
+        """
+        file_path = os.path.abspath(file_path)
+        entry, mtime, content_hash = self._lookup(file_path)
+        if entry is not None:
+            if on_parse is not None:
+                on_parse(file_path, 0.0, True)
+            return entry
+        try:
+            result, seconds = _timed_parse(self.parser, file_path)
+        except Exception as error:
+            if on_error is None:
+                raise
+            on_error(file_path, error)
+            return None
+        if on_parse is not None:
+            on_parse(file_path, seconds, False)
+        return self._store(file_path, result, mtime, content_hash)
+
+    def iter_entries(self, file_paths, workers=None, chunksize=16, on_parse=None, on_error=None):
+        """
+        Yields the cached entries of several files, in the same order as `file_paths`.
+        Files that are not cached are parsed in chunks by a pool of processes, and their results
+        are streamed back as soon as the ones preceding them are available. Only a bounded window
+        of files is looked ahead, so memory does not grow with the number of files.
+
+        Args:
+            file_paths (iterable): Paths of the Python files.
+            workers (int, optional): Number of processes used to parse. Defaults to the number of
+                CPUs; with 1 worker the files are parsed in the current process.
+            chunksize (int): Number of files sent to a worker at once.
+            on_parse (callable, optional): Called as `on_parse(file_path, seconds, cached)` before
+                each entry is yielded, with the time spent parsing the file (0 if it was cached).
+            on_error (callable, optional): Called as `on_error(file_path, error)` when the parser fails.
+                If provided, None is yielded for that file instead of raising the error.
+
+        Yields:
+            dict: Entry with the keys 'mtime', 'hash' and 'result' for each file.
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1:
+            for file_path in file_paths:
+                yield self.get_entry(file_path, on_parse, on_error)
+            return
+
+        window = workers * chunksize * 2
+        pending = deque()  # (file_path, entry, mtime, content_hash, chunk, position in chunk)
+        chunk = None
+
+        def submit(chunk):
+            chunk["future"] = executor.submit(_parse_files, self.parser, chunk["paths"])
+
+        def resolve(item):
+            file_path, entry, mtime, content_hash, item_chunk, position = item
+            if entry is not None:
+                if on_parse is not None:
+                    on_parse(file_path, 0.0, True)
+                return entry
+            if "future" not in item_chunk:
+                submit(item_chunk)
+            result, seconds, error = item_chunk["future"].result()[position]
+            if error is not None:
+                if on_error is None:
+                    raise error
+                on_error(file_path, error)
+                return None
+            if on_parse is not None:
+                on_parse(file_path, seconds, False)
+            return self._store(file_path, result, mtime, content_hash)
+
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            for file_path in file_paths:
+                file_path = os.path.abspath(file_path)
+                entry, mtime, content_hash = self._lookup(file_path)
+                position = None
+                if entry is None:
+                    if chunk is None or "future" in chunk:
+                        chunk = {"paths": []}
+                    position = len(chunk["paths"])
+                    chunk["paths"].append(file_path)
+                    if len(chunk["paths"]) >= chunksize:
+                        submit(chunk)
+                pending.append((file_path, entry, mtime, content_hash, chunk, position))
+                if len(pending) >= window:
+                    yield resolve(pending.popleft())
+
+            while pending:
+                yield resolve(pending.popleft())
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def get(self, file_path):
+        """
+        Returns the parsed data of a file.
+
+        Args:
+            file_path (str): The path of the Python file.
+
+        Returns:
+            dict: The output of the parser for that file.
+        """
+        return self.get_entry(file_path)["result"]
@@ -0,0 +1,91 @@
+"""
+Schema of the knowledge graph, created before the ingest.
+
+Every node is merged by its key, so each label gets a uniqueness constraint (and its backing
+index) on it: the name for the nodes of the mapping (Area, SubArea, Framework...) and the name
+together with the file path for the code entities, so same-named functions in different files
+are different nodes. The vector and full-text indexes used by the retriever of `QA_Rag` are
+created here as well.
+"""
+from .node_registry import as_registry
+from .manifest import ENTITY_LABELS
+
+# Indexes expected by the hybrid retriever of QA_Rag (`Neo4jVector.from_existing_index`)
+VECTOR_INDEX_NAME = "vector"
+KEYWORD_INDEX_NAME = "keyword"
+# Label indexed by the retriever, the vector and keyword indexes must cover the same one
+INDEXED_LABEL = "Function"
+# Dimension of the all-MiniLM-L6-v2 embeddings
+EMBEDDING_DIMENSION = 384
+
+# Single node holding the version of the graph, bumped by every ingest that writes something,
+# so readers caching the schema (or anything derived from the graph) know when to refresh it
+GRAPH_VERSION_LABEL = "GraphVersion"
+BUMP_GRAPH_VERSION_STATEMENT = (
+    f"MERGE (v:{GRAPH_VERSION_LABEL} {{name: 'graph'}}) "
+    "SET v.version = coalesce(v.version, 0) + 1, v.updated_at = timestamp()"
+)
+GRAPH_VERSION_QUERY = f"MATCH (v:{GRAPH_VERSION_LABEL} {{name: 'graph'}}) RETURN v.version AS version"
+
+
+def schema_statements(labels, indexed_label=INDEXED_LABEL, embedding_dimension=EMBEDDING_DIMENSION):
+    """
+    Returns the statements creating the constraints and indexes of the graph.
+
+    Args:
+        labels (iterable): Labels of the nodes of the mapping, keyed by name.
+        indexed_label (str): Label covered by the vector and keyword indexes.
+        embedding_dimension (int): Dimension of the embeddings stored in the `embedding` property.
+
+    Returns:
+        list: Cypher statements, which do nothing if the schema already exists.
+    """
+    statements = [
+        f"CREATE CONSTRAINT {label.lower()}_name IF NOT EXISTS FOR (n:{label}) REQUIRE n.name IS UNIQUE"
+        for label in sorted(set(labels) - set(ENTITY_LABELS.values()))
+    ]
+    # Code entities are keyed by name and file path
+    statements.extend(
+        f"CREATE CONSTRAINT {label.lower()}_key IF NOT EXISTS FOR (n:{label}) REQUIRE (n.name, n.file_path) IS UNIQUE"
+        for label in ENTITY_LABELS.values()
+    )
+    # Used to find the entities of a file, e.g. to replace their dependencies
+    statements.extend(
+        f"CREATE INDEX {label.lower()}_file_path IF NOT EXISTS FOR (n:{label}) ON (n.file_path)"
+        for label in ENTITY_LABELS.values()
+    )
+    statements.append(
+        f"CREATE VECTOR INDEX {VECTOR_INDEX_NAME} IF NOT EXISTS FOR (n:{indexed_label}) ON (n.embedding) "
+        f"OPTIONS {{indexConfig: {{`vector.dimensions`: {embedding_dimension}, `vector.similarity_function`: 'cosine'}}}}"
+    )
+    # Same layout `Neo4jVector` uses: the embedded text is stored in the `text` property
+    statements.append(
+        f"CREATE FULLTEXT INDEX {KEYWORD_INDEX_NAME} IF NOT EXISTS FOR (n:{indexed_label}) ON EACH [n.text]"
+    )
+    return statements
+
+
+def bootstrap_schema(db, nodes_relationships, indexed_label=INDEXED_LABEL, embedding_dimension=EMBEDDING_DIMENSION):
+    """
+    Creates the constraints and indexes of the graph if they do not exist.
+
+    Args:
+        db: The neomodel database connection.
+        nodes_relationships (list or NodeRegistry): The list containing node types and their relationships.
+        indexed_label (str): Label covered by the vector and keyword indexes.
+        embedding_dimension (int): Dimension of the embeddings stored in the `embedding` property.
+    """
+    labels = {item['label'] for item in as_registry(nodes_relationships)}
+    # Schema commands can not share a transaction with writes, each one runs on its own
+    for statement in schema_statements(labels, indexed_label, embedding_dimension):
+        db.cypher_query(statement)
+
+
+def bump_graph_version(db):
+    """
+    Increments the version of the graph after it changed.
+
+    Args:
+        db: The neomodel database connection.
+    """
+    db.cypher_query(BUMP_GRAPH_VERSION_STATEMENT)
@@ -0,0 +1,143 @@
+"""
+Lazy loading of the source code of the graph nodes.
+
+Nodes only store the location of their code (file path, byte/line spans and chunks) and a
+hash of it. The source is read from the repository when a node is actually used, falling back
+to a content-addressed blob store (filled during the ingest) when the file changed or is not
+available where the code is served.
+"""
+import os
+import hashlib
+import logging
+from functools import lru_cache
+
+from .chunker import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class BlobStore:
+    """
+    Content-addressed storage of source code, keyed by the sha256 of the content.
+    """
+    def __init__(self, root):
+        """
+        Args:
+            root (str): Folder where the blobs are stored.
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, code_hash):
+        return os.path.join(self.root, code_hash[:2], code_hash[2:])
+
+    def put(self, code_hash, content):
+        """
+        Stores a blob unless it already exists.
+
+        Args:
+            code_hash (str): sha256 of the content.
+            content (bytes): Source code.
+        """
+        path = self._path(code_hash)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(content)
+        os.replace(temporary_path, path)
+
+    def get(self, code_hash):
+        """
+        Returns:
+            bytes: The stored content, or None if it is not in the store.
+        """
+        try:
+            with open(self._path(code_hash), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+
+class SourceLoader:
+    """
+    Loads the source code of nodes from the repository or from a blob store.
+    """
+    def __init__(self, base_path, blob_store=None, cache_size=256):
+        """
+        Args:
+            base_path (str): Directory the `file_path` of the nodes is relative to.
+            blob_store (BlobStore, optional): Store used when the file changed since the ingest.
+            cache_size (int): Number of sources kept in memory.
+        """
+        self.base_path = base_path
+        self.blob_store = blob_store
+        self._load_bytes = lru_cache(maxsize=cache_size)(self._read_source)
+
+    def _read_source(self, file_path, start_byte, end_byte, code_hash):
+        try:
+            with open(os.path.join(self.base_path, file_path), "rb") as file:
+                file.seek(start_byte)
+                content = file.read(end_byte - start_byte)
+        except (FileNotFoundError, TypeError):
+            content = None
+        if content is not None and (code_hash is None or hashlib.sha256(content).hexdigest() == code_hash):
+            return content
+        # The file changed (or is missing) since the node was written
+        if self.blob_store is not None and code_hash:
+            stored = self.blob_store.get(code_hash)
+            if stored is not None:
+                return stored
+        # The bytes now at that location belong to other code, they are never served as the source
+        logger.warning("The source of %s (bytes %s-%s) changed or is missing since the ingest, and is not in a blob store",
+                       file_path, start_byte, end_byte)
+        return None
+
+    @staticmethod
+    def has_source(node):
+        """
+        Returns True if the properties of a node locate some source code.
+        """
+        return isinstance(node, dict) and node.get('file_path') is not None and node.get('start_byte') is not None
+
+    def load_chunks(self, node):
+        """
+        Returns the code chunks of a node.
+
+        Args:
+            node (dict): Properties of the node.
+
+        Returns:
+            list: Source of each chunk, empty if the code can not be loaded.
+        """
+        content = self._load_bytes(node['file_path'], node['start_byte'], node['end_byte'], node.get('code_hash'))
+        if content is None:
+            return []
+        starts = [start - node['start_byte'] for start in (node.get('chunk_start_bytes') or [node['start_byte']])]
+        ends = starts[1:] + [len(content)]
+        return [content[start:end].decode("utf-8", errors="replace") for start, end in zip(starts, ends)]
+
+    def load(self, node, max_tokens=None):
+        """
+        Returns the source code of a node.
+
+        Args:
+            node (dict): Properties of the node.
+            max_tokens (int, optional): Approximate token budget. Only the first chunks fitting
+                in it are returned (at least the first one).
+
+        Returns:
+            str: The source code, empty if it can not be loaded.
+        """
+        chunks = self.load_chunks(node)
+        if max_tokens is None:
+            return "".join(chunks)
+        selected = []
+        used_tokens = 0
+        for chunk in chunks:
+            used_tokens += estimate_tokens(chunk)
+            if selected and used_tokens > max_tokens:
+                break
+            selected.append(chunk)
+        return "".join(selected)
@@ -0,0 +1,145 @@
+"""
+Deterministic mapping of a folder structure to the `nodes_relationships` taxonomy.
+
+Folders are labeled by rules on their depth (Area, SubArea...) and on whether they are leaves
+of the tree (Framework), with overrides for specific folders. The same directory always
+produces the same mapping, and the result can be cached next to the ingest manifest, keyed
+by the folder structure and the rules.
+"""
+import os
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Label of the folders at each depth below the base path (1 is the first level)
+DEFAULT_DEPTH_LABELS = ("Area", "SubArea")
+# Label of the folders without mapped subfolders, whatever their depth
+DEFAULT_LEAF_LABEL = "Framework"
+DEFAULT_IGNORED_FOLDERS = ("__pycache__", "tests", "venv")
+
+
+def _scan_folders(base_path, ignored_folders):
+    """
+    Returns the folders below the base path, in a deterministic pre-order, as tuples
+    (relative_path, depth, has_python_files).
+    """
+    folders = []
+    for root, dirs, files in os.walk(base_path):
+        # Prune the folders that are never mapped, and walk the rest in a stable order
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d not in ignored_folders)
+        relative_path = os.path.relpath(root, base_path)
+        if relative_path == '.':
+            continue
+        depth = relative_path.count(os.sep) + 1
+        folders.append((relative_path, depth, any(file_name.endswith('.py') for file_name in files)))
+    return folders
+
+
+def _rules_key(folders, depth_labels, leaf_label, overrides):
+    return hashlib.sha256(json.dumps(
+        [folders, list(depth_labels), leaf_label, overrides or {}], sort_keys=True
+    ).encode()).hexdigest()
+
+
+def map_folders(folders, depth_labels=DEFAULT_DEPTH_LABELS, leaf_label=DEFAULT_LEAF_LABEL, overrides=None):
+    """
+    Maps a list of scanned folders to nodes and their containment relationships.
+
+    Args:
+        folders (list): Tuples (relative_path, depth, has_python_files) in pre-order.
+        depth_labels (tuple): Label of the folders at each depth.
+        leaf_label (str): Label of the folders with Python code but no mapped subfolders.
+        overrides (dict, optional): Label of specific folders, by relative path or folder name.
+            A None label excludes the folder and everything below it.
+
+    Returns:
+        list: The `nodes_relationships` structure used by `create_graph_for_directory`.
+    """
+    overrides = overrides or {}
+    # Only folders with Python code in their subtree are mapped. Walking the pre-order backwards,
+    # every folder is visited after its subfolders
+    with_code = set()
+    with_code_subfolders = set()
+    for relative_path, _, has_python_files in reversed(folders):
+        if has_python_files or relative_path in with_code_subfolders:
+            with_code.add(relative_path)
+            with_code_subfolders.add(os.path.dirname(relative_path))
+
+    nodes = {}
+    names = set()
+    excluded = set()
+    for relative_path, depth, _ in folders:
+        name = os.path.basename(relative_path)
+        if relative_path not in with_code:
+            continue
+        if os.path.dirname(relative_path) in excluded:
+            excluded.add(relative_path)
+            continue
+        if relative_path in overrides or name in overrides:
+            label = overrides.get(relative_path, overrides.get(name))
+            if label is None:
+                excluded.add(relative_path)
+                continue
+        elif relative_path not in with_code_subfolders and leaf_label:
+            label = leaf_label
+        elif depth <= len(depth_labels):
+            label = depth_labels[depth - 1]
+        else:
+            continue
+        if name in names:
+            # Nodes are merged by name, so only the first folder with a given name is mapped
+            logger.warning("Folder %s is not mapped, another folder is already named %s", relative_path, name)
+            continue
+        names.add(name)
+        nodes[relative_path] = {'label': label, 'name': name}
+
+    # Each node contains the closest mapped folders below it
+    for relative_path, node in nodes.items():
+        parent = os.path.dirname(relative_path)
+        while parent and parent not in nodes:
+            parent = os.path.dirname(parent)
+        if parent:
+            relationships = nodes[parent].setdefault('relationships', {})
+            relationships.setdefault(f"contains_{node['label'].lower()}", []).append(node['name'])
+    return list(nodes.values())
+
+
+def map_directory(base_path, depth_labels=DEFAULT_DEPTH_LABELS, leaf_label=DEFAULT_LEAF_LABEL, overrides=None,
+                  ignored_folders=DEFAULT_IGNORED_FOLDERS, cache_path=None):
+    """
+    Walks a directory and builds the `nodes_relationships` mapping of its folders.
+
+    Args:
+        base_path (str): The base path of the directory.
+        depth_labels (tuple): Label of the folders at each depth below the base path.
+        leaf_label (str): Label of the folders with Python code but no mapped subfolders.
+        overrides (dict, optional): Label of specific folders, by relative path or folder name.
+            A None label excludes the folder and everything below it.
+        ignored_folders (tuple): Names of folders that are not walked. Hidden folders are always ignored.
+        cache_path (str, optional): JSON file where the mapping is cached (e.g. next to the manifest).
+            It is reused while the folder structure and the rules do not change.
+
+    Returns:
+        list: The `nodes_relationships` structure used by `create_graph_for_directory`.
+    """
+    folders = _scan_folders(base_path, ignored_folders)
+    key = _rules_key(folders, depth_labels, leaf_label, overrides)
+    if cache_path:
+        try:
+            with open(cache_path, "r") as file:
+                cached = json.load(file)
+            if cached.get("key") == key:
+                return cached["nodes_relationships"]
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    nodes_relationships = map_folders(folders, depth_labels, leaf_label, overrides)
+    if cache_path:
+        folder = os.path.dirname(cache_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(cache_path, "w") as file:
+            json.dump({"key": key, "nodes_relationships": nodes_relationships}, file)
+    return nodes_relationships
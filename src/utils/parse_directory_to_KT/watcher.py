@@ -0,0 +1,197 @@
+"""
+Watch mode keeping the knowledge graph in sync with the repository.
+
+File system events are received through `watchdog` (inotify on Linux) when it is installed,
+falling back to polling the modification times of the Python files otherwise. Bursts of
+changes are debounced and then applied with the incremental mode of `create_graph_for_directory`,
+so only the touched files are parsed and written again.
+"""
+import os
+import time
+import queue
+import logging
+
+from .code_parser import parse_python_file
+from .parse_cache import ParseCache
+from .node_registry import as_registry
+from .graph_generator import create_graph_for_directory
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+logger = logging.getLogger(__name__)
+
+
+class PollingChangeSource:
+    """
+    Detects changes by comparing the modification times of the Python files between polls.
+    """
+    def __init__(self, base_path, poll_interval=1.0):
+        self.base_path = base_path
+        self.poll_interval = poll_interval
+        self._snapshot = self._take_snapshot()
+
+    def _take_snapshot(self):
+        snapshot = {}
+        for root, dirs, files in os.walk(self.base_path):
+            for file_name in files:
+                if file_name.endswith('.py'):
+                    file_path = os.path.join(root, file_name)
+                    try:
+                        snapshot[file_path] = os.stat(file_path).st_mtime_ns
+                    except FileNotFoundError:
+                        continue
+        return snapshot
+
+    def wait_for_changes(self, timeout=None):
+        """
+        Blocks until some file changes or the timeout (in seconds) expires.
+
+        Returns:
+            set: Paths of the files added, modified or deleted.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self._take_snapshot()
+            changed = {
+                file_path for file_path in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(file_path) != self._snapshot.get(file_path)
+            }
+            self._snapshot = snapshot
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            wait = self.poll_interval if deadline is None else min(self.poll_interval, max(deadline - time.monotonic(), 0))
+            time.sleep(wait)
+
+    def close(self):
+        pass
+
+
+class _QueueEventHandler(FileSystemEventHandler):
+    def __init__(self, events):
+        self.events = events
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for path in (event.src_path, getattr(event, 'dest_path', None)):
+            if path and path.endswith('.py'):
+                self.events.put(path)
+
+
+class WatchdogChangeSource:
+    """
+    Receives file system events (inotify on Linux) through `watchdog`.
+    """
+    def __init__(self, base_path):
+        self.events = queue.Queue()
+        self.observer = Observer()
+        self.observer.schedule(_QueueEventHandler(self.events), base_path, recursive=True)
+        self.observer.start()
+
+    def wait_for_changes(self, timeout=None):
+        """
+        Blocks until some file changes or the timeout (in seconds) expires.
+
+        Returns:
+            set: Paths of the files added, modified or deleted.
+        """
+        try:
+            changed = {self.events.get(timeout=timeout)}
+        except queue.Empty:
+            return set()
+        # Drain the events already received
+        while True:
+            try:
+                changed.add(self.events.get_nowait())
+            except queue.Empty:
+                return changed
+
+    def close(self):
+        self.observer.stop()
+        self.observer.join()
+
+
+def create_change_source(base_path, use_events=True, poll_interval=1.0):
+    """
+    Returns an event based change source if `watchdog` is available, otherwise a polling one.
+    """
+    if use_events and Observer is not None:
+        return WatchdogChangeSource(base_path)
+    logger.info("watchdog is not available, polling %s every %s seconds", base_path, poll_interval)
+    return PollingChangeSource(base_path, poll_interval)
+
+
+def watch_directory(db, base_path, nodes_relationships, manifest_path, debounce_seconds=1.0,
+                    use_events=True, poll_interval=1.0, parse_cache=None, on_update=None,
+                    stop_event=None, **ingest_kwargs):
+    """
+    Keeps the graph in sync with a directory until interrupted (or `stop_event` is set).
+
+    Args:
+        db: The neomodel database connection.
+        base_path (str): The base path of the directory to watch.
+        nodes_relationships (list or NodeRegistry): The list containing node types and their relationships.
+        manifest_path (str): Path of the manifest used for the incremental updates.
+        debounce_seconds (float): Quiet time waited after a change before updating the graph,
+            so bursts of changes (saving several files, checking out a branch...) are applied once.
+        use_events (bool): Use file system events when `watchdog` is installed.
+        poll_interval (float): Seconds between polls when events are not available.
+        parse_cache (ParseCache, optional): Cache of parsed files shared between updates. By default
+            nothing is kept in memory, since each update only parses the files that changed.
+        on_update (callable, optional): Called after each update with the changed paths and
+            the statistics of the writes.
+        stop_event (threading.Event, optional): Event used to stop watching from another thread.
+        **ingest_kwargs: Extra arguments for `create_graph_for_directory`. Files that can not be
+            parsed are skipped unless `skip_parse_errors=False` is passed.
+    """
+    registry = as_registry(nodes_relationships)
+    if parse_cache is None:
+        parse_cache = ParseCache(parse_python_file, keep_in_memory=False)
+    # A file saved halfway can not be parsed, it is written again once it changes
+    ingest_kwargs.setdefault('skip_parse_errors', True)
+    source = create_change_source(base_path, use_events=use_events, poll_interval=poll_interval)
+
+    # Bring the graph up to date before waiting for changes
+    create_graph_for_directory(db, base_path, registry, parse_cache=parse_cache,
+                               manifest_path=manifest_path, **ingest_kwargs)
+    # Changes not yet applied to the graph, kept until an update succeeds
+    pending = set()
+    try:
+        while stop_event is None or not stop_event.is_set():
+            changed = source.wait_for_changes(timeout=poll_interval)
+            if not changed:
+                continue
+            # Wait until the burst of changes is over
+            while True:
+                more = source.wait_for_changes(timeout=debounce_seconds)
+                if not more:
+                    break
+                changed |= more
+            pending |= changed
+
+            logger.info("Updating the graph after changes in %d files", len(pending))
+            try:
+                # The schema was created by the first ingest. Only the changed files are looked at
+                stats = create_graph_for_directory(db, base_path, registry, parse_cache=parse_cache,
+                                                   manifest_path=manifest_path,
+                                                   **{**ingest_kwargs, 'create_schema': False,
+                                                      'changed_paths': pending})
+            except Exception:
+                # The manifest is only saved by a complete update, so the pending files are written
+                # again after the next change
+                logger.exception("Updating the graph failed, waiting for the next change")
+                continue
+            changed, pending = pending, set()
+            if on_update is not None:
+                on_update(changed, stats)
+    except KeyboardInterrupt:
+        logger.info("Stopped watching %s", base_path)
+    finally:
+        source.close()
@@ -56,6 +56,18 @@ sys.path.append(str(root_path))
 from src.rag_pipeline.multichatbot_client import QA_Rag
 
 
+@st.cache_resource
+def warm_up_rag():
+    """Loads the components shared by every chat (model, Neo4j connections, LLM) once per process."""
+    try:
+        QA_Rag.warm_up()
+    except Exception as error:
+        logging.error(f"The RAG components could not be loaded in advance: {error}")
+
+
+warm_up_rag()
+
+
 
 
 def load_metadata(filename):
@@ -17,6 +17,18 @@ root_path = Path(__file__).parent.parent  # Adjust according to actual path
 sys.path.append(str(root_path))
 from src.rag_pipeline.multichatbot_client import QA_Rag
 
+
+@st.cache_resource
+def warm_up_rag():
+    """Loads the components shared by every chat (model, Neo4j connections, LLM) once per process."""
+    try:
+        QA_Rag.warm_up()
+    except Exception as error:
+        logging.error(f"The RAG components could not be loaded in advance: {error}")
+
+
+warm_up_rag()
+
 # Initialize session state for user data and conversations if not already present
 current_active_chat = None # TOBE IMPROVED
 
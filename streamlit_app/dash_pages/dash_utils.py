@@ -48,8 +48,10 @@ def map_graph_data(records):
     return mapped_nodes, mapped_relationships
 
 def initial_query(db_connection):
+    # DEPENDS_ON relationships are the precomputed closure of CALLS/IMPORTS, not drawn
     relationships_query = """
     MATCH (n)-[r]->(m)
+    WHERE type(r) <> 'DEPENDS_ON'
     RETURN n, r, m
     """
     output = db_connection.cypher_query(relationships_query)
@@ -2,7 +2,9 @@ import streamlit as st
  
 import pathlib
 import sys
+import asyncio
 import logging
+import threading
 
 # Configure logging
 logging.basicConfig(
@@ -12,6 +14,44 @@ logging.basicConfig(
 )
 
 
+@st.cache_resource
+def get_event_loop():
+    """
+    Returns the event loop running the answer streams of every chat, in a background thread.
+    The async clients shared by the chats (e.g. the one of the LLM) are bound to the loop they are
+    first used in, so the streams can not run in a new loop each.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="rag-event-loop", daemon=True).start()
+    return loop
+
+
+async def _next_item(iterator):
+    return await iterator.__anext__()
+
+
+def iterate_async(async_iterable):
+    """
+    Consumes an async iterable from synchronous code (e.g. the Streamlit script), yielding each
+    item as soon as it is produced. The iterable runs in the loop shared by every chat.
+
+    Args:
+        async_iterable: Async generator or iterable, such as `QA_Rag.astream_rag`.
+    """
+    loop = get_event_loop()
+    iterator = async_iterable.__aiter__()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(_next_item(iterator), loop).result()
+            except StopAsyncIteration:
+                break
+    finally:
+        # The stream may be left early (e.g. the script is rerun), close it in its loop
+        if hasattr(iterator, "aclose"):
+            asyncio.run_coroutine_threadsafe(iterator.aclose(), loop).result()
+
+
 class Chatbot:
     def __init__(self, user_id, conversation_id,previous_messages):
 
@@ -64,26 +104,20 @@ class Chatbot:
                 {"role": "user", "content": prompt})
             st.chat_message("user").write(prompt)
  
-            with st.spinner("Writing..."):
-                if st.session_state.assistants[self.user_id][self.conversation_id]:
+            assistant = st.session_state.assistants[self.user_id][self.conversation_id]
+            with st.chat_message("assistant"):
+                if assistant:
                     # st.write("Chat history--->", st.session_state.assistants[self.user_id][self.conversation_id].rag_chain.get_session_history(user_id="hlopezpe", conversation_id = self.conversation_id))
-                    response = {
-                        # "answer": rag_client.invoke_rag({'question':prompt,'chat_history':st.session_state.messages}
-                        "answer": st.session_state.assistants[self.user_id][self.conversation_id].invoke_rag(prompt
-                        )
-                    }
+                    # The answer is rendered token by token as the LLM writes it
+                    with st.spinner("Writing..."):
+                        answer = st.write_stream(iterate_async(assistant.astream_rag(prompt)))
                 else:
-                    response = {
-                        # "answer": rag_client.invoke_rag({'question':prompt,'chat_history':st.session_state.messages}
-                        "answer": "Load an LLM"
-                    }
-                    
- 
-            msg = {"content": response["answer"].content, "role": "assistant"}
+                    answer = "Load an LLM"
+                    st.write(answer)
+
+            msg = {"content": answer, "role": "assistant"}
             st.session_state.messages.append(msg)
  
-            st.chat_message("assistant").write(response["answer"].content)
- 
 
     def run(self):
         self.create_chatbot()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The ingest package is imported as `src.utils.parse_directory_to_KT`, from the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
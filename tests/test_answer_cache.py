@@ -0,0 +1,77 @@
+import pytest
+
+from src.services import answer_cache
+from src.services.answer_cache import SemanticAnswerCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(answer_cache, "time", clock)
+    return clock
+
+
+def test_similar_questions_reuse_the_answer(clock):
+    cache = SemanticAnswerCache(similarity_threshold=0.9)
+    cache.store("What is StandardScaler?", [1.0, 0.0], 3, "A scaler.")
+    assert cache.lookup([0.99, 0.1], 3) == "A scaler."
+    assert cache.lookup([0.0, 1.0], 3) is None
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_answers_are_scoped_to_the_graph_version(clock):
+    cache = SemanticAnswerCache()
+    cache.store("What is StandardScaler?", [1.0, 0.0], 3, "A scaler.")
+    assert cache.lookup([1.0, 0.0], 4) is None
+    # Versions read back from SQLite are strings
+    assert cache.lookup([1.0, 0.0], "3") == "A scaler."
+
+
+def test_nothing_is_cached_without_a_graph_version(clock):
+    cache = SemanticAnswerCache()
+    cache.store("What is StandardScaler?", [1.0, 0.0], None, "A scaler.")
+    assert cache.stats()['entries'] == 0
+    assert cache.lookup([1.0, 0.0], None) is None
+
+
+def test_answers_expire_after_the_ttl(clock):
+    cache = SemanticAnswerCache(ttl_seconds=60)
+    cache.store("What is StandardScaler?", [1.0, 0.0], 3, "A scaler.")
+    clock.now += 59
+    assert cache.lookup([1.0, 0.0], 3) == "A scaler."
+    clock.now += 1
+    assert cache.lookup([1.0, 0.0], 3) is None
+
+
+def test_least_recently_used_answers_are_evicted(clock):
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.store("first", [1.0, 0.0, 0.0], 3, "1")
+    clock.now += 1
+    cache.store("second", [0.0, 1.0, 0.0], 3, "2")
+    clock.now += 1
+    assert cache.lookup([1.0, 0.0, 0.0], 3) == "1"
+    clock.now += 1
+    cache.store("third", [0.0, 0.0, 1.0], 3, "3")
+    assert cache.lookup([0.0, 1.0, 0.0], 3) is None
+    assert cache.lookup([1.0, 0.0, 0.0], 3) == "1"
+
+
+def test_answers_are_persisted(tmp_path, clock):
+    path = str(tmp_path / "cache" / "answers.sqlite")
+    cache = SemanticAnswerCache(path, ttl_seconds=60)
+    cache.store("What is StandardScaler?", [1.0, 0.0], 3, "A scaler.")
+    cache.store("What is MinMaxScaler?", [0.0, 1.0], 3, "Another scaler.")
+    cache.connection.close()
+
+    assert SemanticAnswerCache(path, ttl_seconds=60).lookup([0.0, 1.0], 3) == "Another scaler."
+    # Expired entries are dropped when loading
+    clock.now += 60
+    assert SemanticAnswerCache(path, ttl_seconds=60).stats()['entries'] == 0
@@ -0,0 +1,75 @@
+import ast
+import hashlib
+
+from src.utils.parse_directory_to_KT.chunker import chunk_node, estimate_tokens
+from src.utils.parse_directory_to_KT.source_store import BlobStore, SourceLoader
+
+SOURCE = b'''class Model:
+    """A model."""
+
+    def fit(self, data):
+        self.weights = [value * 2 for value in data]
+        return self
+
+    @staticmethod
+    def predict(data):
+        return [value + 1 for value in data]
+
+    def score(self, data):
+        return sum(data)
+'''
+
+
+def line_offsets(source):
+    offsets = [0]
+    for line in source.splitlines(keepends=True):
+        offsets.append(offsets[-1] + len(line))
+    return offsets
+
+
+def test_estimate_tokens_counts_bytes():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("a" * 40) == 11
+
+
+def test_small_nodes_are_one_chunk():
+    node = ast.parse(SOURCE).body[0]
+    assert chunk_node(node, 0, len(SOURCE), line_offsets(SOURCE)) == ([1], [0])
+
+
+def test_large_nodes_are_cut_between_statements():
+    node = ast.parse(SOURCE).body[0]
+    offsets = line_offsets(SOURCE)
+    start_lines, start_bytes = chunk_node(node, 0, len(SOURCE), offsets, max_tokens=30)
+
+    # The cuts are at the start of the methods, including their decorators
+    assert start_lines == [1, 4, 8, 12]
+    assert start_bytes == [offsets[line - 1] for line in start_lines]
+    chunks = [SOURCE[start:end] for start, end in zip(start_bytes, start_bytes[1:] + [len(SOURCE)])]
+    assert b"".join(chunks) == SOURCE
+    assert chunks[2].lstrip().startswith(b"@staticmethod")
+
+
+def write_repository(tmp_path, source):
+    (tmp_path / "model.py").write_bytes(source)
+    return {'file_path': "model.py", 'start_byte': 0, 'end_byte': len(SOURCE),
+            'code_hash': hashlib.sha256(SOURCE).hexdigest(), 'chunk_start_bytes': [0, 100, 200]}
+
+
+def test_loader_returns_the_chunks_within_the_budget(tmp_path):
+    node = write_repository(tmp_path, SOURCE)
+    loader = SourceLoader(str(tmp_path))
+    assert loader.load(node) == SOURCE.decode()
+    assert [len(chunk) for chunk in loader.load_chunks(node)] == [100, 100, len(SOURCE) - 200]
+    assert loader.load(node, max_tokens=60) == SOURCE[:200].decode()
+    # The first chunk is returned even over the budget
+    assert loader.load(node, max_tokens=1) == SOURCE[:100].decode()
+
+
+def test_loader_never_serves_a_changed_file(tmp_path):
+    node = write_repository(tmp_path, SOURCE.replace(b"value * 2", b"value * 3"))
+    assert SourceLoader(str(tmp_path)).load(node) == ""
+
+    blob_store = BlobStore(str(tmp_path / "blobs"))
+    blob_store.put(node['code_hash'], SOURCE)
+    assert SourceLoader(str(tmp_path), blob_store=blob_store).load(node) == SOURCE.decode()
@@ -0,0 +1,95 @@
+import pytest
+
+from src.services.cypher_guard import UnsafeQueryError, check_read_only, limit_query, run_read_query
+
+
+@pytest.mark.parametrize("query", [
+    "MATCH (n:Class) DETACH DELETE n",
+    "MATCH (n) SET n.name = 'x' RETURN n",
+    "merge (n:Area {name: 'ml'})",
+    "LOAD CSV FROM 'file:///x.csv' AS row RETURN row",
+    "MATCH (n) CALL { WITH n CREATE (m) } IN TRANSACTIONS RETURN n",
+])
+def test_write_clauses_are_rejected(query):
+    with pytest.raises(UnsafeQueryError):
+        check_read_only(query)
+
+
+def test_procedures_outside_the_allow_list_are_rejected():
+    with pytest.raises(UnsafeQueryError, match="apoc.periodic.iterate"):
+        check_read_only("CALL apoc.periodic.iterate('MATCH (n) RETURN n', 'DELETE n', {})")
+    check_read_only("CALL db.index.fulltext.queryNodes('keyword', 'train') YIELD node RETURN node")
+    check_read_only("CALL db.schema.visualization()")
+
+
+def test_keywords_inside_literals_and_comments_are_ignored():
+    check_read_only("MATCH (n:Function {name: 'create_model'}) // DELETE later\nRETURN n.`set`")
+    check_read_only('MATCH (n) WHERE n.description CONTAINS "merge the data" RETURN n')
+
+
+def test_limit_is_added_or_lowered():
+    assert limit_query("MATCH (n) RETURN n;", max_rows=10) == "MATCH (n) RETURN n\nLIMIT 10"
+    assert limit_query("MATCH (n) RETURN n LIMIT 100", max_rows=10) == "MATCH (n) RETURN n LIMIT 10"
+    assert limit_query("MATCH (n) RETURN n LIMIT 3", max_rows=10) == "MATCH (n) RETURN n LIMIT 3"
+    assert limit_query("MATCH (n) RETURN n LIMIT $k", max_rows=10) == "MATCH (n) RETURN n LIMIT $k"
+
+
+def test_limit_of_a_union_bounds_every_part():
+    query = "MATCH (n:Class) RETURN n.name AS name UNION MATCH (n:Function) RETURN n.name AS name LIMIT 5"
+    assert limit_query(query, max_rows=10) == f"CALL {{\n{query}\n}}\nRETURN * LIMIT 10"
+
+
+class FakeRecord:
+    def __init__(self, value):
+        self.value = value
+
+    def data(self):
+        return {'name': self.value}
+
+
+class FakeSession:
+    def __init__(self, queries):
+        self.queries = queries
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute_read(self, work):
+        session = self
+
+        class Transaction:
+            def run(self, query, params):
+                session.queries.append(query)
+                return iter(FakeRecord(str(position)) for position in range(100))
+        return work(Transaction())
+
+
+class FakeDriver:
+    def __init__(self):
+        self.queries = []
+
+    def session(self, database=None):
+        return FakeSession(self.queries)
+
+
+class FakeGraph:
+    def __init__(self):
+        self._driver = FakeDriver()
+        self._database = "neo4j"
+
+
+def test_run_read_query_caps_the_records_fetched():
+    graph = FakeGraph()
+    records = run_read_query(graph, "MATCH (n) RETURN n.name AS name", max_rows=3)
+    assert records == [{'name': '0'}, {'name': '1'}, {'name': '2'}]
+    assert graph._driver.queries == ["MATCH (n) RETURN n.name AS name\nLIMIT 3"]
+
+
+def test_run_read_query_rejects_before_running():
+    graph = FakeGraph()
+    with pytest.raises(UnsafeQueryError):
+        run_read_query(graph, "MATCH (n) DELETE n")
+    assert graph._driver.queries == []
@@ -0,0 +1,71 @@
+import pytest
+
+from src.services.cypher_planner import CypherPlanner, match_template, normalize_question
+
+
+def test_questions_are_normalized():
+    assert normalize_question("  What is in the   Pandas framework?? ") == "what is in the pandas framework"
+
+
+@pytest.mark.parametrize("question, intent, params", [
+    ("Show me the function train_model in the pytorch framework",
+     "entity_in_framework", {'entity': 'train_model', 'framework': 'pytorch'}),
+    ("What is in the pandas framework?", "framework_contents", {'framework': 'pandas'}),
+    ("What are the dependencies of the class StandardScaler?", "entity_dependencies", {'entity': 'standardscaler'}),
+    ("What does load_data depend on?", "entity_dependencies", {'entity': 'load_data'}),
+    ("Which functions call `plot_curve`?", "entity_callers", {'entity': 'plot_curve'}),
+])
+def test_templates_match_the_recurring_intents(question, intent, params):
+    plan = match_template(question)
+    assert plan['source'] == f"template:{intent}"
+    assert plan['params'] == params
+
+
+def test_templates_skip_pronouns_and_unknown_frameworks():
+    assert match_template("What are the dependencies of it?") is None
+    assert match_template("Is the function train in production?", frameworks={'pytorch'}) is None
+    assert match_template("Is the function train in pytorch?", frameworks={'pytorch'}) is not None
+    assert match_template("How do I train a model?") is None
+
+
+class FakeLinker:
+    def __init__(self, plan=None):
+        self._plan = plan
+
+    def names(self, label):
+        return {'pytorch'}
+
+    def plan(self, question):
+        return self._plan
+
+
+def test_generated_queries_are_cached_per_graph_version():
+    planner = CypherPlanner()
+    assert planner.plan("How many classes are there?", 1) is None
+    planner.store("How many classes are there?", 1, "MATCH (n:Class) RETURN count(n)")
+
+    plan = planner.plan("how many classes are there", 1)
+    assert plan == {'query': "MATCH (n:Class) RETURN count(n)", 'params': {}, 'source': "cache"}
+    # The graph changed, the query is generated again
+    assert planner.plan("How many classes are there?", 2) is None
+    assert planner.stats()['cache'] == 1
+    assert planner.stats()['llm'] == 2
+
+
+def test_least_recently_used_queries_are_evicted():
+    planner = CypherPlanner(max_plans=2)
+    planner.store("first", 1, "RETURN 1")
+    planner.store("second", 1, "RETURN 2")
+    planner.plan("first", 1)
+    planner.store("third", 1, "RETURN 3")
+    assert planner.plan("second", 1) is None
+    assert planner.plan("first", 1)['query'] == "RETURN 1"
+
+
+def test_entity_linker_plans_what_the_templates_can_not():
+    linked = {'query': "MATCH (n) RETURN n", 'params': {}, 'source': "linker"}
+    planner = CypherPlanner()
+    assert planner.plan("Explain StandardScaler", 1, entity_linker=FakeLinker(linked)) is linked
+    assert planner.plan("function fit in the sklearn framework", 1, entity_linker=FakeLinker()) is None
+    stats = planner.stats()
+    assert (stats['linker'], stats['llm'], stats['llm_bypass_rate']) == (1, 1, 0.5)
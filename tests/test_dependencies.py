@@ -0,0 +1,80 @@
+import os
+
+from src.utils.parse_directory_to_KT.code_parser import parse_python_file
+from src.utils.parse_directory_to_KT.dependencies import (SymbolIndex, collect_references, dependency_closure,
+                                                          resolve_dependencies)
+
+FILES = {
+    "pkg/__init__.py": "from .models import Trainer\n",
+    "pkg/utils.py": "def normalize(data):\n    return data\n",
+    "pkg/models.py": (
+        "from .utils import normalize\n\n\n"
+        "def scale(data):\n    return normalize(data)\n\n\n"
+        "class Trainer:\n"
+        "    def prepare(self, data):\n        return scale(data)\n\n"
+        "    def fit(self, data):\n        return self.prepare(data)\n"
+    ),
+    "modelling/pytorch/trainer.py": "class Trainer:\n    pass\n",
+    "app/train.py": (
+        "import pkg.utils\n"
+        "from pkg import Trainer\n"
+        "from transformers import Trainer as HFTrainer\n\n\n"
+        "def run(data):\n"
+        "    HFTrainer()\n"
+        "    Trainer().fit(pkg.utils.normalize(data))\n"
+    ),
+}
+
+
+def resolve_repository(tmp_path):
+    symbol_index = SymbolIndex()
+    file_references = []
+    for relative_file_path, content in FILES.items():
+        relative_file_path = os.path.normpath(relative_file_path)
+        file_path = tmp_path / relative_file_path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(content)
+        parsed_data = parse_python_file(str(file_path))
+        symbol_index.add_parsed_file(relative_file_path, parsed_data)
+        file_references.append((relative_file_path, *collect_references(relative_file_path, parsed_data)))
+    return {
+        (name, rel_type, target[1], target[2])
+        for relative_file_path, imports, references in file_references
+        for _, name, rel_type, target in resolve_dependencies(symbol_index, relative_file_path, imports, references)
+    }
+
+
+def test_names_are_resolved_to_the_entities_of_the_repository(tmp_path):
+    models, utils = os.path.join("pkg", "models.py"), os.path.join("pkg", "utils.py")
+    dependencies = resolve_repository(tmp_path)
+
+    assert ('scale', 'CALLS', 'normalize', utils) in dependencies
+    assert ('Trainer.prepare', 'CALLS', 'scale', models) in dependencies
+    assert ('Trainer.fit', 'CALLS', 'Trainer.prepare', models) in dependencies
+    # Names re-exported by a package and dotted module paths
+    assert ('run', 'CALLS', 'Trainer', models) in dependencies
+    assert ('run', 'CALLS', 'normalize', utils) in dependencies
+
+
+def test_installed_libraries_are_never_linked(tmp_path):
+    dependencies = resolve_repository(tmp_path)
+    assert not any(target_file_path == os.path.join("modelling", "pytorch", "trainer.py")
+                   for *_, target_file_path in dependencies)
+
+
+def test_names_outside_the_repository_are_not_resolved():
+    symbol_index = SymbolIndex()
+    symbol_index.add_file(os.path.join("pytorch", "trainer.py"), {'classes': ['Trainer']})
+    assert symbol_index.resolve_qualified("transformers.Trainer", os.path.join("app", "train.py")) is None
+    assert symbol_index.resolve_qualified("pytorch.trainer.Trainer", os.path.join("app", "train.py")) == \
+        ('Class', 'Trainer', os.path.join("pytorch", "trainer.py"))
+    assert symbol_index.resolve_qualified("trainer.Trainer", os.path.join("pytorch", "run.py")) == \
+        ('Class', 'Trainer', os.path.join("pytorch", "trainer.py"))
+
+
+def test_closure_keeps_the_shortest_distance_up_to_the_depth():
+    edges = {'a': ['b', 'c'], 'b': ['c', 'd'], 'c': ['a'], 'd': ['e']}
+    closure = dependency_closure(edges, depth=2)
+    assert closure['a'] == {'b': 1, 'c': 1, 'd': 2}
+    assert closure['c'] == {'a': 1, 'b': 2}
+    assert closure['d'] == {'e': 1}
@@ -0,0 +1,61 @@
+import pytest
+
+# The store of the vectors lives with the ingest embedder, which imports the model at module level
+pytest.importorskip("sentence_transformers")
+
+from src.services.embedding_cache import CachedEmbeddings, normalize_text
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.queries = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text)), 1.0]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def test_whitespace_is_normalized():
+    assert normalize_text("  What is\n StandardScaler? ") == "What is StandardScaler?"
+
+
+def test_same_questions_skip_the_model():
+    model = FakeEmbeddings()
+    embeddings = CachedEmbeddings(model, "model")
+    assert embeddings.embed_query("What is  StandardScaler?") == embeddings.embed_query("What is StandardScaler?")
+    assert model.queries == ["What is StandardScaler?"]
+    assert embeddings.stats() == {'entries': 1, 'hits': 1, 'disk_hits': 0, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_least_recently_used_vectors_are_evicted():
+    model = FakeEmbeddings()
+    embeddings = CachedEmbeddings(model, "model", max_entries=2)
+    for text in ("first", "second", "first", "third", "second"):
+        embeddings.embed_query(text)
+    assert model.queries == ["first", "second", "third", "second"]
+
+
+def test_documents_are_not_cached():
+    model = FakeEmbeddings()
+    embeddings = CachedEmbeddings(model, "model")
+    embeddings.embed_documents(["a", "a"])
+    assert model.queries == ["a", "a"]
+    assert embeddings.stats()['entries'] == 0
+
+
+def test_vectors_are_persisted_per_model(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    CachedEmbeddings(FakeEmbeddings(), "model", cache_path=path).embed_query("What is StandardScaler?")
+
+    model = FakeEmbeddings()
+    embeddings = CachedEmbeddings(model, "model", cache_path=path)
+    assert embeddings.embed_query("What is StandardScaler?") == [23.0, 1.0]
+    assert model.queries == []
+    assert embeddings.stats()['disk_hits'] == 1
+
+    other = FakeEmbeddings()
+    CachedEmbeddings(other, "other-model", cache_path=path).embed_query("What is StandardScaler?")
+    assert other.queries == ["What is StandardScaler?"]
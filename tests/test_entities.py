@@ -0,0 +1,36 @@
+import os
+
+from src.utils.parse_directory_to_KT import graph_generator
+from src.utils.parse_directory_to_KT.entities import get_node_info, iter_code_entities, node_properties, node_text
+
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write(content)
+
+
+def test_iter_code_entities_streams_the_mapped_folders(tmp_path):
+    write_file(str(tmp_path / "models" / "linear.py"),
+               'class Linear:\n    """A linear model."""\n    def fit(self):\n        pass\n\n\ndef train():\n    pass\n')
+    write_file(str(tmp_path / "scripts" / "run.py"), "def main():\n    pass\n")
+    nodes_relationships = [{'label': 'Framework', 'name': 'models'}]
+
+    entities = list(iter_code_entities(str(tmp_path), nodes_relationships, workers=1))
+
+    assert [(entity.kind, entity.name) for entity in entities] == \
+        [('class', 'Linear'), ('function', 'train'), ('method', 'Linear.fit')]
+    linear = entities[0]
+    assert linear.file_path == os.path.join("models", "linear.py")
+    assert (linear.parent_label, linear.parent_name) == ('Framework', 'models')
+    assert linear.docstring == "A linear model."
+    assert entities[2].class_name == 'Linear'
+    assert node_properties(entities[2])['method_name'] == 'fit'
+    assert node_text(linear) == "\ndescription: A linear model."
+
+
+def test_get_node_info_is_still_importable_from_the_graph_generator():
+    nodes_relationships = [{'label': 'Area', 'name': 'ml', 'relationships': {}}]
+    assert graph_generator.get_node_info is get_node_info
+    assert get_node_info('ml', nodes_relationships) == {'label': 'Area', 'name': 'ml'}
+    assert get_node_info('docs', nodes_relationships) is None
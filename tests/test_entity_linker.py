@@ -0,0 +1,76 @@
+from src.services.entity_linker import EntityLinker, NameMatcher
+
+NODES = [
+    {'id': '1', 'label': 'Function', 'name': 'scale_features'},
+    {'id': '2', 'label': 'Class', 'name': 'SimpleDataset'},
+    {'id': '3', 'label': 'Framework', 'name': 'pytorch'},
+    {'id': '4', 'label': 'Method', 'name': 'SimpleDataset.load'},
+    {'id': '5', 'label': 'Function', 'name': 'fit'},
+]
+
+
+class FakeGraph:
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.loads = 0
+
+    def query(self, query, params=None):
+        self.loads += 1
+        return self.nodes
+
+
+class FakeSchemaCache:
+    def __init__(self, version=1):
+        self.version = version
+        self.refreshes = 0
+
+    def get_version(self):
+        return self.version
+
+
+def test_matcher_finds_whole_words_longest_first():
+    matcher = NameMatcher(["simpledataset", "simpledataset.load", "data"])
+    text = "how does simpledataset.load read the metadata?"
+    assert matcher.find(text) == [(9, 27, "simpledataset.load")]
+    assert matcher.find("the data of simpledataset") == [(4, 8, "data"), (12, 25, "simpledataset")]
+
+
+def test_names_are_linked_in_order_of_appearance():
+    linker = EntityLinker(FakeGraph(NODES), FakeSchemaCache())
+    assert linker.link("Does SimpleDataset use scale features in PyTorch?") == ['2', '1', '3']
+    # Names shorter than the minimum are not linked
+    assert linker.link("How do I call fit?") == []
+    assert linker.stats() == {'exact': 1, 'fuzzy': 0, 'unlinked': 1, 'names': 5}
+
+
+def test_misspelled_identifiers_are_linked_fuzzily():
+    linker = EntityLinker(FakeGraph(NODES), FakeSchemaCache())
+    assert linker.link("What does SimpleDatset return?") == ['2']
+    assert linker.stats()['fuzzy'] == 1
+    assert EntityLinker(FakeGraph(NODES), FakeSchemaCache(), fuzzy_cutoff=1).link("What does SimpleDatset return?") == []
+
+
+def test_names_by_label_include_short_names():
+    linker = EntityLinker(FakeGraph(NODES), FakeSchemaCache())
+    assert linker.names("Function") == {'scale_features', 'fit'}
+    assert linker.names("Area") == set()
+
+
+def test_names_are_loaded_again_when_the_graph_changes():
+    graph = FakeGraph(NODES)
+    schema_cache = FakeSchemaCache()
+    linker = EntityLinker(graph, schema_cache)
+    linker.link("pytorch")
+    linker.link("pytorch")
+    assert graph.loads == 1
+    schema_cache.version = 2
+    linker.link("pytorch")
+    assert graph.loads == 2
+
+
+def test_plan_fetches_the_neighbourhoods():
+    linker = EntityLinker(FakeGraph(NODES), FakeSchemaCache())
+    plan = linker.plan("Explain scale_features", max_neighbours=3)
+    assert plan['params'] == {'ids': ['1'], 'max_neighbours': 3}
+    assert plan['source'] == "linker"
+    assert linker.plan("Explain gradient descent") is None
@@ -0,0 +1,125 @@
+import os
+
+from src.utils.parse_directory_to_KT.graph_generator import (DELETE_ENTITY_STATEMENT, ENTITY_STATEMENTS,
+                                                              create_graph_for_directory)
+
+
+class FakeDatabase:
+    """Records the rows of every statement in the order they reach the database."""
+    def __init__(self):
+        self.writes = []
+
+    def cypher_query(self, query, params=None):
+        for row in (params or {}).get('rows', []):
+            self.writes.append((query, row))
+        return [], None
+
+    def begin(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write(content)
+
+
+def ingest(db, base_path, nodes_relationships, manifest_path, **kwargs):
+    return create_graph_for_directory(db, str(base_path), nodes_relationships, manifest_path=str(manifest_path),
+                                      workers=1, create_schema=False, verbosity="quiet", **kwargs)
+
+
+def written_functions(db):
+    statement = ENTITY_STATEMENTS['function'].format(parent_label="Framework")
+    return sorted(row['name'] for query, row in db.writes if query.endswith(statement))
+
+
+def test_moved_file_keeps_its_entities(tmp_path):
+    base_path = tmp_path / "repo"
+    manifest_path = tmp_path / "manifest.json"
+    write_file(str(base_path / "a" / "x.py"), "def fa():\n    return 1\n")
+    ingest(FakeDatabase(), base_path, [{'label': 'Framework', 'name': 'repo'}, {'label': 'SubArea', 'name': 'a'}],
+           manifest_path)
+
+    # Folder `a` is mapped to another label while a file is added to the root folder, which is walked
+    # first, so a Function is merged before the stale nodes of `a/x.py` are found
+    write_file(str(base_path / "y.py"), "def fb():\n    return 1\n")
+    db = FakeDatabase()
+    ingest(db, base_path, [{'label': 'Framework', 'name': 'repo'}, {'label': 'Framework', 'name': 'a'}], manifest_path)
+
+    delete = DELETE_ENTITY_STATEMENT.format(label="Function")
+    merge = ENTITY_STATEMENTS['function'].format(parent_label="Framework")
+    writes = [statement for query, row in db.writes for statement in (delete, merge)
+              if query.endswith(statement) and row['name'] == 'fa' and row['file_path'] == os.path.join("a", "x.py")]
+    # The node under the old folder is removed before it is merged under the new one
+    assert writes == [delete, merge]
+
+
+def test_new_folder_gets_its_parent_node(tmp_path):
+    base_path = tmp_path / "repo"
+    manifest_path = tmp_path / "manifest.json"
+    nodes_relationships = [{'label': 'Area', 'name': 'repo', 'relationships': {'contains_framework': ['b']}},
+                           {'label': 'Framework', 'name': 'a'}, {'label': 'Framework', 'name': 'b'}]
+    write_file(str(base_path / "a" / "x.py"), "def fa():\n    return 1\n")
+    ingest(FakeDatabase(), base_path, nodes_relationships, manifest_path)
+
+    # The mapping does not change, but folder `b` is created after the first run
+    write_file(str(base_path / "b" / "y.py"), "def fb():\n    return 1\n")
+    db = FakeDatabase()
+    ingest(db, base_path, nodes_relationships, manifest_path)
+
+    queries = db.writes
+    parent = next(position for position, (query, row) in enumerate(queries)
+                  if query.endswith("MERGE (n:Framework {name: row.name})") and row['name'] == 'b')
+    entity = next(position for position, (query, row) in enumerate(queries)
+                  if query.endswith(ENTITY_STATEMENTS['function'].format(parent_label="Framework")) and row['name'] == 'fb')
+    assert parent < entity
+    assert any("MERGE (p)-[:CONTAINS_FRAMEWORK]->(t)" in query and row['target_name'] == 'b' for query, row in queries)
+    # The folders without changes are not written again
+    assert not any(query.endswith("MERGE (n:Framework {name: row.name})") and row['name'] == 'a' for query, row in queries)
+
+
+def test_unparsable_file_is_skipped(tmp_path):
+    base_path = tmp_path / "repo"
+    manifest_path = tmp_path / "manifest.json"
+    nodes_relationships = [{'label': 'Framework', 'name': 'a'}]
+    write_file(str(base_path / "a" / "x.py"), "def fa():\n    return 1\n")
+    write_file(str(base_path / "a" / "y.py"), "def fb(:\n")
+    db = FakeDatabase()
+    ingest(db, base_path, nodes_relationships, manifest_path, skip_parse_errors=True)
+    assert written_functions(db) == ['fa']
+
+    # The file was not recorded as ingested, so it is written once it is fixed
+    write_file(str(base_path / "a" / "y.py"), "def fb():\n    return 1\n")
+    db = FakeDatabase()
+    ingest(db, base_path, nodes_relationships, manifest_path, skip_parse_errors=True)
+    assert written_functions(db) == ['fb']
+
+
+def test_changed_paths_limit_the_update(tmp_path):
+    base_path = tmp_path / "repo"
+    manifest_path = tmp_path / "manifest.json"
+    nodes_relationships = [{'label': 'Framework', 'name': 'a'}]
+    for name in ("x", "y", "z"):
+        write_file(str(base_path / "a" / f"{name}.py"), f"def f{name}():\n    return 1\n")
+    ingest(FakeDatabase(), base_path, nodes_relationships, manifest_path)
+
+    write_file(str(base_path / "a" / "x.py"), "def fx():\n    return 2\n")
+    write_file(str(base_path / "a" / "y.py"), "def fy():\n    return 2\n")
+    write_file(str(base_path / "a" / "w.py"), "def fw():\n    return 1\n")
+    os.remove(str(base_path / "a" / "z.py"))
+    changed_paths = {str(base_path / "a" / name) for name in ("x.py", "w.py", "z.py")}
+    db = FakeDatabase()
+    summary = ingest(db, base_path, nodes_relationships, manifest_path, changed_paths=changed_paths)
+
+    # `y.py` is not looked at, since it is not reported as changed
+    assert written_functions(db) == ['fw', 'fx']
+    delete = DELETE_ENTITY_STATEMENT.format(label="Function")
+    assert [row['name'] for query, row in db.writes if query.endswith(delete)] == ['fz']
+    assert summary['files_unchanged'] == 1
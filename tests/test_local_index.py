@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from src.services.local_retriever import LocalRetriever
+from src.utils.parse_directory_to_KT.local_index import BM25Index, LocalVectorIndex, build_local_index, tokenize
+
+
+def write_export(path, nodes, dependencies=()):
+    with open(path, "w", encoding="utf-8") as file:
+        for identifier, text, embedding in nodes:
+            file.write(json.dumps({"type": "node", "id": identifier, "labels": ["Function"],
+                                   "properties": {"name": identifier, "text": text, "embedding": embedding}}) + "\n")
+        for start, end, depth in dependencies:
+            file.write(json.dumps({"type": "relationship", "label": "DEPENDS_ON", "start": start, "end": end,
+                                   "properties": {"depth": depth}}) + "\n")
+
+
+@pytest.fixture
+def index(tmp_path):
+    jsonl_path = str(tmp_path / "graph.jsonl")
+    write_export(jsonl_path, [
+        ("load_data", "load the training data from a csv file", [1.0, 0.0, 0.0]),
+        ("train_model", "train the model on the training data", [0.8, 0.6, 0.0]),
+        ("plot_curve", "plot the learning curve", [0.0, 0.0, 1.0]),
+    ], dependencies=[("train_model", "plot_curve", 2), ("train_model", "load_data", 1)])
+    build_local_index(jsonl_path, str(tmp_path / "index"))
+    return LocalVectorIndex(str(tmp_path / "index"))
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("parseHTTPResponse load_data") == ["parse", "http", "response", "load", "data"]
+
+
+def test_bm25_ranks_documents_with_rare_terms_first():
+    scores = BM25Index(["train the model", "plot the curve", "the model"]).scores("plot model")
+    assert set(scores) == {0, 1, 2}
+    assert scores[1] > scores[0]
+
+
+def test_build_keeps_the_closest_dependencies(index):
+    documents = {document["id"]: document for document in index.documents}
+    assert [dependency["name"] for dependency in documents["train_model"]["metadata"]["dependencies"]] == \
+        ["load_data", "plot_curve"]
+    assert "embedding" not in documents["load_data"]["metadata"]
+
+
+def test_vector_search_uses_the_neo4j_cosine_score(index):
+    results = index.vector_search([1.0, 0.0, 0.0], k=2)
+    assert [position for position, _ in results] == [0, 1]
+    assert results[0][1] == pytest.approx(1.0)
+    assert results[1][1] == pytest.approx(0.9)
+
+
+def test_hybrid_search_normalizes_both_sides(index):
+    # The vector scores are 0.5, 0.68 and 0.9 before they are divided by the best one
+    results = index.search([0.0, 0.6, 0.8], "learning curve", k=3)
+    documents = [document["id"] for document, _ in results]
+    scores = dict(zip(documents, (score for _, score in results)))
+    assert documents[0] == "plot_curve"
+    assert scores["plot_curve"] == pytest.approx(1.0)
+    assert scores["train_model"] == pytest.approx(0.68 / 0.9)
+    assert all(0.0 <= score <= 1.0 for score in scores.values())
+
+
+def test_vector_search_keeps_the_raw_scores(index):
+    results = index.search([0.0, 0.6, 0.8], "learning curve", k=1, search_type="vector")
+    assert results[0][0]["id"] == "plot_curve"
+    assert results[0][1] == pytest.approx(0.9)
+
+
+class FakeEmbeddings:
+    def embed_query(self, text):
+        return [0.0, 0.6, 0.8]
+
+
+def test_retriever_drops_documents_under_the_threshold(index):
+    retriever = LocalRetriever(index=index, embeddings=FakeEmbeddings(), k=3, score_threshold=0.7)
+    documents = retriever.invoke("learning curve")
+    assert [document.metadata["name"] for document in documents] == ["plot_curve", "train_model"]
+    assert documents[0].metadata["score"] == pytest.approx(1.0)
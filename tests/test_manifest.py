@@ -0,0 +1,69 @@
+import json
+
+from src.utils.parse_directory_to_KT.manifest import IngestManifest, hash_taxonomy
+
+PARENT = ['Framework', 'pytorch']
+
+
+def parsed(classes=(), functions=(), methods=()):
+    return {'classes': [{'name': name} for name in classes], 'functions': [{'name': name} for name in functions],
+            'methods': [{'name': name} for name in methods]}
+
+
+def test_files_are_compared_by_mtime_then_hash(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    assert not manifest.is_unchanged("model.py", PARENT, 1)
+    manifest.update("model.py", PARENT, 1, "hash", parsed(functions=['train']))
+
+    assert manifest.is_unchanged("model.py", PARENT, 1)
+    assert not manifest.is_unchanged("model.py", PARENT, 2)
+    assert not manifest.is_unchanged("model.py", PARENT, 2, "other")
+    # Only touched, the new modification time is kept
+    assert manifest.is_unchanged("model.py", PARENT, 2, "hash")
+    assert manifest.is_unchanged("model.py", PARENT, 2)
+    assert not manifest.is_unchanged("model.py", ['Framework', 'tensorflow'], 2)
+
+
+def test_update_returns_the_entities_no_longer_defined(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    assert manifest.update("model.py", PARENT, 1, "a", parsed(['Model'], ['train', 'test'], ['Model.fit'])) == []
+    stale = manifest.update("model.py", PARENT, 2, "b", parsed(['Model'], ['train'], ['Model.predict']))
+    assert sorted(stale) == [('Function', 'test'), ('Method', 'Model.fit')]
+
+
+def test_moved_files_return_their_previous_entities(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    manifest.update("model.py", PARENT, 1, "a", parsed(['Model'], ['train']))
+    moved = ['Framework', 'tensorflow']
+    assert manifest.moved_entities("model.py", PARENT) == []
+    assert manifest.moved_entities("model.py", moved) == [('Class', 'Model'), ('Function', 'train')]
+    # Removed by `moved_entities`, not as stale entities of the update
+    assert manifest.update("model.py", moved, 1, "a", parsed(['Model'])) == []
+
+
+def test_missing_files_are_forgotten(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    manifest.update("a.py", PARENT, 1, "a", parsed(functions=['fa']))
+    manifest.update("b.py", PARENT, 1, "b", parsed(classes=['B'], methods=['B.run']))
+    assert manifest.remove_missing({"a.py"}) == [('Class', 'B', 'b.py'), ('Method', 'B.run', 'b.py')]
+    assert list(manifest.files) == ["a.py"]
+
+
+def test_manifest_is_persisted_with_the_parser_version(tmp_path):
+    path = str(tmp_path / "state" / "manifest.json")
+    manifest = IngestManifest(path)
+    manifest.update("a.py", PARENT, 1, "a", parsed(functions=['fa']))
+    manifest.taxonomy_hash = hash_taxonomy([{'label': 'Framework', 'name': 'pytorch'}])
+    manifest.save()
+
+    loaded = IngestManifest(path)
+    assert loaded.files == manifest.files
+    assert loaded.taxonomy_hash == hash_taxonomy([{'name': 'pytorch', 'label': 'Framework'}])
+
+    # Entities of another parser version are not reused
+    with open(path, "r") as file:
+        data = json.load(file)
+    data["version"] = -1
+    with open(path, "w") as file:
+        json.dump(data, file)
+    assert IngestManifest(path).files == {}
@@ -0,0 +1,28 @@
+from src.utils.parse_directory_to_KT.node_registry import NodeRegistry, as_registry
+
+NODES_RELATIONSHIPS = [
+    {'label': 'Area', 'name': 'ML', 'relationships': {'contains_framework': ['pytorch']}},
+    {'label': 'Framework', 'name': 'pytorch'},
+    {'label': 'SubArea', 'name': 'ml'},
+]
+
+
+def test_folders_are_matched_ignoring_case_and_first_item_wins():
+    registry = NodeRegistry(NODES_RELATIONSHIPS)
+    assert registry.get_node_info('PyTorch') == {'label': 'Framework', 'name': 'pytorch'}
+    assert registry.get_node_info('ml') == {'label': 'Area', 'name': 'ML'}
+    assert registry.get_node_info('docs') is None
+
+
+def test_labels_are_resolved_by_exact_name():
+    registry = NodeRegistry(NODES_RELATIONSHIPS)
+    assert registry.get_label('pytorch') == 'Framework'
+    assert registry.get_label('ml') == 'SubArea'
+    assert registry.get_label('PyTorch') is None
+
+
+def test_as_registry_reuses_a_registry():
+    registry = as_registry(NODES_RELATIONSHIPS)
+    assert as_registry(registry) is registry
+    assert list(registry) == NODES_RELATIONSHIPS
+    assert len(registry) == 3
@@ -0,0 +1,40 @@
+import pytest
+
+from src.services.rewrite_policy import RewritePolicy
+
+HISTORY = ["What is StandardScaler?", "A class scaling the features to unit variance."]
+
+
+def test_questions_without_history_are_not_rewritten():
+    policy = RewritePolicy()
+    assert not policy.should_rewrite([], "and in pandas?")
+    assert policy.stats()['skipped_no_history'] == 1
+
+
+@pytest.mark.parametrize("question", [
+    "and in pandas?",
+    "How is it used in the training loop?",
+    "What about the pytorch version of the model?",
+    "But which function loads the data from disk?",
+    "Can you show the same thing for the tensorflow framework?",
+])
+def test_follow_up_questions_are_rewritten(question):
+    assert RewritePolicy().should_rewrite(HISTORY, question)
+
+
+@pytest.mark.parametrize("question", [
+    "Which function loads the training data from a csv file?",
+    "Show me a function that scales features in sklearn",
+])
+def test_self_contained_questions_are_not_rewritten(question):
+    assert not RewritePolicy().should_rewrite(HISTORY, question)
+
+
+def test_stats_count_the_rewrites_skipped():
+    policy = RewritePolicy(min_words=3)
+    policy.should_rewrite([], "What is StandardScaler used for?")
+    policy.should_rewrite(HISTORY, "What is MinMaxScaler used for?")
+    policy.should_rewrite(HISTORY, "and MinMaxScaler?")
+    policy.should_rewrite(HISTORY, "Is it faster?")
+    assert policy.stats() == {'rewritten': 2, 'skipped_no_history': 1, 'skipped_self_contained': 1,
+                              'skip_rate': 0.5}
@@ -0,0 +1,62 @@
+import json
+import os
+
+from src.utils.parse_directory_to_KT.taxonomy_mapper import map_directory
+
+
+def make_tree(base_path, files):
+    for relative_path in files:
+        path = os.path.join(str(base_path), relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write("")
+
+
+def test_folders_are_labeled_by_depth_and_leaves(tmp_path):
+    make_tree(tmp_path, ["ml/pytorch/model.py", "ml/classic/sklearn/scaler.py", "viz/plot.py",
+                         "viz/plotly/figure.py", "docs/index.md", "tests/test_model.py", ".venv/lib/site.py"])
+
+    assert map_directory(str(tmp_path)) == [
+        {'label': 'Area', 'name': 'ml',
+         'relationships': {'contains_subarea': ['classic'], 'contains_framework': ['pytorch']}},
+        {'label': 'SubArea', 'name': 'classic', 'relationships': {'contains_framework': ['sklearn']}},
+        {'label': 'Framework', 'name': 'sklearn'},
+        {'label': 'Framework', 'name': 'pytorch'},
+        {'label': 'Area', 'name': 'viz', 'relationships': {'contains_framework': ['plotly']}},
+        {'label': 'Framework', 'name': 'plotly'},
+    ]
+
+
+def test_overrides_relabel_or_exclude_folders(tmp_path):
+    make_tree(tmp_path, ["ml/pytorch/model.py", "ml/classic/sklearn/scaler.py"])
+
+    nodes_relationships = map_directory(str(tmp_path), overrides={'classic': None, 'ml/pytorch': 'SubArea'})
+
+    assert nodes_relationships == [
+        {'label': 'Area', 'name': 'ml', 'relationships': {'contains_subarea': ['pytorch']}},
+        {'label': 'SubArea', 'name': 'pytorch'},
+    ]
+
+
+def test_only_the_first_folder_with_a_name_is_mapped(tmp_path):
+    make_tree(tmp_path, ["a/utils/x.py", "b/utils/y.py"])
+    names = [node['name'] for node in map_directory(str(tmp_path))]
+    assert names == ['a', 'utils', 'b']
+
+
+def test_mapping_is_cached_while_the_structure_does_not_change(tmp_path):
+    base_path = tmp_path / "repo"
+    cache_path = str(tmp_path / "cache" / "taxonomy.json")
+    make_tree(base_path, ["pytorch/model.py"])
+    assert map_directory(str(base_path), cache_path=cache_path) == [{'label': 'Framework', 'name': 'pytorch'}]
+
+    # A cached mapping with the same key is returned as it is
+    with open(cache_path, "r") as file:
+        cached = json.load(file)
+    cached["nodes_relationships"] = [{'label': 'Framework', 'name': 'cached'}]
+    with open(cache_path, "w") as file:
+        json.dump(cached, file)
+    assert map_directory(str(base_path), cache_path=cache_path) == [{'label': 'Framework', 'name': 'cached'}]
+
+    make_tree(base_path, ["tensorflow/model.py"])
+    assert [node['name'] for node in map_directory(str(base_path), cache_path=cache_path)] == ['pytorch', 'tensorflow']